@@ -0,0 +1,1012 @@
+"""
+Assignment 2 - Benchmarks
+
+=== CSC148 Summer 2024 ===
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, David Liu, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+This module contains benchmarks for the treemap trees. Each benchmark builds
+its own synthetic data in a temporary folder, so the numbers do not depend on
+what happens to be on this computer.
+
+Run this module directly to run every benchmark and print the results.
+"""
+import bz2
+import csv
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from random import randint
+from typing import Callable, Dict, List, Optional, Tuple
+
+import papers
+import tm_store
+from papers import PaperTree
+from tm_index import SpatialIndex
+from tm_render import render, render_folders
+from tm_store import TreeStore
+from tm_trees import TMTree, FileSystemTree, get_subtree_size, \
+    slice_and_dice, squarified
+
+
+##############################################################################
+# Helpers
+##############################################################################
+
+
+def _make_directory(root: str, depth: int, folders: int, files: int) -> int:
+    """Fill the folder <root> with a synthetic directory structure: every
+    folder down to <depth> levels contains <folders> subfolders and <files>
+    small files. Return the number of files created.
+    """
+    created = 0
+    for i in range(files):
+        with open(os.path.join(root, f'file{i}.txt'), 'w') as file:
+            file.write('x' * (i + 1))
+        created += 1
+    if depth > 0:
+        for i in range(folders):
+            path = os.path.join(root, f'folder{i}')
+            os.mkdir(path)
+            created += _make_directory(path, depth - 1, folders, files)
+    return created
+
+
+def _legacy_file_system_tree(path: str) -> TMTree:
+    """Build a tree for <path> the way FileSystemTree did before it was
+    rewritten to use os.scandir: recursively build every child, then walk the
+    whole folder again with get_subtree_size.
+    """
+    name = os.path.basename(path)
+    tree = FileSystemTree.__new__(FileSystemTree)
+    if os.path.isfile(path):
+        TMTree.__init__(tree, name, [], os.path.getsize(path))
+    else:
+        subtrees = [_legacy_file_system_tree(os.path.join(path, item))
+                    for item in os.listdir(path)]
+        TMTree.__init__(tree, name, subtrees, get_subtree_size(path))
+    return tree
+
+
+class _CountingEntry:
+    """An os.DirEntry wrapper that counts calls to stat.
+    """
+    _entry: os.DirEntry
+    _counts: Dict[str, int]
+
+    def __init__(self, entry: os.DirEntry, counts: Dict[str, int]) -> None:
+        self._entry = entry
+        self._counts = counts
+
+    def __getattr__(self, item: str) -> object:
+        return getattr(self._entry, item)
+
+    def stat(self, *args: object, **kwargs: object) -> os.stat_result:
+        """Count this call, then return the wrapped entry's stat result.
+        """
+        self._counts['stat'] += 1
+        return self._entry.stat(*args, **kwargs)
+
+
+class _CountingScandir:
+    """An os.scandir replacement that counts directory listings and the stat
+    calls made on the entries it returns.
+    """
+    _iterator: object
+    _counts: Dict[str, int]
+
+    def __init__(self, real_scandir: Callable, path: str,
+                 counts: Dict[str, int]) -> None:
+        counts['list'] += 1
+        self._iterator = real_scandir(path)
+        self._counts = counts
+
+    def __enter__(self) -> '_CountingScandir':
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self._iterator.close()
+
+    def __iter__(self) -> '_CountingScandir':
+        return self
+
+    def __next__(self) -> _CountingEntry:
+        return _CountingEntry(next(self._iterator), self._counts)
+
+
+def _count_file_system_calls(build: Callable[[str], TMTree],
+                             path: str) -> Dict[str, int]:
+    """Return the number of directory listings and stat calls made by
+    <build> when it is called on <path>.
+    """
+    counts = {'list': 0, 'stat': 0}
+    real_stat, real_listdir, real_scandir = os.stat, os.listdir, os.scandir
+
+    def counting_stat(*args: object, **kwargs: object) -> os.stat_result:
+        counts['stat'] += 1
+        return real_stat(*args, **kwargs)
+
+    def counting_listdir(*args: object) -> List[str]:
+        counts['list'] += 1
+        return real_listdir(*args)
+
+    os.stat = counting_stat
+    os.listdir = counting_listdir
+    os.scandir = lambda p: _CountingScandir(real_scandir, p, counts)
+    try:
+        build(path)
+    finally:
+        os.stat, os.listdir, os.scandir = real_stat, real_listdir, real_scandir
+    return counts
+
+
+class _DictTree:
+    """A node with the attributes of a FileSystemTree, stored in a __dict__
+    the way they were before TMTree used __slots__.
+    """
+    rect: Tuple[int, int, int, int]
+    data_size: int
+    _colour: Tuple[int, int, int]
+    _name: str
+    _subtrees: List['_DictTree']
+    _parent_tree: Optional['_DictTree']
+    _expanded: bool
+    _mtime: Optional[int]
+    _path: Optional[str]
+    _pending: bool
+
+    def __init__(self, name: str, data_size: int) -> None:
+        self.rect = (0, 0, 0, 0)
+        self._name = name
+        self._subtrees = []
+        self._parent_tree = None
+        self._expanded = False
+        self._colour = (randint(0, 255), randint(0, 255), randint(0, 255))
+        self.data_size = data_size
+        self._mtime = None
+        self._path = None
+        self._pending = False
+
+
+def _bytes_per_node(build: Callable[[str, int], object],
+                    count: int) -> float:
+    """Return the average number of bytes allocated for each of <count> nodes
+    built by <build>, not counting their names.
+    """
+    names = [f'file{i}.txt' for i in range(count)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    nodes = [build(name, i) for i, name in enumerate(names)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # do not count the list that holds the nodes
+    return (after - before) / len(nodes) - 8
+
+
+def _make_tree(count: int, fanout: int = 10) -> PaperTree:
+    """Return a synthetic tree with at least <count> leaves, in which every
+    internal node has <fanout> subtrees.
+    """
+    level = [PaperTree(f'paper{i}', [], citations=i % 97 + 1)
+             for i in range(count)]
+    while len(level) > 1:
+        level = [PaperTree(f'category{i}', level[i:i + fanout])
+                 for i in range(0, len(level), fanout)]
+    return level[0]
+
+
+def _legacy_get_rectangles(tree: TMTree) -> List[Tuple[
+        Tuple[int, int, int, int], Tuple[int, int, int]]]:
+    """Return the rectangles of the displayed leaves of <tree> the way
+    get_rectangles did before it was written as an iterator: by extending a
+    new list at every level of the tree.
+    """
+    if not tree._subtrees or not tree._expanded:
+        return [(tree.rect, tree._colour)]
+    rectangles = []
+    for subtree in tree._subtrees:
+        rectangles.extend(_legacy_get_rectangles(subtree))
+    return rectangles
+
+
+def _write_papers(path: str, count: int) -> None:
+    """Write a synthetic dataset of <count> papers to the file at <path>, with
+    the columns and line endings of cs1_papers.csv.
+    """
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file, lineterminator='\r')
+        writer.writerow(['Author', 'Title', 'Year', 'Category', 'Url',
+                         'Citations'])
+        for i in range(count):
+            writer.writerow([f'Author {i % 1000}, A.', f'Paper {i}',
+                             1970 + i % 50,
+                             f'topic{i % 7}: area{i % 13}: detail{i % 101}',
+                             f'http://doi.acm.org/10.1145/{i}', i % 97])
+
+
+def _legacy_load_papers_to_dict(rows: Optional[Dict[int, List[str]]] = None
+                                ) -> Dict:
+    """Return the papers in papers.DATA_FILE as nested dictionaries, by year
+    and then by category, the way the tree of all papers used to be built
+    before it was built while reading the file: by collecting the categories
+    of every paper first, and then inserting them all. Each paper is keyed by
+    the number of the line its row ends on.
+
+    If <rows> is given, also store each row in it, under the same key.
+    """
+    data_dict = {}
+    categories = []
+    with open(papers.DATA_FILE, newline='') as data_file:
+        file = csv.reader(data_file)
+        next(file)
+        for x in file:
+            categories.append([x[2]] + x[3].split(': ') + [file.line_num])
+            if rows is not None:
+                rows[file.line_num] = x
+    for category in categories:
+        level = data_dict
+        for header in category:
+            level = level.setdefault(header, {})
+    return data_dict
+
+
+def _legacy_build_tree_from_dict(nested_dict: Dict,
+                                 rows: Optional[Dict[int, List[str]]] = None
+                                 ) -> List[PaperTree]:
+    """Return a list of trees from the nested dictionary <nested_dict> made by
+    _legacy_load_papers_to_dict, taking the row of each paper from <rows>,
+    or, if <rows> is None, by reading the file again up to the row of each
+    paper, as the tree of all papers used to be built.
+    """
+    output = []
+    for key, value in nested_dict.items():
+        if not value:
+            data = None
+            if rows is not None:
+                data = rows.get(key)
+            else:
+                with open(papers.DATA_FILE) as file:
+                    reader = csv.reader(file)
+                    row = next(reader, None)
+                    while row is not None:
+                        if reader.line_num == key:
+                            data = row
+                            row = None
+                        else:
+                            row = next(reader, None)
+            if data:
+                output.append(PaperTree(data[1], [],
+                                        data[0], data[4], int(data[5])))
+        else:
+            output.append(PaperTree(key, _legacy_build_tree_from_dict(value,
+                                                                      rows)))
+    return output
+
+
+def _legacy_papers_with_row_index() -> List[PaperTree]:
+    """Return the trees at the top of the tree of all papers, built from
+    nested dictionaries and an index of the rows of the file.
+    """
+    rows = {}
+    return _legacy_build_tree_from_dict(_legacy_load_papers_to_dict(rows),
+                                        rows)
+
+
+def _time(function: Callable[[], object], repeat: int = 3) -> float:
+    """Return the best wall time, in seconds, of <repeat> calls to
+    <function>.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+##############################################################################
+# Benchmarks
+##############################################################################
+
+
+def bench_file_system_tree(depth: int = 4, folders: int = 4,
+                           files: int = 8) -> List[Tuple[str, int, int,
+                                                         float]]:
+    """Compare the current FileSystemTree constructor, serial and with a pool
+    of threads, with the old one that walked every folder again to compute
+    its size.
+
+    Return a (name, listings, stat calls, seconds) tuple for each builder.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as root:
+        _make_directory(root, depth, folders, files)
+        for name, build in [('legacy', _legacy_file_system_tree),
+                            ('scandir', FileSystemTree),
+                            ('8 threads', lambda p: FileSystemTree(p, 8))]:
+            counts = _count_file_system_calls(build, root)
+            seconds = _time(lambda b=build: b(root))
+            results.append((name, counts['list'], counts['stat'], seconds))
+    return results
+
+
+def bench_snapshot(depth: int = 4, folders: int = 4,
+                   files: int = 8) -> List[Tuple[str, float]]:
+    """Compare scanning a synthetic directory with loading it from a
+    snapshot, when nothing has changed and when one folder has changed.
+
+    Return a (name, seconds) tuple for each case.
+    """
+    with tempfile.TemporaryDirectory() as root:
+        data = os.path.join(root, 'data')
+        os.mkdir(data)
+        _make_directory(data, depth, folders, files)
+        snapshot = os.path.join(root, 'data.snapshot')
+        FileSystemTree(data).save_snapshot(snapshot)
+        results = [('scan', _time(lambda: FileSystemTree(data))),
+                   ('snapshot', _time(
+                       lambda: FileSystemTree(data, snapshot=snapshot)))]
+        with open(os.path.join(data, 'folder0', 'new.txt'), 'w') as file:
+            file.write('new')
+        results.append(('changed', _time(
+            lambda: FileSystemTree(data, snapshot=snapshot))))
+    return results
+
+
+def bench_node_memory(count: int = 100000) -> List[Tuple[str, float]]:
+    """Measure the memory used by each tree node, with the attributes in a
+    __dict__ and in __slots__.
+
+    Return a (name, bytes per node) tuple for each layout.
+    """
+    def file_tree(name: str, size: int) -> FileSystemTree:
+        tree = FileSystemTree.__new__(FileSystemTree)
+        TMTree.__init__(tree, name, [], size)
+        tree._mtime, tree._path, tree._pending = None, None, False
+        return tree
+
+    return [('__dict__', _bytes_per_node(_DictTree, count)),
+            ('FileSystemTree', _bytes_per_node(file_tree, count)),
+            ('PaperTree', _bytes_per_node(
+                lambda name, size: PaperTree(name, [], citations=size),
+                count))]
+
+
+def bench_tree_store(count: int = 200000) -> List[Tuple[str, float, float,
+                                                         float]]:
+    """Compare a tree of objects with the same tree in a TreeStore, laid out
+    with plain loops and, if NumPy is installed, one level at a time.
+
+    Return a (name, megabytes, seconds for update_rectangles, seconds for
+    update_data_sizes) tuple for each backend.
+    """
+    tracemalloc.start()
+    tree = _make_tree(count)
+    objects = tracemalloc.get_traced_memory()[0]
+    store = TreeStore(tree)
+    arrays = tracemalloc.get_traced_memory()[0] - objects
+    tracemalloc.stop()
+    tree.expand_all()
+    root = store.root()
+    root.expand_all()
+    rect = (0, 0, 1200, 670)
+    results = [('objects', objects / 2 ** 20,
+                _time(lambda: tree.update_rectangles(rect)),
+                _time(tree.update_data_sizes))]
+    numpy = tm_store._numpy
+    tm_store._numpy = lambda: None
+    results.append(('TreeStore', arrays / 2 ** 20,
+                    _time(lambda: root.update_rectangles(rect)),
+                    _time(root.update_data_sizes)))
+    tm_store._numpy = numpy
+    if numpy() is not None:
+        results.append(('+ NumPy', arrays / 2 ** 20,
+                        _time(lambda: root.update_rectangles(rect)),
+                        _time(root.update_data_sizes)))
+    return results
+
+
+def bench_layouts(count: int = 200000) -> List[Tuple[str, int, int, float]]:
+    """Compare the slice-and-dice and squarified layouts of a synthetic tree
+    with every node expanded.
+
+    Return a (name, visible rectangles, rectangles less than 2 pixels wide or
+    tall, seconds for update_rectangles) tuple for each layout.
+    """
+    tree = _make_tree(count)
+    tree.expand_all()
+    rect = (0, 0, 1200, 670)
+    results = []
+    for name, layout in [('slice', slice_and_dice),
+                         ('squarified', squarified)]:
+        seconds = _time(lambda l=layout: tree.update_rectangles(rect, l))
+        visible = [(w, h) for (_, _, w, h), _ in tree.get_rectangles()
+                   if w > 0 and h > 0]
+        results.append((name, len(visible),
+                        sum(1 for w, h in visible if min(w, h) < 2), seconds))
+    return results
+
+
+def bench_min_area(count: int = 1000000) -> List[Tuple[int, int, float,
+                                                        float]]:
+    """Measure laying out and drawing a synthetic tree with every node
+    expanded, with and without culling subtrees smaller than a few pixels.
+
+    Return a (min_area, rectangles drawn, seconds for update_rectangles,
+    seconds for get_rectangles) tuple for each cutoff.
+    """
+    tree = _make_tree(count)
+    tree.expand_all()
+    rect = (0, 0, 1200, 670)
+    results = []
+    for min_area in [0, 1, 16]:
+        layout = _time(lambda m=min_area: tree.update_rectangles(
+            rect, slice_and_dice, m))
+        draw = _time(lambda m=min_area: tree.get_rectangles(m))
+        results.append((min_area, len(tree.get_rectangles(min_area)),
+                        layout, draw))
+    return results
+
+
+def bench_keypress(count: int = 1000000) -> List[Tuple[str, int, float,
+                                                        float]]:
+    """Measure the work the visualiser does for one K_UP keypress on a leaf
+    of a synthetic tree with every node expanded: change_size, then
+    possibly update_data_sizes, then laying out the tree again in full or
+    with relayout.
+
+    Return a (name, min_area, seconds for the keypress, seconds spent laying
+    out) tuple for each way of handling the keypress and each cutoff.
+    """
+    tree = _make_tree(count)
+    tree.expand_all()
+    leaf = tree
+    while leaf._subtrees:
+        leaf = leaf._subtrees[len(leaf._subtrees) // 2]
+    rect = (0, 0, 1200, 670)
+    results = []
+    for min_area in [0, 16]:
+        for name, update_sizes, lay_out in [
+                ('full', True, tree.update_rectangles),
+                ('relayout', True, tree.relayout),
+                ('delta', False, tree.relayout)]:
+            tree.update_rectangles(rect, slice_and_dice, min_area)
+            layout = []
+
+            def keypress(f: Callable = lay_out, u: bool = update_sizes,
+                         m: int = min_area) -> None:
+                leaf.change_size(0.01)
+                if u:
+                    tree.update_data_sizes()
+                start = time.perf_counter()
+                f(rect, slice_and_dice, m)
+                layout.append(time.perf_counter() - start)
+
+            results.append((name, min_area, _time(keypress), min(layout)))
+    return results
+
+
+def bench_hover(files: int = 100000, lookups: int = 2000) -> List[Tuple[
+        str, float, float]]:
+    """Measure hover lookups over a folder with <files> files, laid out with
+    each layout, with get_tree_at_position and with a spatial index.
+
+    Return a (name, seconds to build, microseconds per lookup) tuple for
+    each layout and each way of looking up.
+    """
+    tree = PaperTree('wide', [PaperTree(f'file{i}', [], citations=i % 97 + 1)
+                              for i in range(files)])
+    tree.expand()
+    rect = (0, 0, 1200, 670)
+    positions = [(randint(0, 1200), randint(0, 670)) for _ in range(lookups)]
+    results = []
+    for name, layout in [('slice', slice_and_dice),
+                         ('squarified', squarified)]:
+        tree.update_rectangles(rect, layout)
+        walk = _time(lambda: [tree.get_tree_at_position(p)
+                              for p in positions], repeat=1)
+        results.append((f'{name} tree', 0.0, walk / lookups * 1e6))
+        build = _time(lambda: SpatialIndex(tree))
+        index = SpatialIndex(tree)
+        lookup = _time(lambda: [index.get_tree_at_position(p)
+                                for p in positions])
+        results.append((f'{name} index', build, lookup / lookups * 1e6))
+    return results
+
+
+def bench_get_rectangles(count: int = 2 ** 20) -> List[Tuple[str, float]]:
+    """Compare the ways of getting the rectangles to draw for a deep binary
+    tree with <count> leaves and every node expanded.
+
+    Return a (name, seconds) tuple for each way.
+    """
+    tree = _make_tree(count, fanout=2)
+    tree.expand_all()
+    tree.update_rectangles((0, 0, 1200, 670))
+    display_list = tree.get_rectangles()
+    return [('recursive', _time(lambda: _legacy_get_rectangles(tree))),
+            ('get_rectangles', _time(tree.get_rectangles)),
+            ('iterator', _time(lambda: sum(1 for _ in tree.iter_rectangles()))),
+            ('cached', _time(lambda: display_list))]
+
+
+def bench_render(count: int = 100000, frames: int = 200) -> List[Tuple[
+        str, float]]:
+    """Measure the CPU time the visualiser spends drawing each frame of a
+    synthetic tree with every node expanded, using SDL's dummy video driver:
+    when drawing every rectangle and the whole screen each frame, as it used
+    to, and with render_display while idle, while the hovered leaf changes
+    every frame, and while the selected leaf (and so the text) changes every
+    frame.
+
+    Return a (name, milliseconds of CPU time per frame) tuple for each case.
+    """
+    # pygame is only needed by this benchmark, and the video driver has to be
+    # chosen before the display is initialised
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import pygame
+    from treemap_visualiser import Visualiser
+
+    tree = _make_tree(count)
+    tree.expand_all()
+    visualiser = Visualiser()
+    pygame.init()
+    try:
+        visualiser.screen = pygame.display.set_mode(
+            (visualiser.width, visualiser.height))
+        visualiser.tree = tree
+        visualiser._relayout(full=True)
+        visualiser.render_display()
+        leaves = tree._displayed_leaves(visualiser.min_area)
+
+        def draw_everything() -> None:
+            visualiser.screen.fill(pygame.Color('black'))
+            for rect, colour in tree.get_rectangles(visualiser.min_area):
+                pygame.draw.rect(visualiser.screen, colour, rect)
+            pygame.draw.rect(visualiser.screen, (255, 255, 255),
+                             leaves[0].rect, 2)
+            pygame.display.flip()
+
+        def hover(frame: int) -> None:
+            visualiser.hover_node = leaves[frame % 2 * (len(leaves) // 2)]
+            visualiser.render_display()
+
+        def select(frame: int) -> None:
+            visualiser.selected_node = leaves[frame % 2 * (len(leaves) // 2)]
+            visualiser.render_display()
+
+        results = []
+        for name, draw in [('everything', lambda frame: draw_everything()),
+                           ('idle', lambda frame: visualiser.render_display()),
+                           ('hover', hover), ('select', select)]:
+            start = time.process_time()
+            for frame in range(frames):
+                draw(frame)
+            results.append((name, (time.process_time() - start) / frames
+                            * 1000))
+        return results
+    finally:
+        pygame.quit()
+
+
+def bench_idle(count: int = 100000, seconds: float = 1.0) -> List[Tuple[
+        str, float]]:
+    """Measure the CPU time used by the visualiser's event loop while nobody
+    touches it, using SDL's dummy video driver: when it polls for events and
+    draws every time round the loop, as it used to, and when it waits for
+    events.
+
+    Return a (name, CPU seconds per idle second) tuple for each loop.
+    """
+    # pygame is only needed by this benchmark, and the video driver has to be
+    # chosen before the display is initialised
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import pygame
+    from treemap_visualiser import Visualiser
+
+    tree = _make_tree(count)
+    tree.expand_all()
+    visualiser = Visualiser()
+
+    def polling_loop() -> None:
+        while pygame.event.poll().type != pygame.QUIT:
+            visualiser.hover_node = visualiser.tree.get_tree_at_position(
+                pygame.mouse.get_pos(), visualiser.min_area)
+            visualiser.render_display()
+
+    def waiting_loop() -> None:
+        visualiser.event_loop()
+
+    results = []
+    pygame.init()
+    try:
+        visualiser.screen = pygame.display.set_mode(
+            (visualiser.width, visualiser.height))
+        visualiser.tree = tree
+        for name, loop in [('poll', polling_loop), ('wait', waiting_loop)]:
+            visualiser._relayout(full=True)
+            visualiser._get_tree_at_position((0, 0))
+            visualiser.render_display()
+            pygame.event.clear()
+            # end the loop with a QUIT event after <seconds>
+            pygame.time.set_timer(pygame.QUIT, int(seconds * 1000), 1)
+            start, cpu = time.perf_counter(), time.process_time()
+            loop()
+            results.append((name, (time.process_time() - cpu)
+                            / (time.perf_counter() - start)))
+    finally:
+        pygame.quit()
+    return results
+
+
+def bench_resize(count: int = 100000, sizes: int = 30) -> List[Tuple[
+        str, int, float]]:
+    """Measure the time taken to follow the edge of the window being dragged
+    through <sizes> different sizes, one every 1/60 s, using SDL's dummy
+    video driver: when the tree is laid out and drawn again at every size,
+    as it used to be, and when the visualiser's event loop handles it.
+
+    Return a (name, number of full layouts, seconds) tuple for each case,
+    where the time runs from the first resize until the display fits the
+    last size.
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import pygame
+    from treemap_visualiser import Visualiser
+
+    tree = _make_tree(count)
+    tree.expand_all()
+    visualiser = Visualiser()
+    steps = [(visualiser.width - 10 * i, visualiser.height - 5 * i)
+             for i in range(1, sizes + 1)]
+    layouts = 0
+    update_rectangles = TMTree.update_rectangles
+
+    def counting_update_rectangles(self: TMTree, *args, **kwargs) -> None:
+        nonlocal layouts
+        if self is tree:
+            layouts += 1
+        update_rectangles(self, *args, **kwargs)
+
+    def every_size() -> None:
+        for width, height in steps:
+            visualiser.width, visualiser.height = width, height
+            visualiser.screen = pygame.display.set_mode(
+                (width, height), pygame.RESIZABLE)
+            visualiser._relayout(full=True)
+            visualiser.render_display()
+
+    def drag() -> None:
+        for width, height in steps:
+            pygame.event.post(pygame.event.Event(
+                pygame.VIDEORESIZE, w=width, h=height, size=(width, height)))
+            time.sleep(1 / 60)
+
+    def debounced() -> None:
+        sender = threading.Thread(target=drag)
+        sender.start()
+        # stop the event loop as soon as the display fits the last size
+        resize = visualiser._resize
+
+        def resize_then_quit(size: Tuple[int, int]) -> None:
+            resize(size)
+            if size == steps[-1]:
+                pygame.event.post(pygame.event.Event(pygame.QUIT))
+        visualiser._resize = resize_then_quit
+        try:
+            visualiser.event_loop()
+        finally:
+            del visualiser._resize
+            sender.join()
+
+    results = []
+    pygame.init()
+    TMTree.update_rectangles = counting_update_rectangles
+    try:
+        for name, follow in [('every size', every_size),
+                             ('debounced', debounced)]:
+            visualiser.width, visualiser.height = 1200, 700
+            visualiser.screen = pygame.display.set_mode(
+                (visualiser.width, visualiser.height), pygame.RESIZABLE)
+            visualiser.tree = tree
+            visualiser._relayout(full=True)
+            visualiser.render_display()
+            pygame.event.clear()
+            layouts = 0
+            start = time.perf_counter()
+            follow()
+            results.append((name, layouts, time.perf_counter() - start))
+    finally:
+        TMTree.update_rectangles = update_rectangles
+        pygame.quit()
+    return results
+
+
+def bench_image_files(count: int = 1000000) -> List[Tuple[str, float,
+                                                          float]]:
+    """Measure the time and the peak memory taken to write the treemap of a
+    synthetic tree with every node expanded to each kind of image file, and
+    the peak memory taken by the list of its rectangles that get_rectangles
+    returns, which the image writers never build.
+
+    Return a (name, seconds, peak MB) tuple for each case.
+    """
+    tree = _make_tree(count)
+    tree.expand_all()
+    results = []
+    with tempfile.TemporaryDirectory() as root:
+        for name, write in [
+                ('png', lambda: render(tree, os.path.join(root, 't.png'))),
+                ('svg', lambda: render(tree, os.path.join(root, 't.svg'))),
+                ('rectangle list', tree.get_rectangles)]:
+            seconds = _time(write, repeat=1)
+            tracemalloc.start()
+            write()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results.append((name, seconds, peak / 2 ** 20))
+    return results
+
+
+def bench_render_folders(count: int = 8, depth: int = 4, folders: int = 4,
+                         files: int = 8) -> List[Tuple[str, float]]:
+    """Measure the time taken to write a PNG treemap of each of <count>
+    synthetic folders, one after another and with render_folders.
+
+    Return a (name, seconds) tuple for each case.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as root:
+        jobs = []
+        for i in range(count):
+            folder = os.path.join(root, f'volume{i}')
+            os.mkdir(folder)
+            _make_directory(folder, depth, folders, files)
+            jobs.append((folder, folder + '.png'))
+
+        def one_at_a_time() -> None:
+            for folder, image in jobs:
+                tree = FileSystemTree(folder)
+                tree.expand_all()
+                render(tree, image)
+
+        for name, draw in [('one at a time', one_at_a_time),
+                           ('render_folders', lambda: render_folders(jobs))]:
+            results.append((name, _time(draw, repeat=1)))
+    return results
+
+
+def bench_papers(counts: Tuple[int, ...] = (10000, 100000, 1000000),
+                 legacy_counts: Tuple[int, ...] = (1000, 2000, 4000)
+                 ) -> List[Tuple[str, int, float]]:
+    """Measure the time taken to build the tree of all papers from synthetic
+    datasets of each size in <counts>, and, with the old loader that read the
+    file again for every paper, of each size in <legacy_counts>. The tree is
+    built both from nested dictionaries and an index of the rows of the file,
+    as it was before it was built while reading the file, and by PaperTree.
+
+    Return a (name, papers, microseconds per paper) tuple for each dataset.
+    """
+    results = []
+    data_file = papers.DATA_FILE
+    with tempfile.TemporaryDirectory() as root:
+        try:
+            for name, sizes, build in [
+                    ('legacy', legacy_counts,
+                     lambda: _legacy_build_tree_from_dict(
+                         _legacy_load_papers_to_dict())),
+                    ('row index', counts, _legacy_papers_with_row_index),
+                    ('streaming', counts,
+                     lambda: PaperTree('CS1', [], all_papers=True))]:
+                for count in sizes:
+                    papers.DATA_FILE = os.path.join(root, f'{count}.csv')
+                    _write_papers(papers.DATA_FILE, count)
+                    seconds = _time(build, repeat=1)
+                    results.append((name, count, seconds / count * 10 ** 6))
+        finally:
+            papers.DATA_FILE = data_file
+    return results
+
+
+def bench_papers_memory(count: int = 200000) -> List[Tuple[str, float]]:
+    """Measure the peak memory taken to build the tree of all papers from a
+    synthetic dataset of <count> papers, from nested dictionaries and an index
+    of the rows of the file, and by PaperTree, and the memory taken by the
+    tree itself.
+
+    Return a (name, peak MB) tuple for each case.
+    """
+    results = []
+    data_file = papers.DATA_FILE
+    with tempfile.TemporaryDirectory() as root:
+        papers.DATA_FILE = os.path.join(root, 'papers.csv')
+        try:
+            _write_papers(papers.DATA_FILE, count)
+            for name, build in [
+                    ('nested dicts', _legacy_papers_with_row_index),
+                    ('streaming',
+                     lambda: PaperTree('CS1', [], all_papers=True))]:
+                tracemalloc.start()
+                tree = build()
+                size, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                del tree
+                results.append((name, peak / 2 ** 20))
+            results.append(('tree', size / 2 ** 20))
+        finally:
+            papers.DATA_FILE = data_file
+    return results
+
+
+def bench_paper_sources(count: int = 200000) -> List[Tuple[str, float, float,
+                                                           float]]:
+    """Measure the time and the peak memory taken to build the tree of all
+    papers from a synthetic dataset of <count> papers, in each format
+    PaperTree can read.
+
+    Return a (name, file MB, seconds, peak MB) tuple for each format.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as root:
+        csv_path = os.path.join(root, 'papers.csv')
+        _write_papers(csv_path, count)
+        with open(csv_path, newline='') as file:
+            text = file.read()
+            file.seek(0)
+            jsonl = ''.join(json.dumps(row) + '\n'
+                            for row in csv.DictReader(file))
+        paths = [csv_path]
+        for name, contents, opener in [('papers.csv.gz', text, gzip.open),
+                                       ('papers.csv.bz2', text, bz2.open),
+                                       ('papers.jsonl', jsonl, open),
+                                       ('papers.jsonl.gz', jsonl, gzip.open)]:
+            paths.append(os.path.join(root, name))
+            with opener(paths[-1], 'wt', newline='') as file:
+                file.write(contents)
+        del text, jsonl
+        for path in paths:
+            seconds = _time(lambda p=path: PaperTree('CS1', [],
+                                                     all_papers=True,
+                                                     source=p), repeat=1)
+            tracemalloc.start()
+            tree = PaperTree('CS1', [], all_papers=True, source=path)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            del tree
+            results.append((os.path.basename(path),
+                            os.path.getsize(path) / 2 ** 20, seconds,
+                            peak / 2 ** 20))
+    return results
+
+
+def bench_papers_cache(count: int = 200000) -> List[Tuple[str, float,
+                                                          float]]:
+    """Measure the time taken to read the papers of a synthetic dataset of
+    <count> papers, plain and compressed with gzip, and to build the tree of
+    all papers from it: without a cache, when saving the cache, and from the
+    cache.
+
+    Return a (name, seconds to read the papers, seconds to build the tree)
+    tuple for each case.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as root:
+        csv_path = os.path.join(root, 'papers.csv')
+        _write_papers(csv_path, count)
+        gzip_path = csv_path + '.gz'
+        with open(csv_path, 'rb') as file, gzip.open(gzip_path, 'wb') as out:
+            out.write(file.read())
+        for path in [csv_path, gzip_path]:
+            cache = path + '.cache'
+            for name, cache_file in [('no cache', None), ('saving', cache),
+                                     ('cached', cache)]:
+                if name == 'saving' and os.path.exists(cache):
+                    os.remove(cache)
+                read = _time(lambda c=cache_file, p=path: sum(
+                    1 for _ in papers._load_papers(p, c)), repeat=1)
+                if name == 'saving':
+                    os.remove(cache)
+                build = _time(lambda c=cache_file, p=path: PaperTree(
+                    'CS1', [], all_papers=True, source=p, cache=c), repeat=1)
+                results.append(('{} {}'.format(os.path.basename(path), name),
+                                read, build))
+    return results
+
+
+def bench_papers_parallel(count: int = 200000,
+                          workers: Tuple[int, ...] = (1, 2, 4)
+                          ) -> List[Tuple[int, float]]:
+    """Measure the time taken to build the tree of all papers from a
+    synthetic dataset of <count> papers, serially and parsing parts of the
+    file with each number of processes in <workers>.
+
+    Return a (number of processes, seconds) tuple for each case.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'papers.csv')
+        _write_papers(path, count)
+        for max_workers in workers:
+            seconds = _time(lambda w=max_workers: PaperTree(
+                'CS1', [], all_papers=True, source=path, max_workers=w),
+                repeat=1)
+            results.append((max_workers, seconds))
+    return results
+
+
+if __name__ == '__main__':
+    print('FileSystemTree construction')
+    for result in bench_file_system_tree():
+        print('  {:<9} {:>7} listings {:>8} stat calls {:>9.4f}s'
+              .format(*result))
+    print('FileSystemTree snapshots')
+    for result in bench_snapshot():
+        print('  {:<9} {:>9.4f}s'.format(*result))
+    print('Memory per tree node')
+    for result in bench_node_memory():
+        print('  {:<14} {:>7.1f} bytes'.format(*result))
+    print('Tree backends')
+    for result in bench_tree_store():
+        print('  {:<9} {:>7.1f}MB  layout {:.4f}s  sizes {:.4f}s'
+              .format(*result))
+    print('Layouts')
+    for result in bench_layouts():
+        print('  {:<10} {:>7} visible {:>7} slivers {:>9.4f}s'
+              .format(*result))
+    print('Culling small subtrees')
+    for result in bench_min_area():
+        print('  min_area {:<3} {:>7} rectangles  layout {:.4f}s  '
+              'get_rectangles {:.4f}s'.format(*result))
+    print('K_UP keypress')
+    for result in bench_keypress():
+        print('  {:<8} min_area {:<3} {:>9.4f}s  of which layout {:.4f}s'
+              .format(*result))
+    print('Rectangles to draw')
+    for result in bench_get_rectangles():
+        print('  {:<15} {:>9.4f}s'.format(*result))
+    print('Drawing a frame')
+    for result in bench_render():
+        print('  {:<10} {:>9.3f}ms'.format(*result))
+    print('Idle event loop')
+    for result in bench_idle():
+        print('  {:<5} {:>7.1%} of a core'.format(*result))
+    print('Resizing the window')
+    for result in bench_resize():
+        print('  {:<10} {:>3} layouts {:>9.4f}s'.format(*result))
+    print('Image files')
+    for result in bench_image_files():
+        print('  {:<15} {:>9.4f}s {:>7.1f}MB'.format(*result))
+    print('Image files of several folders')
+    for result in bench_render_folders():
+        print('  {:<15} {:>9.4f}s'.format(*result))
+    print('Papers dataset')
+    for result in bench_papers():
+        print('  {:<9} {:>8} papers {:>9.1f}us per paper'.format(*result))
+    print('Memory to build the papers tree')
+    for result in bench_papers_memory():
+        print('  {:<12} {:>7.1f}MB'.format(*result))
+    print('Papers dataset formats')
+    for result in bench_paper_sources():
+        print('  {:<16} {:>7.1f}MB file {:>9.4f}s {:>7.1f}MB peak'
+              .format(*result))
+    print('Papers cache')
+    for result in bench_papers_cache():
+        print('  {:<22} read {:>8.4f}s  build {:>8.4f}s'.format(*result))
+    print('Parsing papers in parallel')
+    for result in bench_papers_parallel():
+        print('  {} processes {:>9.4f}s'.format(*result))
+    print('Hover lookups')
+    for result in bench_hover():
+        print('  {:<16} build {:.4f}s {:>10.2f}us per lookup'
+              .format(*result))
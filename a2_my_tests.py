@@ -37,13 +37,33 @@ IMPORTANT NOTES:
       machines.  This is a second reason why you should run this test module
       there.
 """
+import bz2
+import csv
+import ctypes
+import ctypes.util
+import errno
+import gzip
+import io
+import json
 import math
 import os
+import sys
+import xml.etree.ElementTree
 
+import pytest
 from hypothesis import given
-from hypothesis.strategies import integers
+from hypothesis.strategies import integers, lists
 
-from tm_trees import TMTree, FileSystemTree
+from fs_watch import InotifyWatcher, PollingWatcher, Watcher, make_watcher
+import fs_watch
+import papers
+import tm_store
+from papers import PaperTree
+from tm_index import SpatialIndex
+from tm_render import render, render_folders
+from tm_store import TreeStore
+from tm_trees import TMTree, FileSystemTree, get_subtree_size, \
+    slice_and_dice, squarified, _merge_rectangles
 
 # This should be the path to the "workshop" folder in the sample data.
 # You may need to modify this, depending on where you downloaded and
@@ -254,11 +274,1042 @@ def test_delete_self() -> None:
     assert tree not in tree_parent._subtrees
 
 
+def test_folder_sizes_match_disk() -> None:
+    """
+    Test that every folder's size is the total size of the files inside it
+    """
+    tree = FileSystemTree(EXAMPLE_PATH)
+    stack = [(tree, EXAMPLE_PATH)]
+    while stack:
+        subtree, path = stack.pop()
+        assert subtree.data_size == get_subtree_size(path)
+        for child in subtree._subtrees:
+            stack.append((child, os.path.join(path, child._name)))
+
+
+def test_empty_folder(tmp_path) -> None:
+    """
+    Test that an empty folder is a tree with no subtrees and a size of 0
+    """
+    os.mkdir(tmp_path / 'empty')
+    tree = FileSystemTree(str(tmp_path))
+    assert len(tree._subtrees) == 1
+    assert tree._subtrees[0]._name == 'empty'
+    assert tree._subtrees[0]._subtrees == []
+    assert tree.data_size == 0
+
+
+def test_parallel_scan_matches_serial() -> None:
+    """
+    Test that a parallel scan builds the same tree as a serial scan
+    """
+    serial = FileSystemTree(EXAMPLE_PATH)
+    parallel = FileSystemTree(EXAMPLE_PATH, max_workers=4)
+    assert _tree_shape(parallel) == _tree_shape(serial)
+    for subtree in parallel._subtrees:
+        assert subtree._parent_tree is parallel
+
+
+def test_snapshot_round_trip(tmp_path) -> None:
+    """
+    Test that a tree loaded from a snapshot is the same as the saved tree
+    """
+    snapshot = str(tmp_path / 'workshop.snapshot')
+    tree = FileSystemTree(EXAMPLE_PATH)
+    tree.save_snapshot(snapshot)
+    loaded = FileSystemTree(EXAMPLE_PATH, snapshot=snapshot)
+    assert _tree_shape(loaded) == _tree_shape(tree)
+    for subtree in loaded._subtrees:
+        assert subtree._parent_tree is loaded
+
+
+def test_snapshot_rescans_changed_folders(tmp_path) -> None:
+    """
+    Test that loading a snapshot picks up files added and removed since it
+    was saved
+    """
+    folder = tmp_path / 'data'
+    os.makedirs(folder / 'a' / 'b')
+    (folder / 'a' / 'b' / 'old.txt').write_text('12345')
+    (folder / 'top.txt').write_text('12')
+    snapshot = str(tmp_path / 'data.snapshot')
+    FileSystemTree(str(folder)).save_snapshot(snapshot)
+
+    os.remove(folder / 'a' / 'b' / 'old.txt')
+    (folder / 'a' / 'b' / 'new.txt').write_text('1234567')
+    os.mkdir(folder / 'c')
+    (folder / 'c' / 'other.txt').write_text('1')
+    loaded = FileSystemTree(str(folder), snapshot=snapshot)
+    assert _tree_shape(loaded) == _tree_shape(FileSystemTree(str(folder)))
+    assert loaded.data_size == 10
+
+
+def test_snapshot_for_other_path_is_ignored(tmp_path) -> None:
+    """
+    Test that a snapshot saved for a different folder is not used
+    """
+    snapshot = str(tmp_path / 'prep.snapshot')
+    FileSystemTree(os.path.join(EXAMPLE_PATH, 'prep')).save_snapshot(snapshot)
+    tree = FileSystemTree(EXAMPLE_PATH, snapshot=snapshot)
+    assert tree._name == 'workshop'
+    assert tree.data_size == 151
+
+
+def test_snapshot_follows_lazy(tmp_path) -> None:
+    """
+    Test that a snapshot loaded with lazy=True only keeps the folders inside
+    the root, and that a snapshot of a lazy tree loaded with lazy=False reads
+    the whole tree
+    """
+    expected = _tree_shape(FileSystemTree(EXAMPLE_PATH))
+    snapshot = str(tmp_path / 'workshop.snapshot')
+    FileSystemTree(EXAMPLE_PATH).save_snapshot(snapshot)
+    tree = FileSystemTree(EXAMPLE_PATH, snapshot=snapshot, lazy=True)
+    assert tree.data_size == 151
+    activities = _find_subtree(tree, 'activities')
+    assert activities._pending
+    assert activities._subtrees == []
+    activities.expand_all()
+    assert _tree_shape(activities) == _tree_shape(
+        FileSystemTree(os.path.join(EXAMPLE_PATH, 'activities')))
+
+    tree = FileSystemTree(EXAMPLE_PATH, lazy=True)
+    tree.expand()
+    tree.save_snapshot(snapshot)
+    tree = FileSystemTree(EXAMPLE_PATH, snapshot=snapshot)
+    assert not _find_subtree(tree, 'activities')._pending
+    assert _tree_shape(tree) == expected
+
+
+def test_damaged_snapshot_is_ignored(tmp_path) -> None:
+    """
+    Test that a truncated or corrupt snapshot is not used, and the folder is
+    scanned again instead
+    """
+    folder = tmp_path / 'data'
+    os.makedirs(folder / 'a')
+    (folder / 'a' / 'longname.txt').write_text('12345')
+    snapshot = tmp_path / 'data.snapshot'
+    FileSystemTree(str(folder)).save_snapshot(str(snapshot))
+    data = snapshot.read_bytes()
+    expected = _tree_shape(FileSystemTree(str(folder)))
+
+    snapshot.write_bytes(data[:-3])
+    assert _tree_shape(FileSystemTree(str(folder), snapshot=str(snapshot))) \
+        == expected
+
+    # the parent of the second tree is set to itself
+    corrupt = bytearray(data)
+    parents = len(data) - 25 * 3 - len(b'data\0a\0longname.txt')
+    corrupt[parents + 8:parents + 16] = (1).to_bytes(8, sys.byteorder,
+                                                     signed=True)
+    snapshot.write_bytes(bytes(corrupt))
+    assert _tree_shape(FileSystemTree(str(folder), snapshot=str(snapshot))) \
+        == expected
+
+
+def test_refresh_patches_changed_folders(tmp_path) -> None:
+    """
+    Test that refresh updates changed folders in place and keeps the sizes of
+    every ancestor correct
+    """
+    folder = tmp_path / 'data'
+    os.makedirs(folder / 'a' / 'b')
+    (folder / 'a' / 'b' / 'old.txt').write_text('12345')
+    (folder / 'a' / 'keep.txt').write_text('12')
+    tree = FileSystemTree(str(folder))
+    a = _find_subtree(tree, 'a')
+    b = _find_subtree(a, 'b')
+    assert not tree.refresh()
+
+    (folder / 'a' / 'b' / 'new.txt').write_text('1234567')
+    os.mkdir(folder / 'c')
+    (folder / 'c' / 'other.txt').write_text('1')
+    assert tree.refresh()
+    assert _find_subtree(tree, 'a') is a
+    assert _find_subtree(a, 'b') is b
+    assert _tree_shape(tree) == _tree_shape(FileSystemTree(str(folder)))
+    assert b.data_size == 12
+    assert a.data_size == 14
+    assert tree.data_size == 15
+
+
+def test_update_folder(tmp_path) -> None:
+    """
+    Test that update_folder picks up a file that grew in place, without a
+    change to its folder's modification time
+    """
+    folder = tmp_path / 'data'
+    os.makedirs(folder / 'a')
+    (folder / 'a' / 'log.txt').write_text('12')
+    tree = FileSystemTree(str(folder))
+    with open(folder / 'a' / 'log.txt', 'a') as file:
+        file.write('345')
+    a = tree.update_folder(str(folder / 'a'))
+    assert a is _find_subtree(tree, 'a')
+    assert a.data_size == 5
+    assert tree.data_size == 5
+    assert tree.update_folder(str(folder / 'missing')) is None
+
+
+def test_polling_watcher(tmp_path) -> None:
+    """
+    Test that the polling watcher reports the folders that changed, parents
+    first
+    """
+    os.makedirs(tmp_path / 'a' / 'b')
+    os.makedirs(tmp_path / 'c')
+    watcher = PollingWatcher(str(tmp_path), interval=0)
+    assert watcher.poll() == []
+    (tmp_path / 'a' / 'b' / 'new.txt').write_text('1')
+    os.mkdir(tmp_path / 'a' / 'd')
+    assert watcher.poll() == [str(tmp_path / 'a'), str(tmp_path / 'a' / 'b')]
+    watcher.close()
+
+
+def test_polling_watcher_spreads_scans(tmp_path, monkeypatch) -> None:
+    """
+    Test that the polling watcher lists at least one folder per poll, and
+    spreads a scan that takes longer than its budget over several polls
+    """
+    os.makedirs(tmp_path / 'a' / 'b')
+    os.makedirs(tmp_path / 'c')
+    watcher = PollingWatcher(str(tmp_path), interval=0)
+    monkeypatch.setattr(fs_watch, '_SCAN_BUDGET', 0)
+    (tmp_path / 'a' / 'b' / 'new.txt').write_text('1')
+    (tmp_path / 'c' / 'new.txt').write_text('1')
+    # one poll for each of the 4 folders, then a new scan starts
+    reports = [watcher.poll() for _ in range(5)]
+    assert all(len(report) <= 1 for report in reports)
+    assert reports[0] == [] and reports[4] == []
+    assert sorted(sum(reports, [])) == [str(tmp_path / 'a' / 'b'),
+                                        str(tmp_path / 'c')]
+    watcher.close()
+
+
+def test_inotify_watcher(tmp_path) -> None:
+    """
+    Test that the inotify watcher reports the folders that changed, including
+    folders created after it started
+    """
+    try:
+        watcher = InotifyWatcher(str(tmp_path))
+    except OSError:
+        pytest.skip('inotify is not available')
+    assert watcher.poll() == []
+    os.mkdir(tmp_path / 'a')
+    assert watcher.poll() == [str(tmp_path)]
+    (tmp_path / 'a' / 'new.txt').write_text('1')
+    assert watcher.poll() == [str(tmp_path / 'a')]
+    watcher.close()
+
+
+def test_inotify_watcher_switches_to_scanning(tmp_path) -> None:
+    """
+    Test that the inotify watcher scans every folder instead once a new
+    folder cannot be watched
+    """
+    try:
+        watcher = InotifyWatcher(str(tmp_path), interval=0)
+    except OSError:
+        pytest.skip('inotify is not available')
+    libc = watcher._libc
+    watcher._libc = _FullLibc()
+    os.mkdir(tmp_path / 'a')
+    assert watcher.poll() == [str(tmp_path)]
+    (tmp_path / 'a' / 'new.txt').write_text('1')
+    assert watcher.poll() == [str(tmp_path / 'a')]
+    watcher.close()
+
+    watcher._libc = _FullLibc()
+    with pytest.raises(OSError):
+        watcher._watch_tree(str(tmp_path))
+    watcher._libc = libc
+
+
+def test_make_watcher_without_libc(monkeypatch, tmp_path) -> None:
+    """
+    Test that make_watcher falls back to polling when there is no C library
+    """
+    monkeypatch.setattr(ctypes.util, 'find_library', lambda name: None)
+    watcher = make_watcher(str(tmp_path))
+    assert isinstance(watcher, PollingWatcher)
+    watcher.close()
+
+
+def test_lazy_tree_loads_on_expand() -> None:
+    """
+    Test that a lazy tree only reads a folder's subtrees when it is expanded
+    """
+    tree = FileSystemTree(EXAMPLE_PATH, lazy=True)
+    assert tree.data_size == 151
+    assert tree.get_suffix() == ' (folder, 151.00B)'
+    assert tree._subtrees == []
+    tree.expand()
+    assert len(tree._subtrees) == 3
+    assert tree.get_suffix() == ' (folder, 3 items, 151.00B)'
+    activities = _find_subtree(tree, 'activities')
+    assert activities._subtrees == []
+    assert activities.data_size == get_subtree_size(
+        os.path.join(EXAMPLE_PATH, 'activities'))
+    activities.change_size(1.0)
+    assert activities._subtrees == []
+    assert tree.data_size == 151
+
+
+def test_lazy_tree_expand_all() -> None:
+    """
+    Test that expanding every folder of a lazy tree reads the whole tree
+    """
+    tree = FileSystemTree(EXAMPLE_PATH, lazy=True)
+    tree.expand_all()
+    assert _tree_shape(tree) == _tree_shape(FileSystemTree(EXAMPLE_PATH))
+
+
+def test_lazy_tree_expand_all_lists_each_folder_once(monkeypatch) -> None:
+    """
+    Test that expanding every folder of a lazy tree lists each folder once,
+    as a full scan does
+    """
+    listings = []
+    scandir = os.scandir
+
+    def counting_scandir(path):
+        listings.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, 'scandir', counting_scandir)
+    FileSystemTree(EXAMPLE_PATH)
+    eager = len(listings)
+
+    tree = FileSystemTree(EXAMPLE_PATH, lazy=True)
+    listings.clear()
+    tree.expand_all()
+    assert len(listings) == eager
+    assert _tree_shape(tree) == _tree_shape(FileSystemTree(EXAMPLE_PATH))
+
+
+def test_lazy_tree_refresh(tmp_path) -> None:
+    """
+    Test that refresh only walks a folder whose subtrees have not been read
+    yet when its own modification time changed, and that update_folder picks
+    up a change deeper inside it
+    """
+    folder = tmp_path / 'data'
+    os.makedirs(folder / 'x' / 'y')
+    (folder / 'x' / 'y' / 'old.txt').write_text('123')
+    tree = FileSystemTree(str(folder), lazy=True)
+    tree.expand()
+    x = _find_subtree(tree, 'x')
+    assert x._pending
+    assert not tree.refresh()
+
+    (folder / 'x' / 'y' / 'new.txt').write_text('1234567')
+    assert not tree.refresh()
+    assert tree.update_folder(str(folder / 'x' / 'y')) is x
+    assert x.data_size == 10
+    assert tree.data_size == 10
+
+    (folder / 'x' / 'top.txt').write_text('1')
+    assert tree.refresh()
+    assert x._pending
+    assert tree.data_size == 11
+
+    snapshot = str(tmp_path / 'data.snapshot')
+    tree.save_snapshot(snapshot)
+    (folder / 'x' / 'more.txt').write_text('12')
+    assert FileSystemTree(str(folder), snapshot=snapshot).data_size == 13
+
+
+def test_tree_store_matches_tree() -> None:
+    """
+    Test that a TreeStore lays out, draws and hit-tests exactly like the tree
+    it was built from
+    """
+    tree = FileSystemTree(EXAMPLE_PATH)
+    _sort_subtrees(tree)
+    tree.expand_all()
+    root = TreeStore(tree).root()
+    for rect in [(0, 0, 200, 100), (10, 20, 37, 301), (0, 0, 1, 1)]:
+        tree.update_rectangles(rect)
+        root.update_rectangles(rect)
+        assert root.get_rectangles() == tree.get_rectangles()
+        for x in range(-1, 202, 3):
+            for y in range(-1, 102, 3):
+                expected = tree.get_tree_at_position((x, y))
+                actual = root.get_tree_at_position((x, y))
+                assert (actual is None) == (expected is None)
+                if actual is not None:
+                    assert actual.get_path_string() == \
+                        expected.get_path_string()
+
+
+def test_tree_store_edits() -> None:
+    """
+    Test that deleting, moving and resizing views changes the store like it
+    would change the tree
+    """
+    tree = FileSystemTree(EXAMPLE_PATH)
+    _sort_subtrees(tree)
+    root = TreeStore(tree).root()
+    activities = _find_subtree(root, 'activities')
+    assert _find_subtree(root, 'activities') is activities
+    plan = _find_subtree(activities, 'Plan.tex')
+    assert plan.delete_self()
+    assert plan.get_parent() is activities
+    assert plan not in activities._subtrees
+    draft = _find_subtree(root, 'draft.pptx')
+    draft.change_size(1.0)
+    assert draft.data_size == 116
+    draft.move(_find_subtree(root, 'prep'))
+    assert _find_subtree(root, 'prep')._subtrees[-1] is draft
+    assert draft.get_path_string() == os.path.join('workshop', 'prep',
+                                                   'draft.pptx')
+    assert root.data_size == 151 + 58 - plan.data_size
+    assert root.update_data_sizes() == root.data_size
+    assert root.get_suffix() == ' (folder, 2 items, {:.2f}B)'.format(
+        root.data_size)
+
+
+def test_tree_store_frees_unused_views() -> None:
+    """
+    Test that a store only keeps the views that are still in use, and that
+    a node keeps the same view while it is in use
+    """
+    tree = FileSystemTree(EXAMPLE_PATH)
+    tree.expand_all()
+    store = TreeStore(tree)
+    root = store.root()
+    root.update_rectangles((0, 0, 200, 100))
+    assert len(root.get_rectangles()) > 1
+    assert root.get_tree_at_position((1, 1)) is not None
+    activities = _find_subtree(root, 'activities')
+    assert _find_subtree(root, 'activities') is activities
+    assert set(store._views.values()) == {root, activities}
+
+
+@pytest.mark.parametrize('vectorised', [True, False])
+def test_tree_store_layout_matches_tree(monkeypatch, vectorised) -> None:
+    """
+    Test that a TreeStore lays out every node of a larger tree exactly like
+    the tree does, with and without NumPy
+    """
+    if not vectorised:
+        monkeypatch.setattr(tm_store, '_numpy', lambda: None)
+    elif tm_store._numpy() is None:
+        pytest.skip('NumPy is not installed')
+    tree = _paper_levels([(i * 7919) % 1000 * (i % 5) for i in range(400)],
+                         7, 9)[0][0]
+    store = TreeStore(tree)
+    for rect in [(0, 0, 1200, 670), (3, 5, 97, 1301), (0, 0, 64, 48)]:
+        tree.update_rectangles(rect)
+        store.root().update_rectangles(rect)
+        assert [store.view(i).rect for i in store._preorder(0)] == \
+            _preorder_rects(tree)
+
+
+@given(lists(integers(min_value=0, max_value=1000), max_size=40),
+       integers(min_value=0, max_value=300),
+       integers(min_value=0, max_value=300))
+def test_squarified_fills_rect(sizes, width, height) -> None:
+    """
+    Test that the squarified layout fills its rectangle exactly, with no
+    overlaps, and gives subtrees of size 0 no area
+    """
+    rects = squarified(sizes, sum(sizes), (7, 11, width, height))
+    assert len(rects) == len(sizes)
+    covered = set()
+    for size, (x, y, w, h) in zip(sizes, rects):
+        assert w >= 0 and h >= 0
+        assert 7 <= x and x + w <= 7 + width
+        assert 11 <= y and y + h <= 11 + height
+        if size == 0:
+            assert w * h == 0
+        pixels = {(i, j) for i in range(x, x + w) for j in range(y, y + h)}
+        assert not covered & pixels
+        covered |= pixels
+    assert len(covered) == (width * height if any(sizes) else 0)
+
+
+def test_squarified_avoids_slivers() -> None:
+    """
+    Test that a folder with many equal files gets nearly square rectangles
+    from the squarified layout, where slice-and-dice makes slivers
+    """
+    sizes = [1] * 1000
+    rect = (0, 0, 1200, 670)
+    slivers = slice_and_dice(sizes, 1000, rect)[:-1]
+    assert all(w == 1 for _, _, w, _ in slivers)
+    for _, _, w, h in squarified(sizes, 1000, rect):
+        assert 1 / 3 <= w / h <= 3
+
+
+def test_tree_layouts() -> None:
+    """
+    Test that the layout is used for every level of the tree, and that a
+    TreeStore lays out a tree exactly like the tree does with it
+    """
+    tree = FileSystemTree(EXAMPLE_PATH)
+    _sort_subtrees(tree)
+    tree.expand_all()
+    store = TreeStore(tree)
+    for layout in [slice_and_dice, squarified]:
+        tree.update_rectangles((0, 0, 200, 100), layout)
+        store.root().update_rectangles((0, 0, 200, 100), layout)
+        assert [store.view(i).rect for i in store._preorder(0)] == \
+            _preorder_rects(tree)
+    area = sum(w * h for (_, _, w, h), _ in tree.get_rectangles())
+    assert area == 200 * 100
+    tree.update_rectangles((0, 0, 200, 100))
+    expected = _preorder_rects(tree)
+    tree.update_rectangles((0, 0, 200, 100), slice_and_dice)
+    assert _preorder_rects(tree) == expected
+
+
+def test_merge_rectangles() -> None:
+    """
+    Test that rectangles sharing a whole side are merged into a grey block,
+    and that rectangles with no area are left out
+    """
+    red, blue = (255, 0, 0), (0, 0, 255)
+    assert _merge_rectangles([((0, 2, 3, 2), red), ((0, 0, 3, 2), blue),
+                              ((3, 0, 0, 4), red), ((5, 5, 1, 1), red)]) \
+        == [((0, 0, 3, 4), (128, 128, 128)), ((5, 5, 1, 1), red)]
+    assert _merge_rectangles([((0, 0, 2, 2), red), ((2, 0, 2, 2), blue)]) \
+        == [((0, 0, 4, 2), (128, 128, 128))]
+
+
+@pytest.mark.parametrize('vectorised', [True, False])
+@pytest.mark.parametrize('layout', [slice_and_dice, squarified])
+def test_min_area(monkeypatch, vectorised, layout) -> None:
+    """
+    Test that subtrees smaller than min_area are neither laid out, drawn nor
+    hit-tested on their own, that what is drawn still fills the treemap, and
+    that a TreeStore culls the same subtrees
+    """
+    if not vectorised:
+        monkeypatch.setattr(tm_store, '_numpy', lambda: None)
+    (tree,), middle, _ = _paper_levels(
+        [i % 13 + 1 + (i % 50 == 0) * 3000 for i in range(2000)], 20)
+    tree.expand_all()
+    store = TreeStore(tree)
+    store.root().expand_all()
+    rect = (0, 0, 120, 90)
+    tree.update_rectangles(rect, layout, 16)
+    store.root().update_rectangles(rect, layout, 16)
+    assert [store.view(i).rect for i in store._preorder(0)] == \
+        _preorder_rects(tree)
+    culled = [m for m in middle if m.rect[2] * m.rect[3] < 16]
+    assert culled
+    for subtree in culled:
+        assert all(leaf.rect == (0, 0, 0, 0) for leaf in subtree._subtrees)
+    rectangles = tree.get_rectangles(16)
+    assert store.root().get_rectangles(16) == rectangles
+    assert all(w > 0 and h > 0 for (_, _, w, h), _ in rectangles)
+    assert sum(w * h for (_, _, w, h), _ in rectangles) == 120 * 90
+    assert len(rectangles) < len(tree.get_rectangles())
+    for x in range(0, 121, 7):
+        for y in range(0, 91, 7):
+            hit = tree.get_tree_at_position((x, y), 16)
+            assert hit is not None
+            assert not hit._subtrees or hit.rect[2] * hit.rect[3] < 16
+            view = store.root().get_tree_at_position((x, y), 16)
+            assert view.get_path_string() == hit.get_path_string()
+
+
+@pytest.mark.parametrize('layout', [slice_and_dice, squarified])
+@pytest.mark.parametrize('min_area', [0, 16])
+def test_relayout_matches_update_rectangles(layout, min_area) -> None:
+    """
+    Test that relayout after each change lays out the tree exactly like
+    update_rectangles would, and lays out nothing when nothing has changed
+    """
+    calls = []
+
+    def counting_layout(sizes, total, rect):
+        calls.append(rect)
+        return layout(sizes, total, rect)
+
+    (tree,), _, middle, leaves = _paper_levels(
+        [i % 17 + 1 for i in range(600)], 6, 10)
+    rect = (0, 0, 300, 200)
+    tree.update_rectangles(rect, counting_layout, min_area)
+    full_calls = len(calls)
+    calls.clear()
+    tree.relayout(rect, counting_layout, min_area)
+    assert not calls
+
+    edits = [lambda: leaves[5].change_size(0.5),
+             lambda: leaves[300].change_size(-0.5),
+             lambda: leaves[42].delete_self(),
+             lambda: leaves[7].move(middle[80]),
+             lambda: leaves[599].change_size(3.0)]
+    for edit in edits:
+        edit()
+        calls.clear()
+        tree.relayout(rect, counting_layout, min_area)
+        assert len(calls) < full_calls
+        incremental = _preorder_rects(tree)
+        tree.update_rectangles(rect, layout, min_area)
+        assert incremental == _preorder_rects(tree)
+
+
+@pytest.mark.parametrize('in_store', [False, True])
+def test_edits_keep_sizes_up_to_date(in_store) -> None:
+    """
+    Test that change_size, move and delete_self keep the size of every
+    ancestor up to date, without update_data_sizes
+    """
+    tree = FileSystemTree(EXAMPLE_PATH)
+    _sort_subtrees(tree)
+    if in_store:
+        tree = TreeStore(tree).root()
+    draft = _find_subtree(tree, 'draft.pptx')
+    activities = _find_subtree(tree, 'activities')
+    images = _find_subtree(activities, 'images')
+    draft.change_size(0.5)
+    draft.move(images)
+    _find_subtree(activities, 'Plan.tex').delete_self()
+    _find_subtree(images, 'Q2.pdf').change_size(-0.5)
+    cats = _find_subtree(_find_subtree(_find_subtree(tree, 'prep'), 'images'),
+                         'Cats.pdf')
+    cats.move(images)
+    sizes = _subtree_sizes(tree)
+    tree.update_data_sizes()
+    assert _subtree_sizes(tree) == sizes
+
+
+@pytest.mark.parametrize('layout', [slice_and_dice, squarified])
+@pytest.mark.parametrize('min_area', [0, 16])
+def test_spatial_index_matches_tree(layout, min_area) -> None:
+    """
+    Test that a spatial index finds the same leaf as get_tree_at_position
+    everywhere, including on the edges between rectangles and outside the
+    treemap
+    """
+    wide = PaperTree('wide', [PaperTree(str(i), [], citations=i % 7)
+                              for i in range(600)])
+    example = FileSystemTree(EXAMPLE_PATH)
+    _sort_subtrees(example)
+    tree = PaperTree('root', [wide, PaperTree('small', [], citations=2000)])
+    tree.expand_all()
+    example.expand()
+    _find_subtree(example, 'activities').expand_all()
+    for root in [tree, example, TreeStore(tree).root()]:
+        root.update_rectangles((5, 3, 301, 97), layout, min_area)
+        index = SpatialIndex(root, min_area)
+        for x in range(0, 310):
+            for y in range(0, 104, 4):
+                assert index.get_tree_at_position((x, y)) is \
+                    root.get_tree_at_position((x, y), min_area)
+
+
+def test_spatial_index_empty_tree() -> None:
+    """
+    Test that nothing is found in a tree of size 0
+    """
+    tree = PaperTree('empty', [PaperTree('a', [], citations=0)])
+    tree.update_rectangles((0, 0, 100, 100))
+    assert SpatialIndex(tree).get_tree_at_position((0, 0)) is None
+
+
+@pytest.mark.parametrize('min_area', [0, 16])
+def test_iter_rectangles(min_area) -> None:
+    """
+    Test that iter_rectangles yields the same rectangles as get_rectangles,
+    in the same order as a recursive walk of the tree
+    """
+    (tree,), _, middle, _ = _paper_levels(
+        [i % 11 + 1 for i in range(500)], 5, 10)
+    tree.expand_all()
+    for subtree in middle[::3]:
+        subtree.collapse()
+    tree.update_rectangles((0, 0, 400, 300), squarified, min_area)
+    expected = _recursive_rectangles(tree, min_area)
+    assert list(tree.iter_rectangles(min_area)) == expected
+    assert tree.get_rectangles(min_area) == expected
+    root = TreeStore(tree).root()
+    assert list(root.iter_rectangles(min_area)) == expected
+
+
+def test_shorten_path() -> None:
+    """
+    Test that the status bar shortens the longest names of a path until it
+    fits, and never shortens a name below 3 characters
+    """
+    visualiser = _import_visualiser()
+    shorten = visualiser._shorten_path
+    assert shorten('a/bb/ccc', '/', 20) == 'a/bb/ccc'
+    assert shorten('workshop/activities/Plan.tex', '/', 27) == \
+        'workshop/activit../Plan.tex'
+    assert shorten('workshop/activities/Plan.tex', '/', 24) == \
+        'works../activ../Plan...'
+    assert shorten('abcdef/abcdefgh', '/', 1) == 'a../a..'
+    assert shorten('ab/cd', '/', 1) == 'ab/cd'
+
+
+def test_render_display_draws_only_changes(monkeypatch) -> None:
+    """
+    Test that the visualiser only sends the parts of the screen that changed
+    to the display, and nothing when the display has not changed
+    """
+    pygame, visualiser = _headless_visualiser()
+    try:
+        updates = []
+        _count_display_updates(monkeypatch, pygame, updates)
+        visualiser.render_display()
+        assert updates == []
+        visualiser.hover_node = visualiser._get_tree_at_position((1, 1))
+        visualiser.render_display()
+        assert len(updates) == 1 and updates[0] != 'flip'
+        visualiser.render_display()
+        assert len(updates) == 1
+    finally:
+        pygame.quit()
+
+
+def test_resize_is_debounced(monkeypatch) -> None:
+    """
+    Test that resizing the window through several sizes lays out and draws
+    the treemap again only once, at the last size
+    """
+    pygame, visualiser = _headless_visualiser()
+    module = _import_visualiser()
+    try:
+        updates = []
+        _count_display_updates(monkeypatch, pygame, updates)
+        sizes = []
+        resize = visualiser._resize
+
+        def counting_resize(size):
+            sizes.append(size)
+            resize(size)
+
+        monkeypatch.setattr(visualiser, '_resize', counting_resize)
+        for i in range(1, 6):
+            pygame.event.post(pygame.event.Event(
+                pygame.VIDEORESIZE, w=600 - 10 * i, h=400 - 10 * i))
+        # end the event loop once the resize is due
+        pygame.time.set_timer(pygame.QUIT, module._RESIZE_DELAY + 200, 1)
+        visualiser.event_loop()
+        assert sizes == [(550, 350)]
+        assert updates.count('flip') == 1
+        assert visualiser.tree.rect == (0, 0, 550,
+                                        350 - visualiser.font_height)
+    finally:
+        pygame.quit()
+
+
+def test_watched_removal_forgets_trees(tmp_path) -> None:
+    """
+    Test that a selected file that is removed on disk while it is watched is
+    no longer selected, so keys pressed afterwards do not change the tree
+    """
+    folder = tmp_path / 'data'
+    os.makedirs(folder / 'sub')
+    (folder / 'sub' / 'gone.txt').write_text('12345')
+    (folder / 'sub' / 'kept.txt').write_text('12')
+    (folder / 'other.txt').write_text('1')
+    pygame, visualiser = _headless_visualiser(str(folder))
+    try:
+        tree = visualiser.tree
+        sub = _find_subtree(tree, 'sub')
+        gone = _find_subtree(sub, 'gone.txt')
+        x, y, width, height = gone.rect
+
+        def remove() -> list:
+            os.remove(folder / 'sub' / 'gone.txt')
+            for key in [pygame.K_UP, pygame.K_DELETE]:
+                pygame.event.post(pygame.event.Event(pygame.KEYUP, key=key))
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+            return [str(folder / 'sub')]
+
+        visualiser.watch(tree, _ScriptedWatcher([list, remove]))
+        pygame.event.post(pygame.event.Event(
+            pygame.MOUSEBUTTONUP, button=1,
+            pos=(x + width // 2, y + height // 2)))
+        visualiser.event_loop()
+        assert gone.get_parent() is None
+        assert visualiser.selected_node is None
+        assert _find_subtree(tree, 'sub') is sub
+        assert [subtree._name for subtree in sub._subtrees] == ['kept.txt']
+        assert tree.data_size == 3
+        assert tree.data_size == sum(subtree.data_size
+                                     for subtree in tree._subtrees)
+    finally:
+        pygame.quit()
+
+
+@pytest.mark.parametrize('layout', [slice_and_dice, squarified])
+def test_render_png(tmp_path, layout) -> None:
+    """
+    Test that a treemap written to a PNG file has the same pixels as the
+    visualiser draws for it
+    """
+    pygame = pytest.importorskip('pygame')
+    tree = _paper_levels([i % 7 + 1 for i in range(300)], 30)[0][0]
+    tree.expand_all()
+    path = str(tmp_path / 'treemap.png')
+    render(tree, path, (301, 203), layout, min_area=16)
+
+    expected = pygame.Surface((301, 203))
+    expected.fill((0, 0, 0))
+    for rect, colour in tree.get_rectangles(min_area=16):
+        pygame.draw.rect(expected, colour, rect)
+    actual = pygame.image.load(path)
+    assert actual.get_size() == (301, 203)
+    assert pygame.image.tobytes(actual, 'RGB') \
+        == pygame.image.tobytes(expected, 'RGB')
+
+
+def test_render_svg(tmp_path) -> None:
+    """
+    Test that a treemap written to an SVG file has one rect for each
+    rectangle to draw, after the background
+    """
+    tree = FileSystemTree(EXAMPLE_PATH)
+    tree.expand_all()
+    path = str(tmp_path / 'treemap.svg')
+    render(tree, path, (200, 100))
+    root = xml.etree.ElementTree.parse(path).getroot()
+    assert root.get('width') == '200' and root.get('height') == '100'
+    rects = [(int(rect.get('x')), int(rect.get('y')), int(rect.get('width')),
+              int(rect.get('height'))) for rect in root[1:]]
+    assert rects == [rect for rect, _ in tree.get_rectangles()
+                     if rect[2] > 0 and rect[3] > 0]
+
+
+def test_render_unknown_format(tmp_path) -> None:
+    """
+    Test that rendering to a file that is neither a PNG nor an SVG fails
+    """
+    tree = FileSystemTree(EXAMPLE_PATH)
+    with pytest.raises(ValueError):
+        render(tree, str(tmp_path / 'treemap.gif'))
+    assert not os.path.exists(tmp_path / 'treemap.gif')
+
+
+def test_render_folders(tmp_path) -> None:
+    """
+    Test rendering several folders in parallel, to both formats
+    """
+    folders = [EXAMPLE_PATH, os.path.join(EXAMPLE_PATH, 'prep')]
+    jobs = [(folder, str(tmp_path / (os.path.basename(folder) + extension)))
+            for folder in folders for extension in ['.png', '.svg']]
+    render_folders(jobs, (120, 80), squarified, processes=2)
+    for folder, image in jobs:
+        tree = FileSystemTree(folder)
+        tree.expand_all()
+        tree.update_rectangles((0, 0, 120, 80), squarified)
+        if image.endswith('.png'):
+            with open(image, 'rb') as file:
+                header = file.read(24)
+            assert header.startswith(b'\x89PNG\r\n\x1a\n')
+            assert header[16:24] == (120).to_bytes(4, 'big') \
+                + (80).to_bytes(4, 'big')
+        else:
+            root = xml.etree.ElementTree.parse(image).getroot()
+            assert len(root) - 1 == sum(1 for (_, _, w, h), _
+                                        in tree.get_rectangles()
+                                        if w > 0 and h > 0)
+
+
+@pytest.mark.parametrize('by_year', [True, False])
+def test_papers_from_file(tmp_path, monkeypatch, by_year) -> None:
+    """
+    Test building the tree of all papers from a dataset file with the columns
+    of cs1_papers.csv
+    """
+    path = tmp_path / 'papers.csv'
+    path.write_bytes(
+        b'Author,Title,Year,Category,Url,Citations\r'
+        b'"Doe, J.",First,2001,A: B,http://a,3\r'
+        b'"Roe, R.","Second, again",2001,A,http://b,5\r'
+        b'Poe,Third,1999,A: B: C,http://c,7\r')
+    monkeypatch.setattr(papers, 'DATA_FILE', str(path))
+    tree = PaperTree('CS1', [], all_papers=True, by_year=by_year)
+    assert tree.data_size == 15
+    if by_year:
+        assert [year._name for year in tree._subtrees] == ['2001', '1999']
+        a, a_1999 = tree._subtrees[0]._subtrees[0], \
+            tree._subtrees[1]._subtrees[0]
+        assert a_1999._subtrees[0]._subtrees[0]._subtrees[0]._name == 'Third'
+    else:
+        assert [category._name for category in tree._subtrees] == ['A']
+        a = tree._subtrees[0]
+    b, second = a._subtrees[:2]
+    assert b._name == 'B' and b._subtrees[0]._name == 'First'
+    assert b._subtrees[0]._authors == 'Doe, J.'
+    assert b._subtrees[0]._doi == 'http://a'
+    assert b._subtrees[0].data_size == 3
+    assert second._name == 'Second, again' and second.data_size == 5
+
+
+def _write_text(path: str, text: str) -> None:
+    """Write <text> to the file at <path>, compressed according to its
+    extension.
+    """
+    opener = {'.gz': gzip.open, '.bz2': bz2.open}.get(
+        os.path.splitext(path)[1], open)
+    with opener(path, 'wt', newline='') as file:
+        file.write(text)
+
+
+@pytest.mark.parametrize('name', ['papers.csv', 'papers.csv.gz',
+                                  'papers.csv.bz2', 'papers.jsonl',
+                                  'papers.jsonl.gz', 'papers.jsonl.bz2'])
+def test_papers_from_source(tmp_path, name) -> None:
+    """
+    Test building the tree of all papers from dataset files in each format,
+    by path and from a file object, gives the same tree as DATA_FILE
+    """
+    with open(papers.DATA_FILE, newline='') as file:
+        text = file.read()
+    if '.jsonl' in name:
+        with open(papers.DATA_FILE, newline='') as file:
+            rows = list(csv.DictReader(file))
+        text = ''.join(json.dumps(dict(row, Year=int(row['Year']),
+                                       Citations=int(row['Citations'])))
+                       + '\n' for row in rows)
+    path = str(tmp_path / name)
+    _write_text(path, text)
+
+    expected = _tree_shape(PaperTree('CS1', [], all_papers=True))
+    assert _tree_shape(
+        PaperTree('CS1', [], all_papers=True, source=path)) == expected
+    with open(path, 'rb') as file:
+        tree = PaperTree('CS1', [], all_papers=True, source=file)
+        assert not file.closed
+    assert _tree_shape(tree) == expected
+    with open(path, 'rb') as file:
+        source = io.BytesIO(file.read())
+    assert _tree_shape(
+        PaperTree('CS1', [], all_papers=True, source=source)) == expected
+    if name.endswith('.csv'):
+        # a CSV file opened in text mode is read as the csv module reads it,
+        # so it must be opened with newline=''
+        source = io.StringIO(text, newline='')
+        assert _tree_shape(
+            PaperTree('CS1', [], all_papers=True, source=source)) == expected
+
+
+def test_papers_cache(tmp_path, monkeypatch) -> None:
+    """
+    Test that the tree of all papers is built from a cache file once it has
+    been saved, until the dataset file changes or the cache is damaged
+    """
+    path = tmp_path / 'papers.csv'
+    cache = str(tmp_path / 'papers.cache')
+    path.write_bytes(
+        b'Author,Title,Year,Category,Url,Citations\r'
+        b'"D\xc3\xa9j\xc3\xa0, J.",First,2001,A: B,http://a,3\r'
+        b'Roe,"Second, again",2001,A,http://b,5\r')
+    expected = {by_year: _tree_shape(PaperTree(
+        'CS1', [], all_papers=True, by_year=by_year, source=str(path)))
+        for by_year in [True, False]}
+    tree = PaperTree('CS1', [], all_papers=True, source=str(path),
+                     cache=cache)
+    assert _tree_shape(tree) == expected[True]
+    assert os.path.exists(cache)
+
+    # the dataset file is not read again
+    read_papers = papers._read_papers
+    monkeypatch.setattr(papers, '_read_papers', lambda source: iter([]))
+    for by_year in [True, False]:
+        tree = PaperTree('CS1', [], all_papers=True, by_year=by_year,
+                         source=str(path), cache=cache)
+        assert _tree_shape(tree) == expected[by_year]
+    first = tree._subtrees[0]._subtrees[0]._subtrees[0]
+    assert first._authors == 'D\u00e9j\u00e0, J.' and first._doi == 'http://a'
+    monkeypatch.setattr(papers, '_read_papers', read_papers)
+
+    # a paper is added, while another reader has the old cache open
+    stale = papers._open_cache(cache, papers._dataset_key(str(path)))
+    with open(path, 'ab') as file:
+        file.write(b'Poe,Third,1999,C,http://c,7\r')
+    tree = PaperTree('CS1', [], all_papers=True, source=str(path),
+                     cache=cache)
+    assert tree.data_size == 15
+    assert [paper[2] for paper in stale] == ['First', 'Second, again']
+    assert sorted(os.listdir(tmp_path)) == ['papers.cache', 'papers.csv']
+
+    # the cache file is cut short
+    with open(cache, 'r+b') as file:
+        file.truncate(os.path.getsize(cache) - 1)
+    tree = PaperTree('CS1', [], all_papers=True, source=str(path),
+                     cache=cache)
+    assert tree.data_size == 15
+    monkeypatch.setattr(papers, '_read_papers', lambda source: iter([]))
+    tree = PaperTree('CS1', [], all_papers=True, source=str(path),
+                     cache=cache)
+    assert tree.data_size == 15
+
+
+@pytest.mark.parametrize('by_year', [True, False])
+def test_papers_parallel(tmp_path, monkeypatch, by_year) -> None:
+    """
+    Test that parsing a dataset file in parallel builds the same tree as
+    parsing it serially, when parts of the file end inside quoted fields that
+    hold line endings, commas and quotes
+    """
+    path = tmp_path / 'papers.csv'
+    with open(path, 'w', newline='') as file:
+        # every field but the numbers is quoted, since csv.writer does not
+        # quote a field that only holds a line feed otherwise
+        writer = csv.writer(file, lineterminator='\r',
+                            quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(papers.COLUMNS)
+        for i in range(300):
+            title = ['Plain', 'With, comma', 'Line\rbreak', 'Line\nfeed',
+                     'Both\r\nends', 'A "quoted" word'][i % 6] + str(i)
+            writer.writerow([f'Author {i % 7}', title, 2000 + i % 3,
+                             f'C{i % 4}: D{i % 5}', f'http://{i}', i % 10])
+    monkeypatch.setattr(papers, '_CHUNK_SIZE', 256)
+    ranges = papers._split_records(str(path), 2)
+    assert len(ranges) > 10
+    assert all(end == start for (_, end), (start, _)
+               in zip(ranges, ranges[1:]))
+    assert ranges[-1][1] == os.path.getsize(path)
+
+    expected = PaperTree('CS1', [], all_papers=True, by_year=by_year,
+                         source=str(path))
+    tree = PaperTree('CS1', [], all_papers=True, by_year=by_year,
+                     source=str(path), max_workers=2)
+    assert _tree_shape(tree) == _tree_shape(expected)
+    assert _paper_details(tree) == _paper_details(expected)
+    assert all(subtree._parent_tree is tree for subtree in tree._subtrees)
+
+
 ##############################################################################
 # Helpers
 ##############################################################################
 
 
+def _paper_levels(citations: list, *fanouts: int) -> list:
+    """Return the levels of a new tree of PaperTrees, from the root down to
+    the leaves, which have the given <citations>. Going up from the leaves,
+    each level groups the level below it into nodes of the next of <fanouts>
+    subtrees, and a single root holds the top level.
+    """
+    levels = [[PaperTree(str(i), [], citations=count)
+               for i, count in enumerate(citations)]]
+    for fanout in fanouts:
+        below = levels[0]
+        levels.insert(0, [PaperTree(str(i), below[i:i + fanout])
+                          for i in range(0, len(below), fanout)])
+    levels.insert(0, [PaperTree('root', levels[0])])
+    return levels
+
+
+def _paper_details(tree: TMTree) -> list:
+    """Return the name, authors and DOI of each paper in <tree>, in order.
+    """
+    if not tree._subtrees:
+        return [(tree._name, tree._authors, tree._doi)]
+    return [paper for subtree in tree._subtrees
+            for paper in _paper_details(subtree)]
+
+
 def is_valid_colour(colour: tuple[int, int, int]) -> bool:
     """Return True iff <colour> is a valid colour. That is, if all of its
     values are between 0 and 255, inclusive.
@@ -284,6 +1335,130 @@ def _sort_subtrees(tree: TMTree) -> None:
         tree._subtrees.sort(key=lambda t: t._name)
 
 
+def _find_subtree(tree: TMTree, name: str) -> TMTree:
+    """Return the subtree of <tree> called <name>.
+    """
+    for subtree in tree._subtrees:
+        if subtree._name == name:
+            return subtree
+    raise ValueError(name)
+
+
+def _subtree_sizes(tree: TMTree) -> list:
+    """Return the data_size of every node of <tree>, in pre-order.
+    """
+    sizes = [tree.data_size]
+    for subtree in tree._subtrees:
+        sizes.extend(_subtree_sizes(subtree))
+    return sizes
+
+
+def _recursive_rectangles(tree: TMTree, min_area: int) -> list:
+    """Return the rectangles of the displayed leaves of <tree>, found
+    recursively.
+    """
+    if not tree._subtrees or not tree._expanded \
+            or tree.rect[2] * tree.rect[3] < min_area:
+        return [(tree.rect, tree._colour)]
+    rectangles = []
+    small = []
+    for subtree in tree._subtrees:
+        if subtree.rect[2] * subtree.rect[3] < min_area:
+            small.append((subtree.rect, subtree._colour))
+        else:
+            rectangles.extend(_recursive_rectangles(subtree, min_area))
+    return rectangles + _merge_rectangles(small)
+
+
+def _preorder_rects(tree: TMTree) -> list:
+    """Return the rectangles of every node in <tree>, in pre-order.
+    """
+    rects = [tree.rect]
+    for subtree in tree._subtrees:
+        rects.extend(_preorder_rects(subtree))
+    return rects
+
+
+def _tree_shape(tree: TMTree) -> tuple:
+    """Return a nested tuple of the names and sizes in <tree>, in the order of
+    its subtrees.
+    """
+    return (tree._name, tree.data_size,
+            tuple(_tree_shape(subtree) for subtree in tree._subtrees))
+
+
+def _import_visualiser():
+    """Return the treemap_visualiser module, using SDL's dummy video driver
+    so that no window is opened, or skip the test if pygame is missing.
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pytest.importorskip('pygame')
+    import treemap_visualiser
+    return treemap_visualiser
+
+
+def _headless_visualiser(path: str = EXAMPLE_PATH) -> tuple:
+    """Return pygame and a Visualiser of the folder at <path> with every
+    folder expanded, which has drawn its display once.
+
+    The caller must call pygame.quit() when it is done.
+    """
+    visualiser = _import_visualiser().Visualiser()
+    import pygame
+    pygame.init()
+    visualiser.screen = pygame.display.set_mode(
+        (visualiser.width, visualiser.height), pygame.RESIZABLE)
+    visualiser.tree = FileSystemTree(path)
+    visualiser.tree.expand_all()
+    visualiser.selected_node = visualiser.tree
+    visualiser._relayout(full=True)
+    visualiser.render_display()
+    pygame.event.clear()
+    return pygame, visualiser
+
+
+def _count_display_updates(monkeypatch, pygame, updates: list) -> None:
+    """Record each call to pygame.display.flip and pygame.display.update in
+    <updates>, as 'flip' or the list of areas that were updated.
+    """
+    flip, update = pygame.display.flip, pygame.display.update
+    monkeypatch.setattr(pygame.display, 'flip',
+                        lambda: updates.append('flip') or flip())
+    monkeypatch.setattr(pygame.display, 'update',
+                        lambda areas: updates.append(areas) or update(areas))
+
+
+class _ScriptedWatcher(Watcher):
+    """A watcher that calls the next function of a script each time it is
+    polled, and reports the folders that the function returns.
+    """
+
+    def __init__(self, script: list) -> None:
+        self._script = script
+
+    def poll(self) -> list:
+        """Run the next step of the script.
+        """
+        return self._script.pop(0)() if self._script else []
+
+    def close(self) -> None:
+        """Stop watching.
+        """
+        self._script = []
+
+
+class _FullLibc:
+    """A C library whose inotify_add_watch always fails because the limit
+    on the number of watches was reached.
+    """
+
+    def inotify_add_watch(self, *_) -> int:
+        """Fail to add a watch.
+        """
+        ctypes.set_errno(errno.ENOSPC)
+        return -1
+
+
 if __name__ == '__main__':
     import pytest
 
@@ -0,0 +1,204 @@
+"""
+Assignment 2: Reading folders and snapshots from disk
+
+=== CSC148 Summer 2024 ===
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, David Liu, Diane Horton,
+                   Haocheng Hu, Jacqueline Smith
+
+=== Module Description ===
+This module contains the helpers that FileSystemTree uses to read the file
+system: listing folders (one at a time, or many at once with a pool of
+threads), computing the total size of a folder, and reading and writing
+snapshot files. Nothing here builds trees, so these helpers only deal with
+names, sizes and modification times.
+"""
+from __future__ import annotations
+
+import os
+import struct
+import sys
+from array import array
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+# The (name, size, mtime) tuples for the files and folders inside a folder, as
+# returned by list_folder
+Listing = List[Tuple[str, int, Optional[int]]]
+
+# The parents, sizes and modification times of the trees in a snapshot, a
+# byte for each tree that is 1 if it is a folder whose subtrees were not
+# saved, and the names of the trees, as returned by read_snapshot
+Snapshot = Tuple[array, array, array, bytes, List[str]]
+
+# The first bytes of a snapshot file. The last byte records the byte order of
+# the machine that wrote it, since the columns are stored in native byte
+# order.
+_SNAPSHOT_MAGIC = b'TMFS3' + sys.byteorder[0].encode()
+
+# The header that follows _SNAPSHOT_MAGIC: the number of trees, and the
+# length in bytes of the path and of the block of names
+_SNAPSHOT_HEADER = struct.Struct('<3Q')
+
+
+def folder_size(path: str) -> int:
+    """Return the total size of the files below the folder at <path>.
+
+    The folder is walked with os.scandir like du does, without building any
+    trees, so only one listing is held in memory at a time.
+    """
+    total = 0
+    folders = [path]
+    while folders:
+        with os.scandir(folders.pop()) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    total += entry.stat().st_size
+                else:
+                    folders.append(entry.path)
+    return total
+
+
+def list_folder(path: str) -> Listing:
+    """Return a (name, size, mtime) tuple for each file and folder inside the
+    folder at <path>, in the order os.scandir lists them.
+
+    For files, the mtime is None. For folders, the size is 0 and the mtime is
+    the folder's modification time in nanoseconds.
+
+    Sizes and times are read from the stat result cached on each os.DirEntry.
+    """
+    listing = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_file():
+                listing.append((entry.name, entry.stat().st_size, None))
+            else:
+                listing.append((entry.name, 0, entry.stat().st_mtime_ns))
+    return listing
+
+
+def list_folders(path: str, max_workers: int) -> Dict[str, Listing]:
+    """Return a dictionary that maps the path of the folder at <path>, and of
+    every folder below it, to its list_folder result, listing folders with a
+    pool of <max_workers> threads.
+
+    At most 2 * <max_workers> listings are handed to the pool at a time; the
+    remaining folders wait in a queue until a listing finishes.
+    """
+    listings = {}
+    waiting = deque([path])
+    running = {}
+    with ThreadPoolExecutor(max_workers) as pool:
+        while waiting or running:
+            while waiting and len(running) < 2 * max_workers:
+                folder = waiting.popleft()
+                running[pool.submit(list_folder, folder)] = folder
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                folder = running.pop(future)
+                listings[folder] = future.result()
+                waiting.extend(_subfolders(folder, listings[folder]))
+    return listings
+
+
+def _subfolders(path: str, listing: Listing) -> List[str]:
+    """Return the paths of the folders in <listing>, the list_folder result
+    for the folder at <path>.
+    """
+    return [os.path.join(path, name) for name, _, mtime in listing
+            if mtime is not None]
+
+
+def write_snapshot(filename: str, path: str, snapshot: Snapshot) -> None:
+    """Write <snapshot>, taken of the tree for the file or folder at <path>,
+    to the file <filename>.
+
+    The trees of <snapshot> are in pre-order, and the root's parent is -1.
+    The modification time of a file is -1.
+
+    The parents, sizes and modification times are stored as columns of 64-bit
+    integers, followed by the column of bytes and the names. The header
+    records the length of every part, so that a truncated file can be
+    rejected.
+    """
+    parents, sizes, mtimes, pending, names = snapshot
+    encoded_path = os.fsencode(os.path.abspath(path))
+    text = b'\0'.join(os.fsencode(name) for name in names)
+    with open(filename, 'wb') as file:
+        file.write(_SNAPSHOT_MAGIC)
+        file.write(_SNAPSHOT_HEADER.pack(len(parents), len(encoded_path),
+                                         len(text)))
+        file.write(encoded_path)
+        for column in (parents, sizes, mtimes):
+            file.write(column.tobytes())
+        file.write(pending)
+        file.write(text)
+
+
+def read_snapshot(filename: str, path: str) -> Optional[Snapshot]:
+    """Return the snapshot in the file <filename>, as written by
+    write_snapshot for the file or folder at <path>.
+
+    Return None if the file is missing, unreadable, truncated or corrupt, or
+    was written for a different path or machine.
+    """
+    try:
+        with open(filename, 'rb') as file:
+            data = file.read()
+        if not data.startswith(_SNAPSHOT_MAGIC):
+            return None
+        offset = len(_SNAPSHOT_MAGIC)
+        count, path_length, text_length = \
+            _SNAPSHOT_HEADER.unpack_from(data, offset)
+        offset += _SNAPSHOT_HEADER.size
+        if len(data) != offset + path_length + 25 * count + text_length:
+            return None
+        saved_path = data[offset:offset + path_length]
+        if saved_path != os.fsencode(os.path.abspath(path)):
+            return None
+        offset += path_length
+        parents, sizes, mtimes = (
+            _read_column(data, start, count)
+            for start in (offset, offset + 8 * count, offset + 16 * count))
+        offset += 24 * count
+        pending = data[offset:offset + count]
+        names = data[offset + count:].split(b'\0')
+    except (OSError, struct.error, ValueError):
+        return None
+    if count == 0 or len(names) != count or parents[0] != -1:
+        return None
+    # in pre-order, every parent comes before its subtrees, and is a folder
+    for i in range(1, count):
+        if not 0 <= parents[i] < i or mtimes[parents[i]] == -1:
+            return None
+    return parents, sizes, mtimes, pending, [os.fsdecode(name)
+                                             for name in names]
+
+
+def _read_column(data: bytes, offset: int, count: int) -> array:
+    """Return the column of <count> 64-bit integers that starts at <offset>
+    in <data>.
+    """
+    column = array('q')
+    column.frombytes(data[offset:offset + 8 * count])
+    return column
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'os', '__future__', 'collections',
+            'concurrent.futures', 'array', 'struct', 'sys'
+        ],
+        'allowed-io': ['write_snapshot', 'read_snapshot']
+    })
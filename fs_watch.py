@@ -0,0 +1,349 @@
+"""
+Assignment 2: Watching the file system for changes
+
+=== CSC148 Summer 2024 ===
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, David Liu, Diane Horton,
+                   Haocheng Hu, Jacqueline Smith
+
+=== Module Description ===
+This module contains watchers, which report the folders below a path whose
+contents have changed, so that a FileSystemTree can be kept up to date while
+it is being visualised.
+
+On Linux, InotifyWatcher asks the kernel for events through inotify (using
+ctypes, so no extra packages are needed). Everywhere else, PollingWatcher
+compares the contents of every folder at a fixed interval. Use make_watcher
+to get the best watcher available on this computer.
+"""
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+# Flags from <sys/inotify.h>
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+
+# The events that change the contents or the size of a folder
+_WATCH_MASK = (_IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO
+               | _IN_CREATE | _IN_DELETE)
+
+# The fixed part of a struct inotify_event: wd, mask, cookie and len
+_EVENT_HEADER = struct.Struct('iIII')
+
+# The most seconds that a call to PollingWatcher.poll spends listing folders
+_SCAN_BUDGET = 0.02
+
+
+class Watcher:
+    """Reports the folders below a path whose contents have changed.
+
+    This is an abstract class that should not be instantiated directly.
+    """
+
+    def poll(self) -> List[str]:
+        """Return the paths of the folders whose contents have changed since
+        the last call, without waiting for a change to happen.
+
+        Each path is returned at most once, and a folder is always returned
+        before any folder inside it.
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Stop watching and release any resources held by this watcher.
+        """
+        raise NotImplementedError
+
+
+class InotifyWatcher(Watcher):
+    """A watcher that uses the Linux inotify interface.
+
+    Every folder below the watched path has its own watch, and watches are
+    added for new folders as they are created. If a new folder cannot be
+    watched, for example because the limit on the number of watches was
+    reached, this watcher switches to scanning every folder like a
+    PollingWatcher.
+
+    === Private Attributes ===
+    _libc:
+        The C library, which provides the inotify functions.
+    _fd:
+        The inotify file descriptor, opened in non-blocking mode, or -1 once
+        it has been closed.
+    _watches:
+        The path of the folder for each watch descriptor.
+    _path:
+        The path of the watched folder.
+    _interval:
+        The number of seconds between two scans, once this watcher has
+        switched to scanning.
+    _fallback:
+        The PollingWatcher that this watcher has switched to, or None if it
+        still uses inotify.
+    """
+    _libc: ctypes.CDLL
+    _fd: int
+    _watches: Dict[int, str]
+    _path: str
+    _interval: float
+    _fallback: Optional[PollingWatcher]
+
+    def __init__(self, path: str, interval: float = 2.0) -> None:
+        """Start watching the folder at <path> and every folder inside it.
+        If this watcher has to switch to scanning, scan every <interval>
+        seconds.
+
+        Raise OSError if inotify is not available on this computer, or if a
+        folder cannot be watched.
+        """
+        library = ctypes.util.find_library('c')
+        if library is None:
+            raise OSError('inotify is not available')
+        self._libc = ctypes.CDLL(library, use_errno=True)
+        try:
+            inotify_init1 = self._libc.inotify_init1
+        except AttributeError as error:
+            raise OSError('inotify is not available') from error
+        self._fd = inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+        self._watches = {}
+        self._path = path
+        self._interval = interval
+        self._fallback = None
+        try:
+            self._watch_tree(path)
+        except OSError:
+            self.close()
+            raise
+
+    def _watch_tree(self, path: str) -> None:
+        """Add a watch for the folder at <path> and every folder inside it.
+
+        Raise OSError if a folder cannot be watched, unless it was removed
+        after it was listed.
+        """
+        for folder, _, _ in os.walk(path):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(folder),
+                                              _WATCH_MASK)
+            if wd >= 0:
+                self._watches[wd] = folder
+                continue
+            code = ctypes.get_errno()
+            if code not in (errno.ENOENT, errno.ENOTDIR):
+                raise OSError(code, os.strerror(code), folder)
+
+    def poll(self) -> List[str]:
+        """Return the paths of the folders whose contents have changed since
+        the last call, without waiting for a change to happen.
+
+        If a new folder cannot be watched, every folder that was watched is
+        returned, and the changes are found by scanning from then on.
+        """
+        if self._fallback is not None:
+            return self._fallback.poll()
+        changed = {}
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + _EVENT_HEADER.size:
+                            offset + _EVENT_HEADER.size + length]
+                offset += _EVENT_HEADER.size + length
+                if mask & _IN_Q_OVERFLOW:
+                    # events were lost, so any folder may have changed
+                    changed.update(dict.fromkeys(self._watches.values()))
+                elif mask & _IN_IGNORED:
+                    self._watches.pop(wd, None)
+                elif wd in self._watches:
+                    folder = self._watches[wd]
+                    changed[folder] = None
+                    if mask & _IN_ISDIR and mask & (_IN_CREATE | _IN_MOVED_TO):
+                        try:
+                            self._watch_tree(os.path.join(
+                                folder, os.fsdecode(name.rstrip(b'\0'))))
+                        except OSError:
+                            return self._switch_to_scanning()
+        return sorted(changed, key=lambda p: p.count(os.sep))
+
+    def _switch_to_scanning(self) -> List[str]:
+        """Stop using inotify and find changes with a PollingWatcher from now
+        on. Return every folder that was watched, since changes may have been
+        missed.
+        """
+        folders = list(self._watches.values())
+        self.close()
+        self._fallback = PollingWatcher(self._path, self._interval)
+        return sorted(folders, key=lambda p: p.count(os.sep))
+
+    def close(self) -> None:
+        """Stop watching and close the inotify file descriptor.
+        """
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        self._watches = {}
+        if self._fallback is not None:
+            self._fallback.close()
+
+
+class PollingWatcher(Watcher):
+    """A watcher that lists every folder below the watched path again every
+    <interval> seconds, and reports the folders whose listing changed.
+
+    Unlike a folder's modification time, the listing includes the size and
+    modification time of each file, so files that grow in place are noticed.
+
+    Each scan is spread over as many calls to poll as it needs: a call lists
+    folders for at most _SCAN_BUDGET seconds, and reports the changed folders
+    it found, so that a large tree never keeps the caller busy for long.
+
+    === Private Attributes ===
+    _path:
+        The path of the watched folder.
+    _interval:
+        The number of seconds between the end of a scan and the start of the
+        next one.
+    _next_scan:
+        The time.monotonic() value after which the next scan is due.
+    _signatures:
+        A hash of the listing of each folder, as of the last finished scan.
+    _waiting:
+        The folders that the current scan has still to list, in the order
+        they are listed, or an empty deque between scans.
+    _scanned:
+        A hash of the listing of each folder that the current scan has
+        listed.
+    """
+    _path: str
+    _interval: float
+    _next_scan: float
+    _signatures: Dict[str, int]
+    _waiting: Deque[str]
+    _scanned: Dict[str, int]
+
+    def __init__(self, path: str, interval: float = 2.0) -> None:
+        """Start watching the folder at <path> and every folder inside it,
+        scanning it every <interval> seconds.
+
+        The first scan, which only records the folders as they are, is done
+        at once.
+        """
+        self._path = path
+        self._interval = interval
+        self._signatures = {}
+        self._waiting = deque([path])
+        self._scanned = {}
+        self._scan(None)
+
+    def _scan(self, deadline: Optional[float]) -> List[str]:
+        """List folders for the current scan until it is finished, or until
+        time.monotonic() passes <deadline> if it is not None, listing at least
+        one folder. Return the folders whose listing changed since the last
+        scan.
+
+        Folders are listed breadth first, so a folder is always listed before
+        any folder inside it.
+        """
+        changed = []
+        while self._waiting:
+            folder = self._waiting.popleft()
+            signature = self._list(folder)
+            if signature is not None:
+                self._scanned[folder] = signature
+                # a new folder is not reported, since the folder that
+                # contains it has changed as well
+                if self._signatures.get(folder, signature) != signature:
+                    changed.append(folder)
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+        if not self._waiting:
+            self._signatures = self._scanned
+            self._scanned = {}
+            self._next_scan = time.monotonic() + self._interval
+        return changed
+
+    def _list(self, folder: str) -> Optional[int]:
+        """Return a hash of the listing of <folder>, or None if it cannot be
+        listed, and add the folders inside it to the folders left to list.
+        """
+        listing = []
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        listing.append((entry.name, stat.st_size,
+                                        stat.st_mtime_ns))
+                    else:
+                        listing.append((entry.name, -1, -1))
+                        self._waiting.append(entry.path)
+        except OSError:
+            return None
+        return hash(tuple(listing))
+
+    def poll(self) -> List[str]:
+        """Return the paths of the folders whose contents have changed since
+        the last call, if a scan is due or under way, or an empty list
+        otherwise.
+        """
+        if not self._waiting:
+            if time.monotonic() < self._next_scan:
+                return []
+            self._waiting.append(self._path)
+        return self._scan(time.monotonic() + _SCAN_BUDGET)
+
+    def close(self) -> None:
+        """Stop watching.
+        """
+        self._signatures = {}
+        self._scanned = {}
+        self._waiting.clear()
+
+
+def make_watcher(path: str, interval: float = 2.0) -> Watcher:
+    """Return a watcher for the folder at <path>: an InotifyWatcher if
+    inotify is available on this computer, or a PollingWatcher that scans
+    every <interval> seconds otherwise.
+    """
+    try:
+        return InotifyWatcher(path, interval)
+    except OSError:
+        return PollingWatcher(path, interval)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', '__future__', 'collections', 'ctypes',
+            'ctypes.util', 'errno', 'os', 'struct', 'time'
+        ]
+    })
@@ -58,13 +58,61 @@ Recommended steps:
    sure you have documented any new private attributes, and that PyTA passes
    on your code.
 """
+import bz2
 import csv
-from typing import List, Dict
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple, \
+    Union
 from tm_trees import TMTree
 
 # Filename for the dataset
 DATA_FILE = 'cs1_papers.csv'
 
+# The columns of the dataset, in order, which are also the keys of each paper
+# in a JSON Lines file
+COLUMNS = ('Author', 'Title', 'Year', 'Category', 'Url', 'Citations')
+
+# The first bytes of a file compressed with gzip and with bzip2
+_GZIP_MAGIC = b'\x1f\x8b'
+_BZIP2_MAGIC = b'BZh'
+
+# A paper read from a dataset: its year, its categories from the most general
+# to the most specific, and its title, authors, DOI and number of citations
+_Paper = Tuple[str, List[str], str, str, str, int]
+
+# The first bytes of a papers cache file. The last byte records the byte order
+# of the machine that wrote it, since the columns are stored in native byte
+# order.
+_CACHE_MAGIC = b'TMPAPR1' + sys.byteorder[0].encode()
+
+# The rest of the header of a papers cache file: the key of the dataset it
+# was saved for, and the number of papers, strings, category paths and names
+# in all the category paths, and the number of bytes of text
+_CACHE_HEADER = struct.Struct('<32s5Q')
+
+# The number of bytes at each end of a dataset file that its key is made from
+_KEY_SAMPLE = 64 * 1024
+
+# The largest number of bytes of a CSV dataset file that are parsed together
+# when it is parsed in parallel
+_CHUNK_SIZE = 8 * 1024 * 1024
+
+# A character that starts or ends a quoted field, or ends a record, in a CSV
+# dataset file
+_CSV_DELIMITER = re.compile(rb'["\r\n]')
+
 
 class PaperTree(TMTree):
     """A tree representation of Computer Science Education research paper data.
@@ -98,18 +146,39 @@ class PaperTree(TMTree):
     - All TMTree RIs are inherited.
     """
 
+    __slots__ = ('_authors', '_doi')
+
     _authors: str
     _doi: str
 
     def __init__(self, name: str, subtrees: List[TMTree], authors: str = '',
                  doi: str = '', citations: int = 0, by_year: bool = True,
-                 all_papers: bool = False) -> None:
+                 all_papers: bool = False,
+                 source: Union[str, os.PathLike, IO, None] = None,
+                 cache: Optional[str] = None, max_workers: int = 1) -> None:
         """Initialize a new PaperTree with the given <name> and <subtrees>,
         <authors> and <doi>, and with <citations> as the size of the data.
 
         If <all_papers> is True, then this tree is to be the root of the paper
-        tree. In that case, load data about papers from DATA_FILE to build the
-        tree.
+        tree. In that case, load data about papers from <source> to build the
+        tree: the path of a dataset file, or a dataset file open for reading,
+        or DATA_FILE if <source> is None.
+
+        A dataset file is either a CSV file with the columns in COLUMNS, or a
+        JSON Lines file with one object for each paper, whose keys are the
+        names of the columns. A file given by its path or open in binary mode
+        may also be compressed with gzip or bzip2. The file is read as it is
+        needed, so it is never held in memory or decompressed to disk.
+
+        If <cache> is given and <source> is not a file object, read the papers
+        from the file <cache> instead, if it was saved for the dataset file as
+        it is now; otherwise, read the dataset file and save its papers to
+        <cache>, so that the next tree can be built without parsing it.
+
+        If <max_workers> is greater than 1, no <cache> is given, and <source>
+        is the path of an uncompressed CSV file (or None), parse parts of the
+        file in parallel using a pool of <max_workers> processes. The
+        resulting tree is the same as the one built by a serial parse.
 
         If <all_papers> is False, Do NOT load new data.
 
@@ -124,14 +193,15 @@ class PaperTree(TMTree):
         # tree.
         if all_papers:
             # if <by_year> is True, then the first level of subtrees should be
-            # dependent on the year of the paper
-            if by_year:
-                tree = _build_tree_from_dict(_load_papers_to_dict(True))
-                TMTree.__init__(self, name, tree, citations)
-            # if <by_year> is False, then ignore the year of the paper
+            # dependent on the year of the paper, and otherwise the year of the
+            # paper is ignored
+            if source is None:
+                source = DATA_FILE
+            if max_workers > 1 and cache is None and _can_split(source):
+                tree = _build_papers_parallel(source, by_year, max_workers)
             else:
-                tree = _build_tree_from_dict(_load_papers_to_dict(False))
-                TMTree.__init__(self, name, tree, citations)
+                tree = _build_papers(_load_papers(source, cache), by_year)
+            TMTree.__init__(self, name, tree, citations)
         # do not load new data if <all_papers> is False
         else:
             TMTree.__init__(self, name, subtrees, citations)
@@ -150,80 +220,454 @@ class PaperTree(TMTree):
             return ' (Category)'
 
 
-def _load_papers_to_dict(by_year: bool = True) -> Dict:
-    """Return a nested dictionary of the data read from the papers dataset file.
+def _read_papers(source: Union[str, os.PathLike, IO, None] = None
+                 ) -> Iterator[List[str]]:
+    """Yield the row of each paper in the dataset file <source>, one at a
+    time, with the columns in COLUMNS.
+
+    <source> is the path of the file, or the file open for reading, or None
+    for DATA_FILE, as for PaperTree.
+    """
+    if source is None:
+        source = DATA_FILE
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as data_file:
+            yield from _read_papers_from(data_file)
+    else:
+        yield from _read_papers_from(source)
+
+
+def _read_papers_from(data_file: IO) -> Iterator[List[str]]:
+    """Yield the row of each paper in the dataset file <data_file>, which is
+    open for reading, one at a time, with the columns in COLUMNS.
+
+    <data_file> is left open.
+    """
+    if isinstance(data_file.read(0), str):
+        text = data_file
+    else:
+        binary = _decompressed(data_file)
+        text = io.TextIOWrapper(binary, encoding='utf-8', newline='')
+    try:
+        # the first line of a CSV file does not contain any papers, and the
+        # first line of a JSON Lines file is an object
+        first = text.readline()
+        if first.lstrip().startswith('{'):
+            for line in itertools.chain([first], text):
+                if line.strip():
+                    paper = json.loads(line)
+                    yield [str(paper[column]) for column in COLUMNS]
+        else:
+            yield from csv.reader(text, delimiter=",")
+    finally:
+        if text is not data_file:
+            # do not close <data_file> along with the objects reading it
+            text.detach()
+            if binary is not data_file:
+                binary.close()
+
+
+def _decompressed(data_file: IO[bytes]) -> IO[bytes]:
+    """Return a binary file that reads <data_file> decompressed, if it was
+    compressed with gzip or bzip2, or <data_file> itself otherwise.
+
+    The first bytes of <data_file> are used to tell how it was compressed, so
+    a file that cannot be peeked at or seeked back is assumed to be
+    uncompressed.
+    """
+    if hasattr(data_file, 'peek'):
+        magic = data_file.peek(len(_BZIP2_MAGIC))[:len(_BZIP2_MAGIC)]
+    elif data_file.seekable():
+        position = data_file.tell()
+        magic = data_file.read(len(_BZIP2_MAGIC))
+        data_file.seek(position)
+    else:
+        return data_file
+    if magic.startswith(_GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=data_file)
+    elif magic.startswith(_BZIP2_MAGIC):
+        return bz2.BZ2File(data_file)
+    else:
+        return data_file
+
+
+def _parse_paper(row: List[str]) -> _Paper:
+    """Return the paper in <row>, a row of a dataset file.
+    """
+    return row[2], row[3].split(': '), row[1], row[0], row[4], int(row[5])
+
+
+def _build_papers(papers: Iterable[_Paper],
+                  by_year: bool = True) -> List[PaperTree]:
+    """Return the trees at the top of the tree of <papers>, in the order they
+    first appear.
 
     If <by_year>, then use years as the roots of the subtrees of the root of
     the whole tree. Otherwise, ignore years and use categories only.
+
+    The trees are built as the papers are read: each paper is added below its
+    categories, which are created the first time they are seen, and its
+    citations are added to the size of each of them.
+    """
+    top = []
+    # the subtrees of each category, by name, as (subtree, its subtrees)
+    # pairs, starting from the top of the tree
+    categories = {}
+    for year, names, title, authors, doi, citations in papers:
+        path = [year, *names] if by_year else names
+        parent, children = None, categories
+        for name in path:
+            if name not in children:
+                category = PaperTree(name, [])
+                if parent is None:
+                    top.append(category)
+                else:
+                    category._parent_tree = parent
+                    parent._subtrees.append(category)
+                children[name] = (category, {})
+            parent, children = children[name]
+            parent.data_size += citations
+        paper = PaperTree(title, [], authors, doi, citations)
+        paper._parent_tree = parent
+        parent._subtrees.append(paper)
+    return top
+
+
+def _load_papers(source: Union[str, os.PathLike, IO, None],
+                 cache: Optional[str]) -> Iterator[_Paper]:
+    """Return an iterator over the papers in the dataset file <source>, using
+    the cache file <cache> if it is given, as described in PaperTree.
+    """
+    papers = map(_parse_paper, _read_papers(source))
+    if cache is None or not isinstance(source, (str, os.PathLike,
+                                                type(None))):
+        return papers
+    key = _dataset_key(DATA_FILE if source is None else source)
+    cached = _open_cache(cache, key)
+    if cached is not None:
+        return cached
+    return _save_cache(papers, cache, key)
+
+
+def _dataset_key(path: Union[str, os.PathLike]) -> bytes:
+    """Return the key of the dataset file at <path>: a hash of its size,
+    modification time and the bytes at each end of it, which changes when
+    the file does.
+    """
+    stat = os.stat(path)
+    digest = hashlib.blake2b(struct.pack('<qq', stat.st_size,
+                                         stat.st_mtime_ns), digest_size=32)
+    with open(path, 'rb') as file:
+        digest.update(file.read(_KEY_SAMPLE))
+        if stat.st_size > _KEY_SAMPLE:
+            file.seek(max(stat.st_size - _KEY_SAMPLE, _KEY_SAMPLE))
+            digest.update(file.read())
+    return digest.digest()
+
+
+def _save_cache(papers: Iterable[_Paper], filename: str,
+                key: bytes) -> Iterator[_Paper]:
+    """Yield each of <papers>, and once they have all been yielded, save them
+    to the cache file <filename> for the dataset file with <key>.
+
+    The cache stores each distinct string and each distinct category path
+    once. After the header, it holds columns of 64-bit integers: where each
+    category path ends, the strings in each category path, and the year,
+    category path, title, authors, DOI and citations of each paper, then the
+    strings, in UTF-8, separated by null characters. Nothing is saved if a
+    string contains a null character.
+
+    The cache is written to a temporary file that then replaces <filename>,
+    so another process that has the old cache mapped in memory keeps reading
+    the old file, and never sees a partly written one.
+    """
+    strings = {}
+    paths = {}
+    columns = [array('q') for _ in range(6)]
+    years, path_ids, titles, authors_ids, dois, citation_counts = columns
+    for paper in papers:
+        year, names, title, authors, doi, citations = paper
+        years.append(strings.setdefault(year, len(strings)))
+        path_ids.append(paths.setdefault(tuple(names), len(paths)))
+        titles.append(strings.setdefault(title, len(strings)))
+        authors_ids.append(strings.setdefault(authors, len(strings)))
+        dois.append(strings.setdefault(doi, len(strings)))
+        citation_counts.append(citations)
+        yield paper
+
+    path_ends = array('q')
+    path_names = array('q')
+    for names in paths:
+        path_names.extend(strings.setdefault(name, len(strings))
+                          for name in names)
+        path_ends.append(len(path_names))
+    text = '\0'.join(strings)
+    if text.count('\0') != max(len(strings) - 1, 0):
+        return
+    text = text.encode('utf-8', 'surrogatepass')
+    temporary = f'{filename}.{os.getpid()}.tmp'
+    try:
+        with open(temporary, 'wb') as file:
+            file.write(_CACHE_MAGIC)
+            file.write(_CACHE_HEADER.pack(key, len(years), len(strings),
+                                          len(paths), len(path_names),
+                                          len(text)))
+            for column in [path_ends, path_names, *columns]:
+                file.write(column.tobytes())
+            file.write(text)
+        os.replace(temporary, filename)
+    except OSError:
+        # the tree can still be built, just not from the cache next time
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+
+
+def _open_cache(filename: str, key: bytes) -> Optional[Iterator[_Paper]]:
+    """Return an iterator over the papers saved in the cache file <filename>
+    by _save_cache, which reads them from the memory-mapped file, or None if
+    the file is missing, unreadable, or was not saved for the dataset file
+    with <key> on this machine.
+    """
+    try:
+        with open(filename, 'rb') as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    view = memoryview(data)
+    columns = []
+    try:
+        if data[:len(_CACHE_MAGIC)] != _CACHE_MAGIC:
+            raise ValueError
+        saved_key, papers, strings, paths, names, text = \
+            _CACHE_HEADER.unpack_from(data, len(_CACHE_MAGIC))
+        offset = len(_CACHE_MAGIC) + _CACHE_HEADER.size
+        if saved_key != key or len(data) != offset \
+                + 8 * (paths + names + 6 * papers) + text:
+            raise ValueError
+        for length in [paths, names] + [papers] * 6:
+            columns.append(view[offset:offset + 8 * length].cast('q'))
+            offset += 8 * length
+        # the strings follow the columns
+        values = str(view[offset:], 'utf-8', 'surrogatepass').split('\0') \
+            if strings else []
+        if len(values) != strings:
+            raise ValueError
+        path_ends, path_names = columns[0], columns[1]
+        categories = []
+        start = 0
+        for end in path_ends:
+            categories.append([values[i] for i in path_names[start:end]])
+            start = end
+    except (ValueError, IndexError, struct.error):
+        _close_cache(data, view, columns)
+        return None
+    return _read_cache(data, view, columns, values, categories)
+
+
+def _read_cache(data: mmap.mmap, view: memoryview, columns: List[memoryview],
+                values: List[str],
+                categories: List[List[str]]) -> Iterator[_Paper]:
+    """Yield each paper saved in the memory-mapped cache file <data>, given
+    <view> of all of it, its <columns>, its strings <values> and its category
+    paths <categories>, then close <data>.
     """
-    data_dict = {}
-    categories = []
-    with open(DATA_FILE, newline="") as data_file:
-        file = csv.reader(data_file, delimiter=",")
-        # prepare DATA_FILE to read its data line per line
-        # skip the first line as the first line does not contain any papers
-        next(file)
-        for x in file:
-            info = [x[2]] + x[3].split(': ') + [file.line_num]
-            if not by_year:
-                info.pop(0)
-            categories.append(info)
-        # put all the categories into a dictionary
-        for category in categories:
-            _load_papers_to_dict_helper(data_dict, category)
-    return data_dict
-
-
-def _load_papers_to_dict_helper(data_dict: Dict, category: List) -> None:
-    """
-    Helper function of _load_papers_to_dict. This function takes a category
-    and fills in the dictionary with the categories given
-    """
-    # make the first filter the header
-
-    header = category[0]
-    # check if header is in the dictionary
-    if header not in data_dict:
-        # set the header as a new key in the dictionary
-        data_dict.setdefault(header, {})
-    # move to next subcategory, check if there are still more nested categories
-    # and if so, call the function again on the next subcategory
-    category = category[1:]
-    if category:
-        _load_papers_to_dict_helper(data_dict[header], category)
-
-
-def _build_tree_from_dict(nested_dict: Dict) -> List[PaperTree]:
-    """Return a list of trees from the nested dictionary <nested_dict>.
-    """
-    output = []
-    for key, value in nested_dict.items():
-        if not value:  # checks if the current value is empty
-            # iterate over file and find row that matches with the current key
-            data = None
-            with open(DATA_FILE) as file:
-                reader = csv.reader(file)
-                row = next(reader, None)
-                while row is not None:
-                    if reader.line_num == key:
-                        data = row
-                        row = None
-                    else:
-                        row = next(reader, None)
-            # create a PaperTree using the data to get the initializer values
-            if data:
-                output.append(PaperTree(data[1], [],
-                                        data[0], data[4], int(data[5])))
+    try:
+        years, paths, titles, authors, dois, citations = columns[2:]
+        yield from zip(map(values.__getitem__, years),
+                       map(categories.__getitem__, paths),
+                       map(values.__getitem__, titles),
+                       map(values.__getitem__, authors),
+                       map(values.__getitem__, dois), citations)
+    finally:
+        _close_cache(data, view, columns)
+
+
+def _can_split(source: Union[str, os.PathLike, IO]) -> bool:
+    """Return whether <source> is the path of a dataset file that can be
+    parsed in parallel: an uncompressed CSV file.
+    """
+    if not isinstance(source, (str, os.PathLike)):
+        return False
+    with open(source, 'rb') as data_file:
+        start = data_file.read(64)
+    return not (start.startswith(_GZIP_MAGIC) or start.startswith(_BZIP2_MAGIC)
+                or start.lstrip().startswith(b'{'))
+
+
+def _build_papers_parallel(path: Union[str, os.PathLike], by_year: bool,
+                           max_workers: int) -> List[PaperTree]:
+    """Return the trees at the top of the tree of the papers in the CSV
+    dataset file at <path>, as _build_papers does, parsing parts of the file
+    with a pool of <max_workers> processes.
+
+    Each part is made of whole records, and its papers are sorted into a trie
+    of their own by _parse_records, which is merged in order into the trees
+    of the parts before it, so the result is the same as a serial parse. At
+    most 2 * <max_workers> parts are handed to the pool at a time.
+    """
+    top = []
+    categories = {}
+    pending = deque()
+    with ProcessPoolExecutor(max_workers) as pool:
+        for start, end in _split_records(path, max_workers):
+            pending.append(pool.submit(_parse_records, path, start, end,
+                                       by_year))
+            if len(pending) >= 2 * max_workers:
+                _merge_papers(top, None, categories,
+                              pending.popleft().result())
+        while pending:
+            _merge_papers(top, None, categories, pending.popleft().result())
+    return top
+
+
+def _split_records(path: Union[str, os.PathLike],
+                   parts: int) -> List[Tuple[int, int]]:
+    """Return the (start, end) byte ranges of consecutive parts of the CSV
+    file at <path>, which together hold every record after its header. Each
+    part is made of whole records, and there are at least <parts> parts of
+    about the same size, or more if that would make them bigger than
+    _CHUNK_SIZE.
+
+    A record ends at a line ending outside a quoted field. This assumes that,
+    as csv.writer writes them, double quotes only appear around a field or
+    doubled inside a quoted one, so a line ending is inside a quoted field
+    exactly when an odd number of double quotes come before it in its record.
+    """
+    with open(path, 'rb') as data_file:
+        size = os.fstat(data_file.fileno()).st_size
+        if size == 0:
+            return []
+        data = mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ)
+    with data:
+        first = _record_end(data, 0, False)
+        parts = max(parts, -(-(size - first) // _CHUNK_SIZE))
+        ranges = []
+        start = first
+        for i in range(1, parts + 1):
+            target = first + (size - first) * i // parts
+            if i == parts:
+                end = size
+            elif target <= start:
+                continue
+            else:
+                # <start> is not inside a quoted field, since a record starts
+                # there
+                quotes = 0
+                for block in range(start, target, _CHUNK_SIZE):
+                    quotes += data[block:min(block + _CHUNK_SIZE,
+                                             target)].count(b'"')
+                end = _record_end(data, target, quotes % 2 == 1)
+            if end > start:
+                ranges.append((start, end))
+                start = end
+    return ranges
+
+
+def _record_end(data: mmap.mmap, position: int, quoted: bool) -> int:
+    """Return the offset just after the end of the record of the CSV file
+    <data> that <position> is in, given whether <position> is inside a
+    quoted field, or the end of <data> if that record is not ended.
+    """
+    for match in _CSV_DELIMITER.finditer(data, position):
+        if match.group() == b'"':
+            quoted = not quoted
+        elif not quoted:
+            end = match.end()
+            # a carriage return followed by a line feed ends one record
+            if match.group() == b'\r' and data[end:end + 1] == b'\n':
+                end += 1
+            return end
+    return len(data)
+
+
+def _parse_records(path: Union[str, os.PathLike], start: int, end: int,
+                   by_year: bool) -> List[Union[tuple, list]]:
+    """Return a trie of the papers in bytes <start> to <end> of the CSV
+    dataset file at <path>, which are whole records, arranged as
+    _build_papers arranges them.
+
+    The trie is a list of the categories and papers at its top. A category
+    is a [name, total citations, categories and papers in it] list, and a
+    paper is a (title, authors, DOI, citations) tuple. It is made of plain
+    Python objects, which are much quicker to send back from another process
+    than trees are.
+    """
+    with open(path, 'rb') as data_file:
+        data_file.seek(start)
+        text = data_file.read(end - start).decode('utf-8')
+    rows = csv.reader(io.StringIO(text, newline=''), delimiter=",")
+    top = []
+    # the categories in each category, by name, as (category, the categories
+    # in it) pairs, starting from the top of the trie
+    categories = {}
+    for year, names, title, authors, doi, citations in map(_parse_paper, rows):
+        path = [year, *names] if by_year else names
+        entries, children = top, categories
+        for name in path:
+            if name not in children:
+                category = [name, 0, []]
+                entries.append(category)
+                children[name] = (category, {})
+            category, children = children[name]
+            category[1] += citations
+            entries = category[2]
+        entries.append((title, authors, doi, citations))
+    return top
+
+
+def _merge_papers(trees: List[PaperTree], parent: Optional[PaperTree],
+                  categories: Dict[str, Tuple[PaperTree, Dict]],
+                  entries: List[Union[tuple, list]]) -> None:
+    """Add the categories and papers in <entries>, part of a trie made by
+    _parse_records from papers that come after all of those in <trees>, to
+    <trees>: the subtrees of <parent>, or the trees at the top of the tree if
+    <parent> is None.
+
+    <categories> holds each category in <trees> by name, as a (category, its
+    subtree categories) pair. A category in <entries> with the same name as
+    one in <trees> is merged into it.
+    """
+    for entry in entries:
+        if isinstance(entry, tuple):
+            title, authors, doi, citations = entry
+            paper = PaperTree(title, [], authors, doi, citations)
+            paper._parent_tree = parent
+            trees.append(paper)
         else:
-            # call the function again with the same key
-            output.append(PaperTree(key, _build_tree_from_dict(value)))
-    return output
+            name, citations, subentries = entry
+            if name not in categories:
+                category = PaperTree(name, [])
+                category._parent_tree = parent
+                trees.append(category)
+                categories[name] = (category, {})
+            category, children = categories[name]
+            category.data_size += citations
+            _merge_papers(category._subtrees, category, children, subentries)
+
+
+def _close_cache(data: mmap.mmap, view: memoryview,
+                 columns: List[memoryview]) -> None:
+    """Release <view> of all of the memory-mapped cache file <data> and its
+    <columns>, then close <data>.
+    """
+    for column in columns:
+        column.release()
+    view.release()
+    data.close()
 
 
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
-        'allowed-import-modules': ['python_ta', 'typing', 'csv', 'tm_trees'],
-        'allowed-io': ['_load_papers_to_dict'],
-        'max-args': 8
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'csv', 'tm_trees', 'bz2', 'gzip', 'io',
+            'itertools', 'json', 'os', 'hashlib', 'mmap', 'struct', 'sys',
+            'array', 're', 'collections', 'concurrent.futures'
+        ],
+        'allowed-io': ['_read_papers', '_dataset_key', '_save_cache',
+                       '_open_cache', '_can_split', '_split_records',
+                       '_parse_records'],
+        'max-args': 11
     })
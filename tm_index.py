@@ -0,0 +1,130 @@
+"""
+Assignment 2: Spatial index for hit-testing a treemap
+
+=== CSC148 Summer 2024 ===
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, David Liu, Diane Horton,
+                   Haocheng Hu, Jacqueline Smith
+
+=== Module Description ===
+This module contains SpatialIndex, which answers get_tree_at_position for a
+tree that has been laid out without walking the tree.
+
+TMTree.get_tree_at_position checks every subtree of every tree on the way
+down, so hovering over a folder with 100,000 files checks up to 100,000
+rectangles for each mouse movement. A SpatialIndex divides the treemap into
+a grid of square cells, and lists in each cell the displayed leaves whose
+rectangle touches it, so a lookup only checks the few rectangles in one cell.
+
+An index describes the tree as it was when the index was built: it must be
+built again whenever the tree is laid out again, or a tree in it is expanded
+or collapsed.
+"""
+from __future__ import annotations
+
+import math
+from typing import List, Optional, Tuple
+
+from tm_trees import TMTree
+
+# The smallest side of a cell, in pixels. Smaller cells would hold fewer
+# rectangles each, but would make the grid (and the cost of building it) much
+# larger than the number of rectangles.
+_MIN_CELL_SIZE = 4
+
+
+class SpatialIndex:
+    """A grid over the displayed leaves of a tree that has been laid out.
+
+    === Private Attributes ===
+    _rect:
+        The rectangle of the tree, which the grid covers.
+    _cell_size:
+        The width and height of each cell, in pixels.
+    _columns:
+        The number of columns of cells in the grid.
+    _leaves:
+        The displayed leaves, in the order get_tree_at_position tries them.
+    _rects:
+        The rectangle of each leaf in _leaves.
+    _cells:
+        For each cell, row by row, the positions in _leaves of the leaves
+        whose rectangle touches the cell, in increasing order.
+    """
+    _rect: Tuple[int, int, int, int]
+    _cell_size: int
+    _columns: int
+    _leaves: List[TMTree]
+    _rects: List[Tuple[int, int, int, int]]
+    _cells: List[List[int]]
+
+    def __init__(self, tree: TMTree, min_area: int = 0) -> None:
+        """Index the displayed leaves of <tree>, which has been laid out with
+        the given <min_area>.
+        """
+        self._rect = tree.rect
+        x0, y0, width, height = tree.rect
+        self._leaves = []
+        self._rects = []
+        seen = set()
+        for leaf in tree._displayed_leaves(min_area):
+            # a leaf with the same rectangle as an earlier one is never found,
+            # and slivers with no width often share theirs with thousands of
+            # others
+            rect = leaf.rect
+            if rect not in seen:
+                seen.add(rect)
+                self._leaves.append(leaf)
+                self._rects.append(rect)
+        # aim for about one leaf per cell
+        self._cell_size = max(_MIN_CELL_SIZE, math.isqrt(
+            width * height // max(len(self._leaves), 1)))
+        cell = self._cell_size
+        self._columns = width // cell + 1
+        rows = height // cell + 1
+        self._cells = [[] for _ in range(self._columns * rows)]
+        for i, (x, y, w, h) in enumerate(self._rects):
+            # a rectangle touches its right and bottom edges, as in
+            # get_tree_at_position
+            first_column = max((x - x0) // cell, 0)
+            last_column = min((x + w - x0) // cell, self._columns - 1)
+            for row in range(max((y - y0) // cell, 0),
+                             min((y + h - y0) // cell, rows - 1) + 1):
+                start = row * self._columns
+                for column in range(first_column, last_column + 1):
+                    self._cells[start + column].append(i)
+
+    def get_tree_at_position(self, pos: Tuple[int, int]) -> Optional[TMTree]:
+        """Return the leaf that the indexed tree's get_tree_at_position would
+        return for position <pos>, or None if there is none.
+
+        When <pos> is on the edge between two rectangles, the leaf that
+        get_tree_at_position tries first is returned, as it would be.
+        """
+        px, py = pos
+        x0, y0, width, height = self._rect
+        if not (x0 <= px <= x0 + width and y0 <= py <= y0 + height):
+            return None
+        cell = self._cell_size
+        for i in self._cells[(py - y0) // cell * self._columns
+                             + (px - x0) // cell]:
+            x, y, w, h = self._rects[i]
+            if x <= px <= x + w and y <= py <= y + h:
+                return self._leaves[i]
+        return None
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'math', '__future__', 'tm_trees'
+        ]
+    })
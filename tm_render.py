@@ -0,0 +1,191 @@
+"""
+Assignment 2: Rendering treemaps to image files
+
+=== CSC148 Summer 2024 ===
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, David Liu, Diane Horton,
+                   Haocheng Hu, Jacqueline Smith
+
+=== Module Description ===
+This module draws the treemap of a tree into a PNG or SVG file, without a
+display and without pygame, so that images of large folders can be made on a
+server.
+
+The rectangles are taken from TMTree.iter_rectangles one at a time and drawn
+straight away, so they are never all held in memory: a PNG only needs the
+pixels of the image, and an SVG is written to the file as it goes.
+render_folders draws several folders at once, each in its own process.
+"""
+from __future__ import annotations
+
+import os
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, List, Optional, Tuple
+
+from tm_trees import TMTree, FileSystemTree, Layout, slice_and_dice
+
+# The colour of the parts of the image that no rectangle covers, as in the
+# visualiser
+_BACKGROUND = (0, 0, 0)
+
+# The first bytes of every PNG file
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def render(tree: TMTree, path: str, size: Tuple[int, int] = (1200, 670),
+           layout: Layout = slice_and_dice, min_area: int = 0) -> None:
+    """Lay out <tree> to fill an image of <size> (width, height) pixels with
+    <layout>, and write the treemap of its displayed subtrees to the file at
+    <path>.
+
+    The format of the file is chosen from the extension of <path>, which must
+    be .png or .svg. Subtrees smaller than <min_area> pixels are drawn as one
+    block, as in TMTree.update_rectangles.
+
+    Raise ValueError if the extension of <path> is not one of these.
+    """
+    writers = {'.png': write_png, '.svg': write_svg}
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in writers:
+        raise ValueError(f'cannot write a treemap to a {extension!r} file')
+    width, height = size
+    tree.update_rectangles((0, 0, width, height), layout, min_area)
+    with open(path, 'wb') as file:
+        writers[extension](tree, file, size, min_area)
+
+
+def write_png(tree: TMTree, file: BinaryIO, size: Tuple[int, int],
+              min_area: int = 0) -> None:
+    """Write the treemap of <tree>, which has been laid out with <min_area>,
+    to <file> as a PNG image of <size> (width, height) pixels.
+
+    Each rectangle covers the same pixels as it does in the visualiser: a
+    rectangle (x, y, w, h) covers columns x to x + w - 1 of rows y to
+    y + h - 1.
+    """
+    width, height = size
+    row_size = 3 * width
+    pixels = _draw_pixels(tree, size, min_area)
+
+    file.write(_PNG_SIGNATURE)
+    # 8 bits per channel, RGB colour, no interlacing
+    _write_png_chunk(file, b'IHDR', struct.pack('>IIBBBBB', width, height,
+                                                8, 2, 0, 0, 0))
+    # each row starts with the number of the filter it uses, here none
+    compressor = zlib.compressobj()
+    data = bytearray()
+    for row in range(height):
+        data += compressor.compress(b'\x00')
+        data += compressor.compress(
+            pixels[row * row_size:(row + 1) * row_size])
+    data += compressor.flush()
+    _write_png_chunk(file, b'IDAT', bytes(data))
+    _write_png_chunk(file, b'IEND', b'')
+
+
+def _draw_pixels(tree: TMTree, size: Tuple[int, int],
+                 min_area: int) -> bytearray:
+    """Return the RGB pixels of the treemap of <tree>, which has been laid
+    out with <min_area>, in an image of <size> (width, height) pixels, row
+    by row from the top.
+    """
+    width, height = size
+    pixels = bytearray(bytes(_BACKGROUND) * (width * height))
+    for (x, y, w, h), colour in tree.iter_rectangles(min_area):
+        left, right = max(x, 0), min(x + w, width)
+        if left >= right:
+            continue
+        span = bytes(colour) * (right - left)
+        for row in range(max(y, 0), min(y + h, height)):
+            pixels[3 * (row * width + left):3 * (row * width + right)] = span
+    return pixels
+
+
+def _write_png_chunk(file: BinaryIO, kind: bytes, data: bytes) -> None:
+    """Write a chunk of <kind> holding <data> to the PNG <file>.
+    """
+    file.write(struct.pack('>I', len(data)))
+    file.write(kind)
+    file.write(data)
+    file.write(struct.pack('>I', zlib.crc32(kind + data)))
+
+
+def write_svg(tree: TMTree, file: BinaryIO, size: Tuple[int, int],
+              min_area: int = 0) -> None:
+    """Write the treemap of <tree>, which has been laid out with <min_area>,
+    to <file> as an SVG image of <size> (width, height) pixels.
+    """
+    width, height = size
+    file.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" '
+               f'height="{height}" viewBox="0 0 {width} {height}" '
+               f'shape-rendering="crispEdges">\n'
+               f'<rect width="{width}" height="{height}" '
+               f'fill="{_hex_colour(_BACKGROUND)}"/>\n'.encode('ascii'))
+    lines = []
+    for (x, y, w, h), colour in tree.iter_rectangles(min_area):
+        if w > 0 and h > 0:
+            lines.append(f'<rect x="{x}" y="{y}" width="{w}" height="{h}" '
+                         f'fill="{_hex_colour(colour)}"/>\n')
+            # write the rectangles out a batch at a time
+            if len(lines) == 1024:
+                file.write(''.join(lines).encode('ascii'))
+                lines = []
+    lines.append('</svg>\n')
+    file.write(''.join(lines).encode('ascii'))
+
+
+def _hex_colour(colour: Tuple[int, int, int]) -> str:
+    """Return <colour>, an (r, g, b) tuple, as an SVG colour like #ff8000.
+    """
+    r, g, b = colour
+    return f'#{r:02x}{g:02x}{b:02x}'
+
+
+def render_folders(jobs: List[Tuple[str, str]],
+                   size: Tuple[int, int] = (1200, 670),
+                   layout: Layout = slice_and_dice, min_area: int = 0,
+                   processes: Optional[int] = None) -> None:
+    """Draw the treemap of each folder in <jobs>, a list of (folder path,
+    image path) pairs, with every folder in it expanded, and write it to the
+    image file, as render does.
+
+    The folders are read and drawn by a pool of <processes> processes, or one
+    process for each CPU if <processes> is None.
+    """
+    with ProcessPoolExecutor(processes) as pool:
+        futures = [pool.submit(_render_folder, folder, image, size, layout,
+                               min_area)
+                   for folder, image in jobs]
+        # raise the first error from any of the processes, if there is one
+        for future in futures:
+            future.result()
+
+
+def _render_folder(folder: str, image: str, size: Tuple[int, int],
+                   layout: Layout, min_area: int) -> None:
+    """Draw the treemap of the folder at <folder>, with every folder in it
+    expanded, and write it to the file at <image>, as render does.
+    """
+    tree = FileSystemTree(folder)
+    tree.expand_all()
+    render(tree, image, size, layout, min_area)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'os', 'struct', 'zlib', '__future__',
+            'concurrent.futures', 'tm_trees'
+        ],
+        'allowed-io': ['render']
+    })
@@ -0,0 +1,782 @@
+"""
+Assignment 2: Array-backed storage for very large trees
+
+=== CSC148 Summer 2024 ===
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, David Liu, Diane Horton,
+                   Haocheng Hu, Jacqueline Smith
+
+=== Module Description ===
+This module contains TreeStore, an alternative backend for TMTree that keeps
+every node of a tree in parallel arrays ("struct of arrays") instead of in
+one Python object per node, and TreeView, a thin TMTree-compatible view of
+one node of a TreeStore.
+
+Nodes are identified by their index in the arrays. The children of a node
+are linked through the first_child and next_sibling arrays, and names are
+interned in a string table, so a node costs a few dozen bytes no matter how
+long its name is. update_rectangles, update_data_sizes, get_rectangles and
+get_tree_at_position run as loops over these arrays. If NumPy is installed,
+update_rectangles lays out a whole level of the tree at a time with vectorised
+cumulative sums instead, when it uses the slice_and_dice layout.
+
+Views are created on demand, and each node has at most one view, so views
+can be compared with "is" like ordinary trees. To use a TreeStore with the
+visualiser, build it from an ordinary tree and visualise its root:
+
+    store = TreeStore(FileSystemTree(path))
+    visualiser.run_visualisation(store.root())
+"""
+from __future__ import annotations
+
+import importlib
+import math
+import weakref
+from array import array
+from functools import lru_cache
+from types import ModuleType
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from papers import PaperTree
+from tm_trees import TMTree, FileSystemTree, Layout, slice_and_dice, \
+    _describe_file_system_tree, _merge_rectangles
+
+
+@lru_cache(maxsize=1)
+def _numpy() -> Optional[ModuleType]:
+    """Return the numpy module, or None if NumPy is not installed.
+
+    NumPy is optional: without it, the plain loops are used instead.
+    """
+    try:
+        return importlib.import_module('numpy')
+    except ImportError:
+        return None
+
+
+class TreeStore:
+    """The nodes of a tree, stored in parallel arrays.
+
+    === Private Attributes ===
+    _parents:
+        The index of the parent of each node, or -1 for the root. Like an
+        ordinary tree, a deleted node keeps its parent.
+    _first_children:
+        The index of the first child of each node, or -1 for a leaf.
+    _next_siblings:
+        The index of the next sibling of each node, or -1 for a last child.
+    _sizes:
+        The data_size of each node.
+    _colours:
+        The colour of each node, packed as 0xRRGGBB.
+    _xs, _ys, _widths, _heights:
+        The rectangle of each node.
+    _expanded:
+        1 for each node that is expanded, and 0 otherwise.
+    _name_ids:
+        The index in _strings of the name of each node.
+    _strings:
+        The distinct names in the tree.
+    _separator:
+        The separator used in the path strings of this tree.
+    _describe:
+        A function that returns the suffix of a view.
+    _views:
+        The view of each node that has one that is still in use. Views are
+        only held weakly, so a view that nothing else refers to is freed.
+    _child_lists:
+        The children of every node as two arrays, (offsets, children): the
+        children of node i are children[offsets[i]:offsets[i + 1]], in order.
+        None if the tree has changed shape since they were last computed.
+
+    === Representation Invariants ===
+    - All arrays have one entry per node.
+    - The nodes reachable from index 0 through _first_children and
+      _next_siblings satisfy the representation invariants of TMTree.
+    """
+    _parents: array
+    _first_children: array
+    _next_siblings: array
+    _sizes: array
+    _colours: array
+    _xs: array
+    _ys: array
+    _widths: array
+    _heights: array
+    _expanded: bytearray
+    _name_ids: array
+    _strings: List[Optional[str]]
+    _separator: str
+    _describe: Callable[[TreeView], str]
+    _views: weakref.WeakValueDictionary[int, TreeView]
+    _child_lists: Optional[Tuple[array, array]]
+
+    def __init__(self, tree: TMTree) -> None:
+        """Copy every node of <tree> into a new store. The root of <tree> is
+        the node with index 0.
+        """
+        self._parents = array('q')
+        self._first_children = array('q')
+        self._next_siblings = array('q')
+        self._sizes = array('q')
+        self._colours = array('L')
+        self._xs = array('q')
+        self._ys = array('q')
+        self._widths = array('q')
+        self._heights = array('q')
+        self._expanded = bytearray()
+        self._name_ids = array('L')
+        self._strings = []
+        self._separator = tree.get_separator()
+        self._describe = _describer_for(tree)
+        self._views = weakref.WeakValueDictionary()
+        self._child_lists = None
+
+        string_ids = {}
+        # the last child of each node linked so far; trees are visited in
+        # pre-order, so the children of a node are linked in order
+        last_children = array('q')
+        stack = [(tree, -1)]
+        while stack:
+            node, parent = stack.pop()
+            index = len(self._parents)
+            self._parents.append(parent)
+            self._first_children.append(-1)
+            self._next_siblings.append(-1)
+            last_children.append(-1)
+            if parent != -1:
+                if last_children[parent] == -1:
+                    self._first_children[parent] = index
+                else:
+                    self._next_siblings[last_children[parent]] = index
+                last_children[parent] = index
+            self._sizes.append(node.data_size)
+            red, green, blue = node._colour
+            self._colours.append(red << 16 | green << 8 | blue)
+            x, y, width, height = node.rect
+            self._xs.append(x)
+            self._ys.append(y)
+            self._widths.append(width)
+            self._heights.append(height)
+            self._expanded.append(node._expanded)
+            if node._name not in string_ids:
+                string_ids[node._name] = len(self._strings)
+                self._strings.append(node._name)
+            self._name_ids.append(string_ids[node._name])
+            for subtree in reversed(node._subtrees):
+                stack.append((subtree, index))
+
+    def __len__(self) -> int:
+        """Return the number of nodes in this store, including deleted ones.
+        """
+        return len(self._parents)
+
+    def root(self) -> TreeView:
+        """Return the view of the root of this store.
+        """
+        return self.view(0)
+
+    def view(self, index: int) -> TreeView:
+        """Return the view of the node with the given <index>.
+        """
+        view = self._views.get(index)
+        if view is None:
+            view = TreeView(self, index)
+            self._views[index] = view
+        return view
+
+    def children(self, index: int) -> List[int]:
+        """Return the indexes of the children of the node with the given
+        <index>, in order.
+        """
+        children = []
+        child = self._first_children[index]
+        while child != -1:
+            children.append(child)
+            child = self._next_siblings[child]
+        return children
+
+    def _preorder(self, index: int) -> List[int]:
+        """Return the indexes of the node with the given <index> and all of
+        its descendants, in pre-order.
+        """
+        first_children = self._first_children
+        next_siblings = self._next_siblings
+        parents = self._parents
+        order = []
+        node = index
+        while True:
+            order.append(node)
+            if first_children[node] != -1:
+                node = first_children[node]
+                continue
+            # climb until there is a next sibling to visit
+            while node != index and next_siblings[node] == -1:
+                node = parents[node]
+            if node == index:
+                return order
+            node = next_siblings[node]
+
+    def _unlink(self, index: int) -> None:
+        """Remove the node with the given <index> from the children of its
+        parent, if it is still one of them. The node keeps its parent index.
+        """
+        self._child_lists = None
+        parent = self._parents[index]
+        child = self._first_children[parent]
+        if child == index:
+            self._first_children[parent] = self._next_siblings[index]
+        else:
+            while child != -1 and self._next_siblings[child] != index:
+                child = self._next_siblings[child]
+            if child == -1:
+                return
+            self._next_siblings[child] = self._next_siblings[index]
+        self._next_siblings[index] = -1
+
+    def _append(self, index: int, parent: int) -> None:
+        """Make the node with the given <index> the last child of <parent>.
+        """
+        self._child_lists = None
+        self._parents[index] = parent
+        self._next_siblings[index] = -1
+        child = self._first_children[parent]
+        if child == -1:
+            self._first_children[parent] = index
+            return
+        while self._next_siblings[child] != -1:
+            child = self._next_siblings[child]
+        self._next_siblings[child] = index
+
+    def update_rectangles(self, index: int,
+                          rect: Tuple[int, int, int, int],
+                          layout: Layout = slice_and_dice,
+                          min_area: int = 0) -> None:
+        """Lay out the node with the given <index> and its descendants inside
+        <rect> with <layout>, exactly as TMTree.update_rectangles does.
+        """
+        if layout is not slice_and_dice:
+            self._update_rectangles_with(index, rect, layout, min_area)
+            return
+        if _numpy() is not None:
+            self._update_rectangles_by_level(index, rect, min_area)
+            return
+        sizes = self._sizes
+        first_children = self._first_children
+        next_siblings = self._next_siblings
+        xs, ys, widths, heights = self._xs, self._ys, self._widths, \
+            self._heights
+        stack = [(index, rect)]
+        while stack:
+            node, (x, y, width, height) = stack.pop()
+            size = sizes[node]
+            xs[node] = x
+            ys[node] = y
+            if size == 0:
+                widths[node] = 0
+                heights[node] = 0
+                continue
+            widths[node] = width
+            heights[node] = height
+            child = first_children[node]
+            if child == -1 or width * height < min_area:
+                continue
+            if height >= width:
+                # split the height between the children
+                unit = size / height if height else math.inf
+                remaining = height
+                while next_siblings[child] != -1:
+                    space = int(sizes[child] / unit)
+                    stack.append((child, (x, y, width, space)))
+                    remaining -= space
+                    y += space
+                    child = next_siblings[child]
+                stack.append((child, (x, y, width, remaining)))
+            else:
+                # split the width between the children
+                unit = size / width
+                remaining = width
+                while next_siblings[child] != -1:
+                    space = int(sizes[child] / unit)
+                    stack.append((child, (x, y, space, height)))
+                    remaining -= space
+                    x += space
+                    child = next_siblings[child]
+                stack.append((child, (x, y, remaining, height)))
+
+    def _update_rectangles_with(self, index: int,
+                                rect: Tuple[int, int, int, int],
+                                layout: Layout, min_area: int) -> None:
+        """Lay out the node with the given <index> and its descendants inside
+        <rect>, calling <layout> for the children of each node.
+        """
+        sizes = self._sizes
+        xs, ys, widths, heights = self._xs, self._ys, self._widths, \
+            self._heights
+        stack = [(index, rect)]
+        while stack:
+            node, (x, y, width, height) = stack.pop()
+            xs[node] = x
+            ys[node] = y
+            if sizes[node] == 0:
+                widths[node] = 0
+                heights[node] = 0
+                continue
+            widths[node] = width
+            heights[node] = height
+            children = self.children(node)
+            if children and width * height >= min_area:
+                stack.extend(zip(children, layout(
+                    [sizes[child] for child in children], sizes[node],
+                    (x, y, width, height))))
+
+    def _get_child_lists(self) -> Tuple[array, array]:
+        """Return the children of every node as (offsets, children) arrays,
+        computing them if the tree has changed shape since the last call.
+        """
+        if self._child_lists is None:
+            offsets = array('q', [0]) * (len(self) + 1)
+            children = array('q')
+            for node in range(len(self)):
+                offsets[node] = len(children)
+                child = self._first_children[node]
+                while child != -1:
+                    children.append(child)
+                    child = self._next_siblings[child]
+            offsets[len(self)] = len(children)
+            self._child_lists = (offsets, children)
+        return self._child_lists
+
+    def _update_rectangles_by_level(self, index: int,
+                                    rect: Tuple[int, int, int, int],
+                                    min_area: int) -> None:
+        """Lay out the node with the given <index> and its descendants inside
+        <rect>, exactly as TMTree.update_rectangles does, one level of the
+        tree at a time using NumPy.
+
+        Within a level, the span of each child is computed for all children
+        of all nodes at once, and the offset of each child inside its parent
+        is the cumulative sum of the spans of the siblings before it. The
+        arithmetic is done in the same order and precision as in TMTree, so
+        the rectangles are the same.
+        """
+        numpy = _numpy()
+        offsets, children = (numpy.frombuffer(column, dtype=numpy.int64)
+                             for column in self._get_child_lists())
+        counts = numpy.diff(offsets)
+        sizes = numpy.frombuffer(self._sizes, dtype=numpy.int64)
+        xs, ys, widths, heights = (
+            numpy.frombuffer(column, dtype=numpy.int64)
+            for column in (self._xs, self._ys, self._widths, self._heights))
+
+        nodes = numpy.array([index], dtype=numpy.int64)
+        x, y, width, height = (numpy.array([value], dtype=numpy.int64)
+                               for value in rect)
+        while nodes.size:
+            node_sizes = sizes[nodes]
+            empty = node_sizes == 0
+            xs[nodes] = x
+            ys[nodes] = y
+            widths[nodes] = numpy.where(empty, 0, width)
+            heights[nodes] = numpy.where(empty, 0, height)
+
+            # the nodes whose subtrees are laid out at the next level
+            # (nodes smaller than min_area are drawn as a single block)
+            split = ~empty & (counts[nodes] > 0) \
+                & (width * height >= min_area)
+            parents = nodes[split]
+            x, y, width, height = x[split], y[split], width[split], \
+                height[split]
+            node_sizes = node_sizes[split]
+            child_counts = counts[parents]
+            vertical = height >= width
+            length = numpy.where(vertical, height, width)
+            with numpy.errstate(divide='ignore'):
+                # a 0 by 0 rectangle gives every child a span of 0
+                unit = node_sizes / length
+
+            # the children of every parent, in order, and for each child the
+            # position of its parent in <parents> and its own position among
+            # its siblings
+            owner = numpy.repeat(numpy.arange(parents.size), child_counts)
+            first = numpy.cumsum(child_counts) - child_counts
+            rank = numpy.arange(owner.size) - first[owner]
+            nodes = children[offsets[parents][owner] + rank]
+
+            spans = (sizes[nodes] / unit[owner]).astype(numpy.int64)
+            last = rank == child_counts[owner] - 1
+            spans[last] = 0
+            before = numpy.cumsum(spans) - spans
+            before -= before[first][owner]
+            spans[last] = length[owner][last] - before[last]
+
+            vertical = vertical[owner]
+            x = x[owner] + numpy.where(vertical, 0, before)
+            y = y[owner] + numpy.where(vertical, before, 0)
+            width = numpy.where(vertical, width[owner], spans)
+            height = numpy.where(vertical, spans, height[owner])
+
+    def _rectangle(self, node: int) -> Tuple[Tuple[int, int, int, int],
+                                             Tuple[int, int, int]]:
+        """Return the rectangle and the colour of the node with the given
+        index.
+        """
+        colour = self._colours[node]
+        return ((self._xs[node], self._ys[node], self._widths[node],
+                 self._heights[node]),
+                (colour >> 16, colour >> 8 & 0xFF, colour & 0xFF))
+
+    def get_rectangles(self, index: int, min_area: int = 0) -> List[Tuple[
+            Tuple[int, int, int, int], Tuple[int, int, int]]]:
+        """Return the rectangles of the displayed leaves below the node with
+        the given <index>, exactly as TMTree.get_rectangles does.
+        """
+        return list(self.iter_rectangles(index, min_area))
+
+    def iter_rectangles(self, index: int, min_area: int = 0) -> Iterator[
+            Tuple[Tuple[int, int, int, int], Tuple[int, int, int]]]:
+        """Yield the rectangles of the displayed leaves below the node with
+        the given <index> one at a time, exactly as TMTree.iter_rectangles
+        does.
+        """
+        if min_area > 0:
+            yield from self._iter_rectangles_culled(index, min_area)
+            return
+        first_children = self._first_children
+        expanded = self._expanded
+        node = index
+        while True:
+            if first_children[node] != -1 and expanded[node]:
+                node = first_children[node]
+                continue
+            yield self._rectangle(node)
+            # climb until there is a next sibling to visit
+            while node != index and self._next_siblings[node] == -1:
+                node = self._parents[node]
+            if node == index:
+                return
+            node = self._next_siblings[node]
+
+    def _iter_rectangles_culled(self, index: int, min_area: int) -> Iterator[
+            Tuple[Tuple[int, int, int, int], Tuple[int, int, int]]]:
+        """Yield the rectangles of the displayed leaves below the node with
+        the given <index>, treating nodes smaller than <min_area> pixels as
+        leaves and merging neighbouring ones, exactly as
+        TMTree.iter_rectangles does.
+        """
+        widths, heights = self._widths, self._heights
+        # a list on the stack holds the merged small children of a node,
+        # which come after the rectangles of its larger children
+        stack = [index]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                yield from node
+            elif self._first_children[node] == -1 \
+                    or not self._expanded[node] \
+                    or widths[node] * heights[node] < min_area:
+                yield self._rectangle(node)
+            else:
+                small = []
+                larger = []
+                for child in self.children(node):
+                    if widths[child] * heights[child] < min_area:
+                        small.append(self._rectangle(child))
+                    else:
+                        larger.append(child)
+                stack.append(_merge_rectangles(small))
+                stack.extend(reversed(larger))
+
+    def get_tree_at_position(self, index: int, pos: Tuple[int, int],
+                             min_area: int = 0) -> int:
+        """Return the index of the displayed leaf below the node with the
+        given <index> that contains <pos>, exactly as
+        TMTree.get_tree_at_position does, or -1 if there is none.
+        """
+        px, py = pos
+        stack = [index]
+        while stack:
+            node = stack.pop()
+            x, y = self._xs[node], self._ys[node]
+            if not (x <= px <= x + self._widths[node]
+                    and y <= py <= y + self._heights[node]):
+                continue
+            if self._sizes[node] == 0:
+                continue
+            if self._expanded[node] and self._first_children[node] != -1 \
+                    and self._widths[node] * self._heights[node] >= min_area:
+                stack.extend(reversed(self.children(node)))
+            else:
+                return node
+        return -1
+
+    def _displayed_leaves(self, index: int, min_area: int = 0) -> List[int]:
+        """Return the indexes of the displayed leaves below the node with the
+        given <index>, exactly as TMTree._displayed_leaves does.
+        """
+        sizes = self._sizes
+        widths, heights = self._widths, self._heights
+        leaves = []
+        stack = [index]
+        while stack:
+            node = stack.pop()
+            if sizes[node] == 0:
+                continue
+            if self._expanded[node] and self._first_children[node] != -1 \
+                    and widths[node] * heights[node] >= min_area:
+                stack.extend(reversed(self.children(node)))
+            else:
+                leaves.append(node)
+        return leaves
+
+    def _propagate_delta(self, index: int, delta: int) -> None:
+        """Add <delta> to the size of the node with the given <index> and of
+        each of its ancestors.
+        """
+        while index != -1:
+            self._sizes[index] += delta
+            index = self._parents[index]
+
+    def update_data_sizes(self, index: int) -> int:
+        """Update the size of the node with the given <index> and of its
+        descendants from the size of their leaves, and return the new size.
+        """
+        sizes = self._sizes
+        parents = self._parents
+        order = self._preorder(index)
+        for node in order:
+            if self._first_children[node] != -1:
+                sizes[node] = 0
+        # descendants come after their ancestors in pre-order, so each size
+        # is complete by the time it is added to its parent
+        for i in range(len(order) - 1, 0, -1):
+            node = order[i]
+            sizes[parents[node]] += sizes[node]
+        return sizes[index]
+
+
+class TreeView(TMTree):
+    """A TMTree-compatible view of one node in a TreeStore.
+
+    Every attribute of TMTree is a property that reads from (or writes to)
+    the store, so the methods inherited from TMTree work on views. The
+    methods that run over a whole subtree are overridden to run over the
+    store's arrays instead.
+
+    === Private Attributes ===
+    _store:
+        The store that holds this node.
+    _index:
+        The index of this node in the store.
+    """
+
+    __slots__: Tuple[str, ...] = ('_store', '_index', '__weakref__')
+
+    _store: TreeStore
+    _index: int
+
+    def __init__(self, store: TreeStore, index: int) -> None:
+        """Initialize a view of the node with the given <index> in <store>.
+
+        Use TreeStore.view instead, so that each node has only one view.
+        """
+        # The TMTree initializer is not called: all the attributes of a view
+        # live in its store.
+        self._store = store
+        self._index = index
+
+    @property
+    def rect(self) -> Tuple[int, int, int, int]:
+        """The rectangle of this node.
+        """
+        store, i = self._store, self._index
+        return store._xs[i], store._ys[i], store._widths[i], store._heights[i]
+
+    @rect.setter
+    def rect(self, rect: Tuple[int, int, int, int]) -> None:
+        store, i = self._store, self._index
+        store._xs[i], store._ys[i], store._widths[i], store._heights[i] = rect
+
+    @property
+    def data_size(self) -> int:
+        """The size of the data represented by this node.
+        """
+        return self._store._sizes[self._index]
+
+    @data_size.setter
+    def data_size(self, data_size: int) -> None:
+        self._store._sizes[self._index] = data_size
+
+    @property
+    def _colour(self) -> Tuple[int, int, int]:
+        colour = self._store._colours[self._index]
+        return colour >> 16, colour >> 8 & 0xFF, colour & 0xFF
+
+    @property
+    def _name(self) -> Optional[str]:
+        return self._store._strings[self._store._name_ids[self._index]]
+
+    @property
+    def _subtrees(self) -> List[TreeView]:
+        return [self._store.view(child)
+                for child in self._store.children(self._index)]
+
+    @property
+    def _parent_tree(self) -> Optional[TreeView]:
+        parent = self._store._parents[self._index]
+        return None if parent == -1 else self._store.view(parent)
+
+    @property
+    def _expanded(self) -> bool:
+        return bool(self._store._expanded[self._index])
+
+    @_expanded.setter
+    def _expanded(self, expanded: bool) -> None:
+        self._store._expanded[self._index] = expanded
+
+    def update_rectangles(self, rect: Tuple[int, int, int, int],
+                          layout: Optional[Layout] = None,
+                          min_area: int = 0) -> None:
+        """Update the rectangles in this tree and its descendents using the
+        treemap algorithm to fill the area defined by pygame rectangle <rect>.
+        """
+        self._store.update_rectangles(self._index, rect,
+                                      layout or slice_and_dice, min_area)
+
+    def relayout(self, rect: Tuple[int, int, int, int],
+                 layout: Optional[Layout] = None, min_area: int = 0) -> None:
+        """Update the rectangles in this tree and its descendents.
+
+        A TreeStore does not keep track of what has changed, so this lays out
+        the whole tree again, like update_rectangles.
+        """
+        self.update_rectangles(rect, layout, min_area)
+
+    def get_rectangles(self, min_area: int = 0) -> List[Tuple[
+            Tuple[int, int, int, int], Tuple[int, int, int]]]:
+        """Return a list with tuples for every leaf in the displayed-tree
+        rooted at this tree.
+        """
+        return self._store.get_rectangles(self._index, min_area)
+
+    def iter_rectangles(self, min_area: int = 0) -> Iterator[Tuple[
+            Tuple[int, int, int, int], Tuple[int, int, int]]]:
+        """Yield the tuples that get_rectangles returns, in the same order,
+        one at a time.
+        """
+        return self._store.iter_rectangles(self._index, min_area)
+
+    def get_tree_at_position(self, pos: Tuple[int, int],
+                             min_area: int = 0) -> Optional[TMTree]:
+        """Return the leaf in the displayed-tree rooted at this tree whose
+        rectangle contains position <pos>, or None if there is none.
+        """
+        index = self._store.get_tree_at_position(self._index, pos, min_area)
+        return None if index == -1 else self._store.view(index)
+
+    def _displayed_leaves(self, min_area: int = 0) -> List[TMTree]:
+        """Return the leaves of the displayed-tree rooted at this tree that
+        get_tree_at_position can return, in the order in which it tries them.
+        """
+        return [self._store.view(index) for index in
+                self._store._displayed_leaves(self._index, min_area)]
+
+    def update_data_sizes(self) -> int:
+        """Update the data_size for this tree and its subtrees, based on the
+        size of their leaves, and return the new size.
+        """
+        return self._store.update_data_sizes(self._index)
+
+    def _propagate_delta(self, delta: int) -> None:
+        """Add <delta> to the data_size of this node and of each of its
+        ancestors.
+        """
+        self._store._propagate_delta(self._index, delta)
+
+    def move(self, destination: TMTree) -> None:
+        """If this tree is a leaf, and <destination> is not a leaf, move this
+        tree to be the last subtree of <destination>. Otherwise, do nothing.
+
+        Precondition: <destination> is a view in the same store.
+        """
+        store = self._store
+        if store._first_children[self._index] != -1 or \
+                store._first_children[destination._index] == -1:
+            return
+        parent = store._parents[self._index]
+        store._unlink(self._index)
+        store._append(self._index, destination._index)
+        store._propagate_delta(parent, -self.data_size)
+        store._propagate_delta(destination._index, self.data_size)
+        if store._first_children[parent] == -1:
+            store.view(parent).delete_self()
+
+    def delete_self(self) -> bool:
+        """Removes the current node from the visualization and
+        returns whether the deletion was successful.
+
+        Only do this if this node has a parent tree.
+        """
+        store = self._store
+        parent = store._parents[self._index]
+        if parent == -1:
+            return False
+        store._unlink(self._index)
+        store._propagate_delta(parent, -self.data_size)
+        if store._first_children[parent] == -1:
+            store.view(parent).delete_self()
+        return True
+
+    def expand_all(self) -> None:
+        """
+        Expand the current folder and all folders inside
+        """
+        store = self._store
+        store._expanded[self._index] = True
+        for node in store._preorder(self._index):
+            if store._first_children[node] != -1:
+                store._expanded[node] = True
+
+    def get_separator(self) -> str:
+        """Return the separator of the tree this store was built from.
+        """
+        return self._store._separator
+
+    def get_suffix(self) -> str:
+        """Return the suffix the tree this store was built from would give
+        this node.
+        """
+        return self._store._describe(self)
+
+
+def _describer_for(tree: TMTree) -> Callable[[TreeView], str]:
+    """Return a function that gives a view the suffix that a node of <tree>'s
+    class would have.
+    """
+    if isinstance(tree, FileSystemTree):
+        return lambda view: _describe_file_system_tree(
+            len(view._store.children(view._index)), view.data_size)
+    if isinstance(tree, PaperTree):
+        return lambda view: (' (Category)'
+                             if view._store.children(view._index)
+                             else ' (Paper)')
+    return lambda view: ''
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'importlib', 'math', 'weakref', 'array',
+            '__future__', 'functools', 'types', 'papers', 'tm_trees', 'numpy'
+        ],
+        'max-attributes': 16,
+        'disable': ['W0231']
+    })
@@ -22,8 +22,131 @@ from __future__ import annotations
 
 import math
 import os
+from array import array
 from random import randint
-from typing import List, Tuple, Optional
+from typing import Callable, Dict, Iterator, List, Tuple, Optional
+
+from fs_scan import Listing, folder_size, list_folder, list_folders, \
+    read_snapshot, write_snapshot
+
+
+# A layout divides a rectangle between the subtrees of a tree: it is called
+# with the sizes of the subtrees, their total and the rectangle, and returns
+# one rectangle for each subtree, in the same order.
+Layout = Callable[[List[int], int, Tuple[int, int, int, int]],
+                  List[Tuple[int, int, int, int]]]
+
+
+def slice_and_dice(sizes: List[int], total: int,
+                   rect: Tuple[int, int, int, int]) -> List[
+                       Tuple[int, int, int, int]]:
+    """Return the rectangles of subtrees with the given <sizes>, which add up
+    to <total>, placed side by side inside <rect>.
+
+    The subtrees split the longer side of <rect> (the height, if the two are
+    equal) in proportion to their sizes, and the last subtree gets whatever
+    is left, so the rectangles fill <rect> exactly.
+    """
+    if not sizes:
+        return []
+    x, y, width, height = rect
+    rects = []
+    if height >= width:
+        # a rectangle with no area has nothing to split
+        unit = total / height if height else math.inf
+        for size in sizes[:-1]:
+            space = int(size / unit)
+            rects.append((x, y, width, space))
+            # where the next rectangle will begin height-wise
+            height -= space
+            y += space
+        rects.append((x, y, width, height))
+    else:
+        unit = total / width
+        for size in sizes[:-1]:
+            space = int(size / unit)
+            rects.append((x, y, space, height))
+            # where the next rectangle will begin width-wise
+            width -= space
+            x += space
+        rects.append((x, y, width, height))
+    return rects
+
+
+def squarified(sizes: List[int], total: int,
+               rect: Tuple[int, int, int, int]) -> List[
+                   Tuple[int, int, int, int]]:
+    """Return the rectangles of subtrees with the given <sizes>, which add up
+    to <total>, laid out inside <rect> so that they are as close to square
+    as possible.
+
+    This is the squarified treemap algorithm of Bruls, Huizing and van Wijk:
+    the subtrees are taken from largest to smallest, and placed in rows along
+    the shorter side of the space that is left. A row takes the next subtree
+    for as long as that makes its most elongated rectangle less elongated.
+    The subtrees are sorted once and each is added to a row once, so the
+    layout takes O(n log n) time for n subtrees.
+
+    The rectangles fill <rect> exactly, and a subtree of size 0 gets a
+    rectangle with no area.
+    """
+    x, y, width, height = rect
+    rects = [(x, y, 0, 0)] * len(sizes)
+    order = sorted((i for i in range(len(sizes)) if sizes[i] > 0),
+                   key=sizes.__getitem__, reverse=True)
+    remaining = total
+    start = 0
+    while start < len(order):
+        side = min(width, height)
+        largest = sizes[order[start]]
+        row = largest
+        end = start + 1
+        if side > 0:
+            # the ratio between the two sides of a rectangle in the row is
+            # row ** 2 * area / (size * side ** 2 * remaining), or its inverse
+            scale = side * side * remaining
+            area = width * height
+            worst = max(row * row * area / (largest * scale),
+                        largest * scale / (row * row * area))
+            while end < len(order):
+                size = sizes[order[end]]
+                total_row = row + size
+                ratio = max(total_row * total_row * area / (size * scale),
+                            largest * scale / (total_row * total_row * area))
+                if ratio > worst:
+                    break
+                row, worst = total_row, ratio
+                end += 1
+        else:
+            # there is no space left, so the rest share one empty row
+            end = len(order)
+        if width >= height:
+            # a column at the left of the space that is left
+            thickness = width if end == len(order) \
+                else row * width // remaining
+            done = edge = 0
+            for i in order[start:end]:
+                done += sizes[i]
+                next_edge = done * height // row
+                rects[i] = (x, y + edge, thickness, next_edge - edge)
+                edge = next_edge
+            x += thickness
+            width -= thickness
+        else:
+            # a row at the top of the space that is left
+            thickness = height if end == len(order) \
+                else row * height // remaining
+            done = edge = 0
+            for i in order[start:end]:
+                done += sizes[i]
+                next_edge = done * width // row
+                rects[i] = (x + edge, y, next_edge - edge, thickness)
+                edge = next_edge
+            y += thickness
+            height -= thickness
+        remaining -= row
+        start = end
+    return rects
 
 
 class TMTree:
@@ -58,6 +181,9 @@ class TMTree:
         as a subtree, or None if this tree is not part of a larger tree.
     _expanded:
         Whether or not this tree is considered expanded for visualization.
+    _dirty:
+        Whether or not this tree, or a tree below it, has changed since it
+        was last laid out, so that relayout has to lay it out again.
 
     === Representation Invariants ===
     - data_size >= 0
@@ -78,6 +204,12 @@ class TMTree:
     - if _subtrees is empty, then _expanded is False
     """
 
+    # Trees can have tens of millions of nodes, so they store their
+    # attributes in slots rather than in a __dict__ for each node.
+    __slots__: Tuple[str, ...] = ('rect', 'data_size', '_colour', '_name',
+                                  '_subtrees', '_parent_tree', '_expanded',
+                                  '_dirty')
+
     rect: Tuple[int, int, int, int]
     data_size: int
     _colour: Tuple[int, int, int]
@@ -85,6 +217,7 @@ class TMTree:
     _subtrees: List[TMTree]
     _parent_tree: Optional[TMTree]
     _expanded: bool
+    _dirty: bool
 
     def __init__(self, name: str, subtrees: List[TMTree],
                  data_size: int = 0) -> None:
@@ -105,6 +238,7 @@ class TMTree:
         self._subtrees = subtrees[:]
         self._parent_tree = None
         self._expanded = False
+        self._dirty = True
 
         # 1. Initialize self._colour and self.data_size, according to the
         # docstring.
@@ -131,131 +265,205 @@ class TMTree:
         """
         return self._parent_tree
 
-    def update_rectangles(self, rect: Tuple[int, int, int, int]) -> None:
+    def update_rectangles(self, rect: Tuple[int, int, int, int],
+                          layout: Optional[Layout] = None,
+                          min_area: int = 0) -> None:
         """Update the rectangles in this tree and its descendents using the
         treemap algorithm to fill the area defined by pygame rectangle <rect>.
+
+        <layout> is the function that divides the rectangle of each tree
+        between its subtrees, slice_and_dice if it is not given.
+
+        A tree whose rectangle has an area smaller than <min_area> pixels is
+        drawn as a single block, so its descendents are not laid out.
+        """
+        self._layout(rect, layout or slice_and_dice, min_area, False)
+
+    def relayout(self, rect: Tuple[int, int, int, int],
+                 layout: Optional[Layout] = None, min_area: int = 0) -> None:
+        """Update the rectangles in this tree and its descendents like
+        update_rectangles does, assuming that the tree was last laid out with
+        the same <layout> and <min_area>.
+
+        Only the trees that have changed since then, and the trees whose
+        rectangle has changed, are laid out again. A tree that has not
+        changed but has only moved is moved with all of its descendents.
         """
-        # Read the handout carefully to help get started identifying base cases,
-        # then write the outline of a recursive step.
-        #
-        # Programming tip: use "tuple unpacking assignment" to easily extract
-        # elements of a rectangle, as follows.
-        # x, y, width, height = rect
+        self._layout(rect, layout or slice_and_dice, min_area, True)
 
+    def _layout(self, rect: Tuple[int, int, int, int], layout: Layout,
+                min_area: int, incremental: bool) -> None:
+        """Helper for update_rectangles and relayout, which lays out this tree
+        inside <rect>, skipping the trees that have not changed if
+        <incremental> is True.
+        """
+        if incremental and not self._dirty and self.data_size != 0:
+            if rect == self.rect:
+                return
+            if rect[2] == self.rect[2] and rect[3] == self.rect[3]:
+                self._translate(rect[0] - self.rect[0], rect[1] - self.rect[1],
+                                min_area)
+                return
+        self._dirty = False
         # if self is empty, just return the entire coordinates back with a
         # width and height of 0
         if self.data_size == 0:
             self.rect = (rect[0], rect[1], 0, 0)
-            return None
+            return
         self.rect = rect
-        x, y, width, height = rect
-        # used a helper function that gets called depending on if the width
-        # or height is the larger value (if the two values are equal, it will
-        # split vertically)
-        if height >= width:
-            self._update_subtrees_vertically(x, y, width, height)
-        else:
-            self._update_subtrees_horizontally(x, y, width, height)
-        return None
-
-    def _update_subtrees_horizontally(self, x: int, y: int, width: int,
-                                      height: int) -> None:
-        """
-        Helper function for update_rectangles.
-
-        This function takes all subtrees of a specific folder and divides the
-        total space vertically into smaller rectangles respective to their total
-        size.
-        """
-        remaining_w = width
-        # iterate over all subtrees except the last one
-        for subtree in self._subtrees[:-1]:
-            # find total space subtree will occupy compared to the overall size
-            # of the rectangle, assigning the rectangle that space
-            space = int(subtree.data_size / (self.data_size / width))
-            subtree.update_rectangles((x, y, space, height))
-            # reduce the available width by how much space the current rectangle
-            # used and where the next rectangle will begin width-wise
-            remaining_w -= space
-            x += space
-        if len(self._subtrees) != 0:
-            self._subtrees[-1].update_rectangles((x, y, remaining_w, height))
-
-    def _update_subtrees_vertically(self, x: int, y: int, width: int,
-                                    height: int) -> None:
-        """
-        Helper function for update_rectangles.
-
-        This function takes all subtrees of a specific folder and divides the
-        total space horizontally into smaller rectangles respective to their
-        total size.
-        """
-        remaining_h = height
-        # iterate over all subtrees except the last one
-        for subtree in self._subtrees[:-1]:
-            # find total space subtree will occupy compared to the overall size
-            # of the rectangle, assigning the rectangle that space
-            space = int(subtree.data_size / (self.data_size / height))
-            subtree.update_rectangles((x, y, width, space))
-            # reduce the available width by how much space the current rectangle
-            # used and where the next rectangle will begin height-wise
-            remaining_h -= space
-            y += space
-        if len(self._subtrees) != 0:
-            self._subtrees[-1].update_rectangles((x, y, width, remaining_h))
+        if self._subtrees and rect[2] * rect[3] >= min_area:
+            rects = layout([subtree.data_size for subtree in self._subtrees],
+                           self.data_size, rect)
+            for subtree, subtree_rect in zip(self._subtrees, rects):
+                subtree._layout(subtree_rect, layout, min_area, incremental)
+
+    def _translate(self, dx: int, dy: int, min_area: int) -> None:
+        """Move the rectangles of this tree and of the descendents that were
+        laid out with it by <dx> pixels right and <dy> pixels down.
+        """
+        x, y, width, height = self.rect
+        self.rect = (x + dx, y + dy, width, height)
+        if self.data_size != 0 and width * height >= min_area:
+            for subtree in self._subtrees:
+                subtree._translate(dx, dy, min_area)
 
-    def get_rectangles(self) -> List[Tuple[Tuple[int, int, int, int],
-                                           Tuple[int, int, int]]]:
+    def get_rectangles(self, min_area: int = 0) -> List[Tuple[
+            Tuple[int, int, int, int], Tuple[int, int, int]]]:
         """Return a list with tuples for every leaf in the displayed-tree
         rooted at this tree. Each tuple consists of a tuple that defines the
         appropriate pygame rectangle to display for a leaf, and the colour
         to fill it with.
+
+        A tree whose rectangle has an area smaller than <min_area> pixels is
+        treated as a leaf, and neighbouring subtrees of the same tree that
+        are that small are drawn together as a single grey block.
+        """
+        rectangles = []
+        self._add_rectangles(rectangles, min_area)
+        return rectangles
+
+    def _add_rectangles(self,
+                        rectangles: List[Tuple[Tuple[int, int, int, int],
+                                               Tuple[int, int, int]]],
+                        min_area: int) -> None:
+        """Helper for get_rectangles, which appends the tuples for every leaf
+        in the displayed-tree rooted at this tree to <rectangles>.
+
+        Every tree appends to the same list, rather than returning a list that
+        its parent copies into its own.
         """
-        lst = []
-        # return the dimensions and colour if self is only a file
-        if self._subtrees == [] or not self._expanded:
-            lst.append((self.rect, self._colour))
+        # add the dimensions and colour if self is displayed as a leaf
+        if self._subtrees == [] or not self._expanded \
+                or self.rect[2] * self.rect[3] < min_area:
+            rectangles.append((self.rect, self._colour))
+        elif min_area == 0:
+            for subtree in self._subtrees:
+                subtree._add_rectangles(rectangles, 0)
         else:
-            # if self is a folder, add all displayed leaf's dimensions
-            # and colour into a list
+            small = []
             for subtree in self._subtrees:
-                lst.extend(subtree.get_rectangles())
-        return lst
-
-    def get_tree_at_position(self, pos: Tuple[int, int]) -> Optional[TMTree]:
+                if subtree.rect[2] * subtree.rect[3] < min_area:
+                    small.append((subtree.rect, subtree._colour))
+                else:
+                    subtree._add_rectangles(rectangles, min_area)
+            if small:
+                rectangles.extend(_merge_rectangles(small))
+
+    def iter_rectangles(self, min_area: int = 0) -> Iterator[Tuple[
+            Tuple[int, int, int, int], Tuple[int, int, int]]]:
+        """Yield the tuples that get_rectangles returns, in the same order,
+        one at a time, without building a list of them all.
+        """
+        # a list on the stack holds the merged small subtrees of a tree,
+        # which come after the rectangles of its larger subtrees
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            if isinstance(tree, list):
+                yield from tree
+            elif tree._subtrees == [] or not tree._expanded \
+                    or tree.rect[2] * tree.rect[3] < min_area:
+                # the dimensions and colour of a displayed leaf
+                yield tree.rect, tree._colour
+            elif min_area == 0:
+                stack.extend(reversed(tree._subtrees))
+            else:
+                small = []
+                larger = []
+                for subtree in tree._subtrees:
+                    if subtree.rect[2] * subtree.rect[3] < min_area:
+                        small.append((subtree.rect, subtree._colour))
+                    else:
+                        larger.append(subtree)
+                if small:
+                    stack.append(_merge_rectangles(small))
+                stack.extend(reversed(larger))
+
+    def get_tree_at_position(self, pos: Tuple[int, int],
+                             min_area: int = 0) -> Optional[TMTree]:
         """
         Return the leaf in the displayed-tree rooted at this tree whose
         rectangle contains position <pos>, or None if <pos> is outside of this
         tree's rectangle.
+
+        A tree whose rectangle has an area smaller than <min_area> pixels is
+        treated as a leaf, as it is in get_rectangles.
         """
         x, y, width, height = self.rect
         # check if pos coordinates are within the space of the rectangle
         if x <= pos[0] <= x + width and y <= pos[1] <= y + height:
-            return self.gtp_helper(pos)
+            return self.gtp_helper(pos, min_area)
         return None
 
-    def gtp_helper(self, pos: Tuple[int, int]) -> Optional[TMTree]:
+    def gtp_helper(self, pos: Tuple[int, int],
+                   min_area: int = 0) -> Optional[TMTree]:
         """
         Helper for get_tree_at_position which returns self if the cursor has
         selected the correct leaf, otherwise it will return None.
         """
         if self.data_size == 0:
             return None
-        if self._expanded and self._subtrees:
+        if self._expanded and self._subtrees \
+                and self.rect[2] * self.rect[3] >= min_area:
             # iterate over each subtree to find which subtree the cursor is on
             for subtree in self._subtrees:
-                result = subtree.get_tree_at_position(pos)
+                result = subtree.get_tree_at_position(pos, min_area)
                 if result:
                     return result
         else:
             return self
         return None
 
+    def _displayed_leaves(self, min_area: int = 0) -> List[TMTree]:
+        """Return the leaves of the displayed-tree rooted at this tree that
+        get_tree_at_position can return, in the order in which it tries them.
+
+        Like in get_tree_at_position, a tree whose rectangle has an area
+        smaller than <min_area> pixels is treated as a leaf, and trees of
+        size 0 are left out.
+        """
+        leaves = []
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            if tree.data_size == 0:
+                continue
+            if tree._expanded and tree._subtrees \
+                    and tree.rect[2] * tree.rect[3] >= min_area:
+                stack.extend(reversed(tree._subtrees))
+            else:
+                leaves.append(tree)
+        return leaves
+
     def update_data_sizes(self) -> int:
         """Update the data_size for this tree and its subtrees, based on the
         size of their leaves, and return the new size.
 
         If this tree is a leaf, return its size unchanged.
+
+        change_size, move and delete_self keep the sizes of all ancestors up
+        to date themselves, so this is only needed to check or repair the
+        sizes of a tree whose leaves were changed directly.
         """
         # if self is empty, the size of self is 0
         if self.is_empty():
@@ -268,6 +476,9 @@ class TMTree:
             # add up the size of each subtree recursively, then update self
             for subtree in self._subtrees:
                 updated_size += subtree.update_data_sizes()
+                self._dirty = self._dirty or subtree._dirty
+            if updated_size != self.data_size:
+                self._dirty = True
             self.data_size = updated_size
             return updated_size
 
@@ -277,18 +488,19 @@ class TMTree:
         """
         # check if self is a leaf and the destination is not a leaf
         if self._subtrees == [] and destination._subtrees != []:
+            old_parent = self._parent_tree
             # add self to the destinations list of subtrees
             destination._subtrees.append(self)
             # remove self from its parent tree
-            self._parent_tree._subtrees.remove(self)
-            # check if the parent tree is now empty and if so, delete the
-            # parent tree
-            if len(self._parent_tree._subtrees) == 0:
-                self._parent_tree.delete_self()
-            # update self.data_size
-            self._parent_tree.data_size = self._parent_tree.update_data_sizes()
+            old_parent._subtrees.remove(self)
+            # move the size of self from the old ancestors to the new ones
+            old_parent._propagate_delta(-self.data_size)
+            destination._propagate_delta(self.data_size)
             # change the parent tree to the destination
             self._parent_tree = destination
+            # check if the old parent tree is now empty and if so, delete it
+            if len(old_parent._subtrees) == 0:
+                old_parent.delete_self()
         return
 
     def change_size(self, factor: float) -> None:
@@ -306,11 +518,13 @@ class TMTree:
             new_size_floor = (math.floor(self.data_size * factor)
                               + self.data_size)
             if factor > 0:
-                self.data_size = new_size_ceil
+                new_size = new_size_ceil
             else:
-                self.data_size = new_size_floor
+                new_size = new_size_floor
             if new_size_floor < 1:
-                self.data_size = 1
+                new_size = 1
+            # the change in size is added to every ancestor as well
+            self._propagate_delta(new_size - self.data_size)
         return
 
     def delete_self(self) -> bool:
@@ -321,14 +535,27 @@ class TMTree:
         """
         # ensure self has a parent tree
         if self._parent_tree is not None:
-            # remove self from its parent tree
+            # remove self from its parent tree, and its size from the
+            # parent tree and every other ancestor
             self._parent_tree._subtrees.remove(self)
+            self._parent_tree._propagate_delta(-self.data_size)
             # if the parent tree is now empty, delete the parent tree
             if self._parent_tree._subtrees == []:
                 self._parent_tree.delete_self()
             return True
         return False
 
+    def _propagate_delta(self, delta: int) -> None:
+        """Add <delta> to the data_size of this tree and of each of its
+        ancestors, and mark them as changed so that relayout lays them out
+        again.
+        """
+        tree = self
+        while tree is not None:
+            tree.data_size += delta
+            tree._dirty = True
+            tree = tree._parent_tree
+
     def expand(self) -> None:
         """
         Expand the current folder
@@ -396,6 +623,40 @@ class TMTree:
         raise NotImplementedError
 
 
+# The colour of a block of subtrees too small to be drawn on their own
+_OTHER_COLOUR = (128, 128, 128)
+
+
+def _merge_rectangles(rectangles: List[Tuple[Tuple[int, int, int, int],
+                                             Tuple[int, int, int]]]) -> List[
+        Tuple[Tuple[int, int, int, int], Tuple[int, int, int]]]:
+    """Return the (rectangle, colour) tuples in <rectangles>, with rectangles
+    that share a whole side merged into one grey rectangle, and rectangles
+    with no area left out.
+    """
+    merged = []
+    block = None
+    colour = _OTHER_COLOUR
+    for rect, rect_colour in sorted(rectangles):
+        x, y, width, height = rect
+        if width == 0 or height == 0:
+            continue
+        if block is None:
+            block, colour = rect, rect_colour
+            continue
+        bx, by, b_width, b_height = block
+        if x == bx and width == b_width and y == by + b_height:
+            block, colour = (bx, by, b_width, b_height + height), _OTHER_COLOUR
+        elif y == by and height == b_height and x == bx + b_width:
+            block, colour = (bx, by, b_width + width, b_height), _OTHER_COLOUR
+        else:
+            merged.append((block, colour))
+            block, colour = rect, rect_colour
+    if block is not None:
+        merged.append((block, colour))
+    return merged
+
+
 def get_subtree_size(path: str) -> int:
     """
     return total size of <path>
@@ -422,33 +683,365 @@ class FileSystemTree(TMTree):
 
     The data_size attribute for regular files is simply the size of the file,
     as reported by os.path.getsize.
+
+    === Private Attributes ===
+    _mtime:
+        The modification time of this folder, in nanoseconds, when it was
+        last listed, or None if this tree is a file.
+    _path:
+        The full path of this file or folder if this tree is the root of a
+        scan, or None otherwise.
+    _pending:
+        True iff this tree is a folder whose subtrees have not been read from
+        disk yet. Its data_size is still the total size of the files below it.
     """
 
-    def __init__(self, path: str) -> None:
+    __slots__: Tuple[str, ...] = ('_mtime', '_path', '_pending')
+
+    _mtime: Optional[int]
+    _path: Optional[str]
+    _pending: bool
+
+    def __init__(self, path: str, max_workers: int = 1,
+                 snapshot: Optional[str] = None, lazy: bool = False) -> None:
         """Store the file tree structure contained in the given file or folder.
 
+        If <max_workers> is greater than 1, list sibling folders in parallel
+        using a pool of <max_workers> threads. The resulting tree is the same
+        as the one built by a serial scan.
+
+        If <snapshot> is the name of a file written by save_snapshot for this
+        <path>, load the tree from it instead, and only list again the
+        folders whose modification time has changed since it was saved.
+
+        If <lazy> is True, only compute the total size of the folder, and
+        read the subtrees of each folder from disk the first time it is
+        expanded (or when they are otherwise needed). With a <snapshot>, the
+        files and folders inside the folder are loaded from it, but only the
+        saved total size of each folder inside it is kept, and their subtrees
+        are read from disk when they are needed. If <lazy> is False, the
+        folders that a lazy tree saved without their subtrees are read from
+        disk when the snapshot is loaded.
+
         Precondition: <path> is a valid path for this computer.
         """
-        # Remember that you should recursively go through the file system
-        # and create new FileSystemTree objects for each file and folder
-        # encountered.
-        #
-        # Also remember to make good use of the superclass constructor!
-        file = os.path.basename(path)
+        # Each folder is listed exactly once by _scan_folder, and the size of
+        # a folder is taken from its already-built subtrees by the superclass
+        # constructor, so nothing on disk is visited twice.
+        name = os.path.basename(path)
+        self._path = path
+        self._pending = False
         if os.path.isfile(path):  # checks if path is a file
-            TMTree.__init__(self, file, [],
-                            os.path.getsize(path))
-        else:  # path is a folder
-            subtrees = []
-            for subtree in os.listdir(path):
-                # create a new FileSystemTree of the subtree and add it to the
-                # parent trees subtree list
-                new_path = os.path.join(path, subtree)
-                subfolder = FileSystemTree(new_path)
-                subtrees.append(subfolder)
-            # use get_subtree_size helper function to get size of the subtree
-            # initialize the tree
-            TMTree.__init__(self, file, subtrees, get_subtree_size(path))
+            TMTree.__init__(self, name, [], os.path.getsize(path))
+            self._mtime = None
+        elif snapshot is not None and self._load_snapshot(path, snapshot,
+                                                          lazy):
+            return
+        elif lazy:
+            self._mtime = os.stat(path).st_mtime_ns
+            TMTree.__init__(self, name, [], folder_size(path))
+            self._pending = True
+        else:
+            self._mtime = os.stat(path).st_mtime_ns
+            if max_workers > 1:
+                subtrees = _scan_folder_parallel(path, max_workers)
+            else:
+                subtrees = _scan_folder(path)
+            TMTree.__init__(self, name, subtrees)
+
+    def save_snapshot(self, filename: str) -> None:
+        """Save this tree to the file <filename>, so that it can be loaded
+        again by FileSystemTree(path, snapshot=<filename>).
+
+        The snapshot stores the name, size and modification time of every
+        file and folder, the index of its parent, and whether it is a folder
+        whose subtrees have not been read yet, in pre-order.
+        """
+        parents = array('q')
+        sizes = array('q')
+        mtimes = array('q')
+        pending = bytearray()
+        names = []
+        stack = [(self, -1)]
+        while stack:
+            tree, parent = stack.pop()
+            index = len(parents)
+            parents.append(parent)
+            sizes.append(tree.data_size)
+            mtimes.append(-1 if tree._mtime is None else tree._mtime)
+            pending.append(tree._pending)
+            names.append(tree._name)
+            # push in reverse so that subtrees are written in their order
+            for subtree in reversed(tree._subtrees):
+                stack.append((subtree, index))
+        write_snapshot(filename, self._get_os_path(),
+                       (parents, sizes, mtimes, bytes(pending), names))
+
+    def _load_snapshot(self, path: str, filename: str,
+                       lazy: bool = False) -> bool:
+        """Initialize this tree from the snapshot file <filename>, then bring
+        it up to date with the folder at <path>. Return whether the snapshot
+        could be used.
+
+        If <lazy> is True, the trees below the folders inside this folder are
+        not loaded, and those folders are left for _load_subtrees to read.
+        Otherwise, the folders that were saved without their subtrees are
+        read from disk.
+
+        Return False without changing anything if the file is missing,
+        unreadable, truncated or corrupt, or was saved for a different path or
+        machine.
+        """
+        snapshot = read_snapshot(filename, path)
+        if snapshot is None:
+            return False
+        parents, sizes, mtimes, pending, names = snapshot
+        TMTree.__init__(self, names[0], [], sizes[0])
+        self._mtime = mtimes[0]
+        self._pending = bool(pending[0])
+        trees = [self]
+        for i in range(1, len(parents)):
+            parent = trees[parents[i]]
+            if lazy and parent is not self:
+                trees.append(None)
+                continue
+            tree = _new_file_system_tree(
+                names[i], [], sizes[i],
+                None if mtimes[i] == -1 else mtimes[i])
+            tree._pending = bool(pending[i]) or \
+                lazy and tree._mtime is not None
+            parent._subtrees.append(tree)
+            tree._parent_tree = parent
+            trees.append(tree)
+        if not lazy:
+            for tree in trees:
+                if tree is not None and tree._pending:
+                    tree._read_all_subtrees()
+        self._refresh_folder(path)
+        return True
+
+    def refresh(self) -> bool:
+        """Bring this tree up to date with the file system, and return whether
+        anything changed.
+
+        Only the folders whose modification time has changed since they were
+        last listed are listed again. Their subtrees are patched in place, so
+        files and folders that are still there keep their tree (and colour),
+        and the change in size of each folder is added to the data_size of
+        all of its ancestors.
+
+        Note that changing the contents of a file does not change the
+        modification time of its folder, so a file that grows in place is only
+        noticed when its folder changes for some other reason. In the same
+        way, a folder whose subtrees have not been read yet is only walked
+        again when its own modification time has changed, so a change deeper
+        inside it is only noticed by update_folder.
+        """
+        path = self._get_os_path()
+        if self._mtime is None:
+            delta = os.path.getsize(path) - self.data_size
+            self._propagate_delta(delta)
+            return delta != 0
+        return self._refresh_folder(path)
+
+    def _refresh_folder(self, path: str) -> bool:
+        """Bring this folder, and every folder below it, up to date with the
+        folder at <path>, and return whether anything changed.
+
+        Helper for refresh, which documents what this does.
+        """
+        mtime = os.stat(path).st_mtime_ns
+        changed = mtime != self._mtime
+        if self._pending:
+            if changed:
+                self._mtime = mtime
+                self._propagate_delta(folder_size(path) - self.data_size)
+            return changed
+        fresh = self._relist(path, mtime) if changed else []
+        fresh_ids = {id(subtree) for subtree in fresh}
+        for subtree in self._subtrees:
+            if subtree._mtime is not None and id(subtree) not in fresh_ids:
+                changed = subtree._refresh_folder(
+                    os.path.join(path, subtree._name)) or changed
+        return changed
+
+    def update_folder(self, path: str) -> Optional[FileSystemTree]:
+        """List the folder at <path> again, whether or not its modification
+        time has changed, and patch its subtrees in place. Return the tree
+        for that folder, or None if it is not a folder in this tree.
+
+        Files and folders that are still there keep their tree, with the new
+        size of each file; the folders inside it are not listed again. The
+        change in size is added to the data_size of all of its ancestors.
+
+        If <path> is inside a folder whose subtrees have not been read yet,
+        only the total size of that folder is computed again, and that folder
+        is returned.
+        """
+        folder = self._find_folder(path)
+        if folder is None or not os.path.isdir(path):
+            return None
+        if folder._pending:
+            folder._propagate_delta(folder_size(folder._get_os_path())
+                                    - folder.data_size)
+        else:
+            folder._relist(path, os.stat(path).st_mtime_ns)
+        return folder
+
+    def _find_folder(self, path: str) -> Optional[FileSystemTree]:
+        """Return the folder in this tree at <path>, or None if there is no
+        such folder.
+
+        If <path> is inside a folder whose subtrees have not been read yet,
+        return that folder.
+        """
+        relative = os.path.relpath(path, self._get_os_path())
+        if relative == os.curdir:
+            return self if self._mtime is not None else None
+        tree = self
+        for name in relative.split(os.sep):
+            if tree._pending:
+                return tree
+            for subtree in tree._subtrees:
+                if subtree._name == name and subtree._mtime is not None:
+                    tree = subtree
+                    break
+            else:
+                return None
+        return tree
+
+    def _relist(self, path: str, mtime: int) -> List[FileSystemTree]:
+        """List this folder again from the folder at <path>, whose
+        modification time is <mtime>, and patch its subtrees in place.
+        Return the folders that were new, and so were scanned from scratch.
+
+        Files and folders that are still there keep their tree, with the new
+        size of each file, and the change in size of this folder is added to
+        the data_size of this tree and all of its ancestors. The trees of
+        files and folders that are gone no longer have a parent.
+        """
+        old_subtrees = {subtree._name: subtree for subtree in self._subtrees}
+        subtrees = []
+        fresh = []
+        for name, size, child_mtime in list_folder(path):
+            subtree = old_subtrees.get(name)
+            if subtree is not None and \
+                    (subtree._mtime is None) == (child_mtime is None):
+                if child_mtime is None:
+                    subtree.data_size = size
+            elif child_mtime is None:
+                subtree = _new_file_system_tree(name, [], size)
+            else:
+                subtree = _new_file_system_tree(
+                    name, _scan_folder(os.path.join(path, name)), 0,
+                    child_mtime)
+                fresh.append(subtree)
+            subtree._parent_tree = self
+            subtrees.append(subtree)
+        kept = {id(subtree) for subtree in subtrees}
+        for subtree in old_subtrees.values():
+            if id(subtree) not in kept:
+                subtree._parent_tree = None
+        self._subtrees = subtrees
+        self._mtime = mtime
+        if not subtrees:
+            self._expanded = False
+        # folders that were kept still have their old size here; any change
+        # below them is propagated when they are refreshed
+        self._propagate_delta(sum(subtree.data_size for subtree in subtrees)
+                              - self.data_size)
+        return fresh
+
+    def _load_subtrees(self) -> None:
+        """Read the subtrees of this folder from disk, if they have not been
+        read yet. They are not laid out until the folder is laid out again.
+
+        Files get their size from the listing, and folders only get the total
+        size of the files below them; their own subtrees are read when they
+        are needed. Only the total size of each folder is kept, so memory
+        grows with the folders that have been read, not with the folders on
+        disk.
+        """
+        if not self._pending:
+            return
+        path = self._get_os_path()
+        self._pending = False
+        subtrees = []
+        for name, size, mtime in list_folder(path):
+            if mtime is None:
+                subtree = _new_file_system_tree(name, [], size)
+            else:
+                subtree = _new_file_system_tree(
+                    name, [], folder_size(os.path.join(path, name)), mtime)
+                subtree._pending = True
+            subtree._parent_tree = self
+            subtrees.append(subtree)
+        self._subtrees = subtrees
+        # the folder may have changed since its total size was computed
+        self._propagate_delta(sum(subtree.data_size for subtree in subtrees)
+                              - self.data_size)
+
+    def _read_all_subtrees(self) -> None:
+        """Read the subtrees of this folder, and of every folder below it,
+        from disk in a single pass, if they have not been read yet.
+        """
+        if not self._pending:
+            return
+        self._pending = False
+        self._subtrees = _scan_folder(self._get_os_path())
+        for subtree in self._subtrees:
+            subtree._parent_tree = self
+        self._propagate_delta(sum(subtree.data_size
+                                  for subtree in self._subtrees)
+                              - self.data_size)
+
+    def expand(self) -> None:
+        """
+        Expand the current folder, reading its subtrees from disk first if
+        needed
+        """
+        self._load_subtrees()
+        TMTree.expand(self)
+
+    def expand_all(self) -> None:
+        """
+        Expand the current folder and all folders inside, reading them from
+        disk first if needed
+        """
+        self._read_all_subtrees()
+        self._expanded = True
+        for subtree in self._subtrees:
+            if subtree._subtrees or subtree._pending:
+                subtree.expand_all()
+
+    def move(self, destination: TMTree) -> None:
+        """Move this tree into <destination>, as TMTree.move does, reading the
+        subtrees of <destination> from disk first if needed.
+
+        A folder whose subtrees have not been read yet is not a leaf, so it is
+        never moved.
+        """
+        if isinstance(destination, FileSystemTree):
+            destination._load_subtrees()
+        if not self._pending:
+            TMTree.move(self, destination)
+
+    def change_size(self, factor: float) -> None:
+        """Change the size of this tree by <factor>, as TMTree.change_size
+        does.
+
+        A folder whose subtrees have not been read yet is not a leaf, so its
+        size is never changed.
+        """
+        if not self._pending:
+            TMTree.change_size(self, factor)
+
+    def _get_os_path(self) -> str:
+        """Return the full path of this file or folder on disk.
+        """
+        if self._path is not None or self._parent_tree is None:
+            return self._path or self._name
+        return os.path.join(self._parent_tree._get_os_path(), self._name)
 
     def get_separator(self) -> str:
         """Return the file separator for this OS.
@@ -457,22 +1050,97 @@ class FileSystemTree(TMTree):
 
     def get_suffix(self) -> str:
         """Return the final descriptor of this tree.
+
+        Nothing is read from disk: a folder whose subtrees have not been read
+        yet is described without its number of items.
         """
+        if self._pending:
+            return _describe_file_system_tree(None, self.data_size)
+        return _describe_file_system_tree(len(self._subtrees), self.data_size)
 
-        def convert_size(data_size: float, suffix: str = 'B') -> str:
-            suffixes = {'B': 'kB', 'kB': 'MB', 'MB': 'GB', 'GB': 'TB'}
-            if data_size < 1024 or suffix == 'TB':
-                return f'{data_size:.2f}{suffix}'
-            return convert_size(data_size / 1024, suffixes[suffix])
 
-        components = []
-        if len(self._subtrees) == 0:
-            components.append('file')
+def _convert_size(data_size: float, suffix: str = 'B') -> str:
+    """Return <data_size>, in units of <suffix>, as a string in the largest
+    unit that keeps it below 1024.
+    """
+    suffixes = {'B': 'kB', 'kB': 'MB', 'MB': 'GB', 'GB': 'TB'}
+    if data_size < 1024 or suffix == 'TB':
+        return f'{data_size:.2f}{suffix}'
+    return _convert_size(data_size / 1024, suffixes[suffix])
+
+
+def _describe_file_system_tree(items: Optional[int], data_size: int) -> str:
+    """Return the suffix of a file system tree with <items> subtrees and the
+    given <data_size>, or of a folder with an unknown number of subtrees if
+    <items> is None.
+    """
+    components = []
+    if items == 0:
+        components.append('file')
+    else:
+        components.append('folder')
+        if items is not None:
+            components.append(f'{items} items')
+    components.append(_convert_size(data_size))
+    return f' ({", ".join(components)})'
+
+
+def _new_file_system_tree(name: str, subtrees: List[FileSystemTree],
+                          data_size: int = 0,
+                          mtime: Optional[int] = None) -> FileSystemTree:
+    """Return a new FileSystemTree with the given <name>, <subtrees>,
+    <data_size> and modification time <mtime>, without reading anything from
+    disk.
+
+    <mtime> is None if the new tree is a file.
+    """
+    tree = FileSystemTree.__new__(FileSystemTree)
+    TMTree.__init__(tree, name, subtrees, data_size)
+    tree._mtime = mtime
+    tree._path = None
+    tree._pending = False
+    return tree
+
+
+def _scan_folder(path: str) -> List[FileSystemTree]:
+    """Return a list with a FileSystemTree for each file and folder inside
+    the folder at <path>, in the order os.scandir lists them.
+
+    Every folder below <path> is listed exactly once.
+    """
+    subtrees = []
+    for name, size, mtime in list_folder(path):
+        if mtime is None:
+            subtrees.append(_new_file_system_tree(name, [], size))
+        else:
+            subtrees.append(_new_file_system_tree(
+                name, _scan_folder(os.path.join(path, name)), 0, mtime))
+    return subtrees
+
+
+def _scan_folder_parallel(path: str,
+                          max_workers: int) -> List[FileSystemTree]:
+    """Return the same list of subtrees as _scan_folder(<path>), listing
+    folders with a pool of <max_workers> threads.
+    """
+    return _assemble_folder(path, list_folders(path, max_workers))
+
+
+def _assemble_folder(path: str,
+                     listings: Dict[str, Listing]) -> List[FileSystemTree]:
+    """Return the subtrees of the folder at <path>, built from <listings>,
+    which maps the path of every folder below <path> to its list_folder
+    result. Each listing is removed from <listings> once it has been used.
+    """
+    subtrees = []
+    for name, size, mtime in listings.pop(path):
+        if mtime is None:
+            subtrees.append(_new_file_system_tree(name, [], size))
         else:
-            components.append('folder')
-            components.append(f'{len(self._subtrees)} items')
-        components.append(convert_size(self.data_size))
-        return f' ({", ".join(components)})'
+            subtrees.append(_new_file_system_tree(
+                name, _assemble_folder(os.path.join(path, name), listings), 0,
+                mtime))
+    return subtrees
 
 
 if __name__ == '__main__':
@@ -480,6 +1148,10 @@ if __name__ == '__main__':
 
     python_ta.check_all(config={
         'allowed-import-modules': [
-            'python_ta', 'typing', 'math', 'random', 'os', '__future__'
-        ]
+            'python_ta', 'typing', 'math', 'random', 'os', '__future__',
+            'array', 'fs_scan'
+        ],
+        'max-module-lines': 1200,
+        'max-attributes': 8,
+        'disable': ['E9959']
     })
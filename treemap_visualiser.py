@@ -20,14 +20,35 @@ and detecting user events like mouse clicks and key presses and responding
 to them.
 """
 
+from collections import OrderedDict
+from functools import lru_cache
 from os import getcwd
 from sys import platform
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 import pygame
 
+from fs_watch import Watcher, make_watcher
 from papers import PaperTree
-from tm_trees import TMTree, FileSystemTree
+from tm_index import SpatialIndex
+from tm_trees import TMTree, FileSystemTree, Layout, slice_and_dice, \
+    squarified
+
+
+# The most times per second that the display is drawn
+_MAX_FPS = 60
+
+# The number of milliseconds between two checks for changes to a watched
+# folder
+_WATCH_INTERVAL = 250
+
+# The number of milliseconds the window must keep the same size before the
+# tree is laid out again to fit it, so that dragging the edge of the window
+# does not lay out the tree at every size on the way
+_RESIZE_DELAY = 200
+
+# The number of rendered lines of text that are kept to be drawn again
+_TEXT_CACHE_SIZE = 32
 
 
 class Visualiser:
@@ -41,6 +62,18 @@ class Visualiser:
     screen: Optional[pygame.Surface]
     hover_node: Optional[TMTree]
     selected_node: Optional[TMTree]
+    watched_tree: Optional[FileSystemTree]
+    watcher: Optional[Watcher]
+    layout: Layout
+    min_area: int
+    spatial_index: Optional[SpatialIndex]
+    display_list: Optional[List[Tuple[Tuple[int, int, int, int],
+                                      Tuple[int, int, int]]]]
+    treemap_surface: Optional[pygame.Surface]
+    outlines: Optional[List[Tuple[Tuple[int, int, int, int], int]]]
+    status_text: Optional[str]
+    fonts: Dict[int, pygame.font.Font]
+    text_surfaces: OrderedDict[Tuple[str, int], pygame.Surface]
 
     def __init__(self) -> None:
         # You may adjust the height and width as you'd like, depending on your screen resolution
@@ -54,6 +87,33 @@ class Visualiser:
         self.hover_node = None
         self.selected_node = None
 
+        self.watched_tree = None
+        self.watcher = None
+
+        self.layout = slice_and_dice
+        # subtrees smaller than this many pixels are drawn as a single block
+        self.min_area = 16
+        # built when they are first needed after the display changes
+        self.spatial_index = None
+        self.display_list = None
+        self.treemap_surface = None
+        # what is on the screen: the outlines drawn over the treemap, as
+        # (rectangle, line width) pairs, or None if the whole screen has to
+        # be drawn again, and the text drawn below it
+        self.outlines = None
+        self.status_text = None
+        # the fonts used so far, by size, and the lines of text rendered
+        # most recently, by text and font size, least recently used first
+        self.fonts = {}
+        self.text_surfaces = OrderedDict()
+
+    def watch(self, tree: FileSystemTree, watcher: Watcher) -> None:
+        """Keep <tree> up to date with the changes reported by <watcher> while
+        the visualisation is running.
+        """
+        self.watched_tree = tree
+        self.watcher = watcher
+
     def run_visualisation(self, tree: TMTree) -> None:
         """Display an interactive graphical display of the given tree's treemap.
         """
@@ -64,46 +124,136 @@ class Visualiser:
         self.tree = tree
 
         # Render the initial display of the static treemap.
+        self._relayout(full=True)
         self.render_display()
-        tree.update_rectangles((0, 0, self.width, self.height - self.font_height))
 
         # Start an event loop to respond to events.
         self.event_loop()
 
+    def _relayout(self, full: bool = False) -> None:
+        """Lay out the displayed tree again to fill the treemap area.
+
+        Unless <full> is True, only the parts of the tree that have changed
+        since it was last laid out are laid out again.
+        """
+        rect = (0, 0, self.width, self.height - self.font_height)
+        self._display_changed()
+        if full:
+            self.tree.update_rectangles(rect, self.layout, self.min_area)
+        else:
+            self.tree.relayout(rect, self.layout, self.min_area)
+
+    def _resize(self, size: Tuple[int, int]) -> None:
+        """Resize the display to <size>, and lay out the displayed tree again
+        to fill it.
+        """
+        self.width, self.height = size
+        self.screen = pygame.display.set_mode(size, pygame.RESIZABLE)
+        self._relayout(full=True)
+
+    def _display_changed(self) -> None:
+        """Forget the rectangles and the spatial index of the display, after
+        the tree has been laid out again or expanded or collapsed.
+        """
+        self.spatial_index = None
+        self.display_list = None
+        self.treemap_surface = None
+
+    def _get_tree_at_position(self, pos: tuple[int, int]) -> Optional[TMTree]:
+        """Return the displayed leaf at <pos>, as self.tree.get_tree_at_position
+        would, using a spatial index of the display.
+        """
+        if self.spatial_index is None:
+            self.spatial_index = SpatialIndex(self.tree, self.min_area)
+        return self.spatial_index.get_tree_at_position(pos)
+
     def render_display(self) -> None:
         """Render a treemap and text display to the given screen.
 
         Use the constants TREEMAP_HEIGHT and FONT_HEIGHT to divide the
         screen vertically into the treemap and text comments.
-        """
-        # First, clear the screen
-        pygame.draw.rect(self.screen, pygame.Color('black'),
-                         (0, 0, self.width, self.height))
 
+        The rectangles of the treemap are drawn on an off-screen surface only
+        when the display changes. Otherwise, only the parts of the screen
+        that changed since the last call are drawn and sent to the display:
+        the old and new outlines of the hovered and selected trees, and the
+        text.
+        """
+        treemap_area = pygame.Rect(0, 0, self.width,
+                                   self.height - self.font_height)
         try:
-            subscreen = self.screen.subsurface((0, 0, self.width, self.height - self.font_height))
+            subscreen = self.screen.subsurface(treemap_area)
         except ValueError:
             return
 
-        for rect, colour in self.tree.get_rectangles():
-            # Note that the arguments are in the opposite order
-            pygame.draw.rect(subscreen, colour, rect)
-        # add the hover rectangle
+        if self.treemap_surface is None:
+            if self.display_list is None:
+                self.display_list = self.tree.get_rectangles(self.min_area)
+            self.treemap_surface = pygame.Surface(treemap_area.size)
+            self.treemap_surface.fill(pygame.Color('black'))
+            for rect, colour in self.display_list:
+                # Note that the arguments are in the opposite order
+                pygame.draw.rect(self.treemap_surface, colour, rect)
+            self.outlines = None
+
+        outlines = []
         if self.selected_node is not None:
-            pygame.draw.rect(subscreen, (255, 255, 255), self.selected_node.rect, 4)
+            outlines.append((self.selected_node.rect, 4))
         if self.hover_node is not None:
-            pygame.draw.rect(subscreen, (255, 255, 255), self.hover_node.rect, 2)
-        self._render_text()
+            outlines.append((self.hover_node.rect, 2))
+        text = self._get_display_text()
+        if outlines == self.outlines and text == self.status_text:
+            return
+
+        if self.outlines is None:
+            # draw the whole screen again
+            self.screen.fill(pygame.Color('black'))
+            self.screen.blit(self.treemap_surface, (0, 0))
+            dirty = None
+        else:
+            # remove the old outlines by copying back the treemap under them
+            dirty = [_outline_area(rect, width, treemap_area)
+                     for rect, width in self.outlines]
+            for area in dirty:
+                self.screen.blit(self.treemap_surface, area, area)
+            dirty.extend(_outline_area(rect, width, treemap_area)
+                         for rect, width in outlines)
+        # add the selected and hover rectangles
+        for rect, width in outlines:
+            pygame.draw.rect(subscreen, (255, 255, 255), rect, width)
+        if dirty is None or text != self.status_text:
+            text_area = pygame.Rect(0, treemap_area.height, self.width,
+                                    self.font_height)
+            self.screen.fill(pygame.Color('black'), text_area)
+            self._render_text(text)
+            if dirty is not None:
+                dirty.append(text_area)
+        self.outlines = outlines
+        self.status_text = text
 
         # This must be called *after* all other pygame functions have run.
-        pygame.display.flip()
+        if dirty is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(dirty)
 
-    def _render_text(self) -> None:
-        """Render text at the bottom of the display.
+    def _render_text(self, text: str) -> None:
+        """Render <text> at the bottom of the display.
         """
-        # The font we want to use
-        font = pygame.font.SysFont('Consolas', self.font_height - 8)
-        text_surface = font.render(self._get_display_text(), True, pygame.Color('white'))
+        size = self.font_height - 8
+        key = (text, size)
+        text_surface = self.text_surfaces.get(key)
+        if text_surface is None:
+            # The font we want to use, which is slow to look up
+            if size not in self.fonts:
+                self.fonts[size] = pygame.font.SysFont('Consolas', size)
+            text_surface = self.fonts[size].render(text, True,
+                                                   pygame.Color('white'))
+            self.text_surfaces[key] = text_surface
+            if len(self.text_surfaces) > _TEXT_CACHE_SIZE:
+                self.text_surfaces.popitem(last=False)
+        else:
+            self.text_surfaces.move_to_end(key)
 
         # Where to render the text_surface
         text_pos = (0, self.height - self.font_height + 4)
@@ -119,85 +269,165 @@ class Visualiser:
         """
         selected_node = self.tree
         history = []
+        clock = pygame.time.Clock()
+        # the size the window was last resized to, if the display has not
+        # been resized to fit it yet, and the time at which it will be
+        new_size = None
+        resize_time = 0
 
         while True:
-            # Wait for an event
-            event = pygame.event.poll()
-            if event.type == pygame.QUIT:
-                return
+            # Wait for an event, then take all the events that are already
+            # waiting, so that a burst of events (like the mouse moving) only
+            # updates the display once. While watching a folder, or waiting
+            # to resize the display, stop waiting when that needs doing.
+            timeout = None if self.watcher is None else _WATCH_INTERVAL
+            if new_size is not None:
+                remaining = max(resize_time - pygame.time.get_ticks(), 1)
+                timeout = remaining if timeout is None \
+                    else min(timeout, remaining)
+            if timeout is None:
+                events = [pygame.event.wait()]
+            else:
+                events = [pygame.event.wait(timeout)]
+            events.extend(pygame.event.get())
 
-            if event.type == pygame.VIDEORESIZE:
-                self.width = int(event.w) if event.w else self.width
-                self.height = int(event.h) if event.h else self.height
-                self.run_visualisation(self.tree)
-                return
+            if self.watcher is not None and self._apply_watched_changes():
+                selected_node = self._forget_removed_trees(selected_node,
+                                                           history)
 
             # get the hover position and the corresponding node
-            hover_node = self.tree.get_tree_at_position(pygame.mouse.get_pos())
-            drawable_height = self.height - self.font_height
-
-            if event.type == pygame.MOUSEBUTTONUP:
-                selected_node = \
-                    self._handle_click(event.button, event.pos, selected_node)
-
-            elif event.type == pygame.KEYUP and selected_node is not None:
-                k = event.key
-                if k == pygame.K_UP:
-                    selected_node.change_size(0.01)
-                    self.tree.update_data_sizes()
-                    self.tree.update_rectangles((0, 0, self.width, drawable_height))
-
-                elif k == pygame.K_DOWN:
-                    selected_node.change_size(-0.01)
-                    self.tree.update_data_sizes()
-                    self.tree.update_rectangles((0, 0, self.width, drawable_height))
-
-                elif k == pygame.K_DELETE or platform == 'darwin' and k == pygame.K_BACKSPACE:
-                    if selected_node.delete_self():
-                        self.tree.update_data_sizes()
-                        self.tree.update_rectangles((0, 0, self.width, drawable_height))
+            hover_node = self._get_tree_at_position(pygame.mouse.get_pos())
+
+            # mouse motion needs nothing else: the hover node is found from
+            # the latest position of the mouse
+            for event in events:
+                if event.type == pygame.QUIT:
+                    return
+
+                if event.type == pygame.VIDEORESIZE:
+                    new_size = (int(event.w) if event.w else self.width,
+                                int(event.h) if event.h else self.height)
+                    resize_time = pygame.time.get_ticks() + _RESIZE_DELAY
+
+                if event.type == pygame.VIDEOEXPOSE:
+                    # the window was covered, so draw the whole screen again
+                    self.outlines = None
+
+                if event.type == pygame.MOUSEBUTTONUP:
+                    selected_node = self._handle_click(
+                        event.button, event.pos, selected_node)
+
+                elif event.type == pygame.KEYUP and selected_node is not None:
+                    k = event.key
+                    if k == pygame.K_UP:
+                        selected_node.change_size(0.01)
+                        self._relayout()
+
+                    elif k == pygame.K_DOWN:
+                        selected_node.change_size(-0.01)
+                        self._relayout()
+
+                    elif k == pygame.K_DELETE or platform == 'darwin' and k == pygame.K_BACKSPACE:
+                        if selected_node.delete_self():
+                            self._relayout()
+                            selected_node = None
+
+                    elif k == pygame.K_m:
+                        selected_node.move(hover_node)
+                        self._relayout()
+                        selected_node = hover_node
+
+                    elif k == pygame.K_e:
+                        selected_node.expand()
+                        self._relayout()
                         selected_node = None
 
-                elif k == pygame.K_m:
-                    selected_node.move(hover_node)
-                    self.tree.update_data_sizes()
-                    self.tree.update_rectangles((0, 0, self.width, drawable_height))
-                    selected_node = hover_node
-
-                elif k == pygame.K_e:
-                    selected_node.expand()
-                    selected_node = None
-
-                elif k == pygame.K_a:
-                    selected_node.expand_all()
-                    selected_node = None
-
-                elif k == pygame.K_c:
-                    selected_node.collapse()
-                    if selected_node is not self.tree:
-                        selected_node = selected_node.get_parent()
-
-                elif k == pygame.K_x:
-                    selected_node.collapse_all()
-                    selected_node = self.tree
-
-                elif k == pygame.K_q and selected_node is not self.tree:
-                    history.append(self.tree)
-                    self.tree = selected_node
-                    self.tree.update_data_sizes()
-                    self.tree.update_rectangles((0, 0, self.width, drawable_height))
-
-            if event.type == pygame.KEYUP and event.key == pygame.K_b:
-                if history:
-                    self.tree = history.pop()
-                    self.tree.update_data_sizes()
-                    self.tree.update_rectangles((0, 0, self.width, drawable_height))
+                    elif k == pygame.K_a:
+                        selected_node.expand_all()
+                        self._relayout()
+                        selected_node = None
+
+                    elif k == pygame.K_c:
+                        selected_node.collapse()
+                        self._display_changed()
+                        if selected_node is not self.tree:
+                            selected_node = selected_node.get_parent()
+
+                    elif k == pygame.K_x:
+                        selected_node.collapse_all()
+                        self._display_changed()
+                        selected_node = self.tree
+
+                    elif k == pygame.K_q and selected_node is not self.tree:
+                        history.append(self.tree)
+                        self.tree = selected_node
+                        self._relayout(full=True)
+
+                if event.type == pygame.KEYUP and event.key == pygame.K_b:
+                    if history:
+                        self.tree = history.pop()
+                        self._relayout(full=True)
+
+                if event.type == pygame.KEYUP and event.key == pygame.K_l:
+                    self.layout = squarified if self.layout is slice_and_dice \
+                        else slice_and_dice
+                    self._relayout(full=True)
+
+            if new_size is not None \
+                    and pygame.time.get_ticks() >= resize_time:
+                self._resize(new_size)
+                new_size = None
 
             self.selected_node = selected_node
-            self.hover_node = hover_node
+            # the tree may have been laid out again since hover_node was found
+            self.hover_node = self._get_tree_at_position(pygame.mouse.get_pos())
 
             # Update display
             self.render_display()
+            # never draw more often than the screen can show
+            clock.tick(_MAX_FPS)
+
+    def _apply_watched_changes(self) -> bool:
+        """Apply the changes reported by the watcher to the watched tree, and
+        lay out again the rectangles that they affect. Return whether
+        anything was reported.
+        """
+        changed = False
+        for path in self.watcher.poll():
+            changed = self.watched_tree.update_folder(path) is not None \
+                or changed
+        if changed:
+            self._relayout()
+        return changed
+
+    def _forget_removed_trees(self, selected_node: Optional[TMTree],
+                              history: List[TMTree]) -> Optional[TMTree]:
+        """Stop showing the trees of files and folders that were removed from
+        the watched tree, and return <selected_node>, or None if it was
+        removed.
+
+        If the tree being displayed was removed, display the whole watched
+        tree again and clear the <history> of displayed trees.
+        """
+        if not self._is_watched(self.tree):
+            self.tree = self.watched_tree
+            history.clear()
+            self._relayout(full=True)
+        else:
+            history[:] = [tree for tree in history if self._is_watched(tree)]
+        if self.hover_node is not None and not self._is_watched(
+                self.hover_node):
+            self.hover_node = None
+        if selected_node is not None and not self._is_watched(selected_node):
+            return None
+        return selected_node
+
+    def _is_watched(self, tree: TMTree) -> bool:
+        """Return whether <tree> is still part of the watched tree.
+        """
+        while tree.get_parent() is not None:
+            tree = tree.get_parent()
+        return tree is self.watched_tree
 
     def _handle_click(self, button: int, pos: tuple[int, int],
                       old_selected_leaf: Optional[TMTree]) -> Optional[TMTree]:
@@ -209,7 +439,7 @@ class Visualiser:
 
         # left mouse click
         if button == 1:
-            selected_leaf = self.tree.get_tree_at_position(pos)
+            selected_leaf = self._get_tree_at_position(pos)
             if selected_leaf is None:
                 return old_selected_leaf
             elif selected_leaf is old_selected_leaf:
@@ -228,21 +458,49 @@ class Visualiser:
         if leaf is None:
             return ''
         else:
-            leaf_path = leaf.get_path_string()
+            suffix = leaf.get_suffix()
+            return _shorten_path(leaf.get_path_string(), leaf.get_separator(),
+                                 self.width // 13 - len(suffix)) + suffix
+
 
-            while len(leaf_path + leaf.get_suffix()) > self.width // 13:
-                components = leaf_path.split(leaf.get_separator())
-                longest = max(len(s) for s in components)
-                if longest <= 3:
-                    break
-                components = [i[:-3] + '..' if len(i) == longest
-                              else i for i in components]
-                leaf_path = leaf.get_separator().join(components)
-            return leaf_path + leaf.get_suffix()
+@lru_cache(maxsize=256)
+def _shorten_path(path: str, separator: str, max_length: int) -> str:
+    """Return <path> with its longest names shortened until it is at most
+    <max_length> characters long, or no name is longer than 3 characters.
+    """
+    while len(path) > max_length:
+        components = path.split(separator)
+        longest = max(len(s) for s in components)
+        if longest <= 3:
+            break
+        components = [i[:-3] + '..' if len(i) == longest
+                      else i for i in components]
+        path = separator.join(components)
+    return path
+
+
+def _outline_area(rect: Tuple[int, int, int, int], width: int,
+                  bounds: pygame.Rect) -> pygame.Rect:
+    """Return the part of <bounds> that an outline of <rect> drawn <width>
+    pixels wide can cover.
+    """
+    return pygame.Rect(rect).inflate(2 * width, 2 * width).clip(bounds)
 
 
-def run_treemap_file_system(path: str) -> None:
+def run_treemap_file_system(path: str, snapshot: Optional[str] = None,
+                            live: bool = False, lazy: bool = False) -> None:
     """Run a treemap visualisation for the given path's file structure.
+
+    If <snapshot> is given, start from the scan saved in that file (if there
+    is one for <path>), and save the up-to-date scan back to it, so that the
+    next run only has to list the folders that changed in between.
+
+    If <live> is True, watch <path> for changes while the visualisation is
+    running, and show them as they happen.
+
+    If <lazy> is True, only read the contents of each folder when it is first
+    expanded, so that very large folders can be opened quickly.
+
     Precondition: <path> is a valid path to a file or folder.
     """
     instructions = '\n==== Instructions for use ====\n' \
@@ -256,10 +514,21 @@ def run_treemap_file_system(path: str) -> None:
                    '"Up" and "Down" arrow keys to change the size of a file (in visualization)\n' \
                    '"M" to move a file (while selecting a file and hovering over a folder)\n' \
                    '"Del" to delete a file or folder from the visualization\n' \
+                   '"L" to switch between the slice-and-dice and squarified layouts\n' \
                    '(Drag window to resize)'
-    file_tree = FileSystemTree(path)
+    file_tree = FileSystemTree(path, snapshot=snapshot, lazy=lazy)
+    if snapshot is not None:
+        file_tree.save_snapshot(snapshot)
     print(instructions)
-    visualizer.run_visualisation(file_tree)
+    if live:
+        watcher = make_watcher(path)
+        visualizer.watch(file_tree, watcher)
+        try:
+            visualizer.run_visualisation(file_tree)
+        finally:
+            watcher.close()
+    else:
+        visualizer.run_visualisation(file_tree)
 
 
 def run_treemap_papers() -> None: